@@ -1,48 +1,279 @@
-from openai import OpenAI
-from moviepy.editor import VideoFileClip
+import bisect
+import hashlib
+import io
+import json
 import os
-import tempfile
-client = OpenAI()
+import subprocess
+import time
+import wave
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+from cache import DiskCache, file_fingerprint
+from probe import probe
+from transcript import Transcript
+from waveform import decode_peaks, ffmpeg_executable, load_cached_peaks, silent_ranges, store_cached_peaks
 
-content_prompt = """You are an advanced text refinement tool designed to process video transcripts efficiently. Your primary function is to improve the readability and conciseness of transcripts by automatically removing filler words ("um", "uh", "you know", etc.), unnecessary repetitions, long pauses indicated by ellipses or repeated punctuation marks, and correcting or removing bad takes such as sentences that start but do not finish properly.
+TRANSCRIBE_SAMPLE_RATE = 16000
+MAX_CHUNK_SECONDS = 600  # About 19 MB of 16 kHz WAV, under the 25 MB upload limit
+MIN_CHUNK_SECONDS = 60
+TRANSCRIBE_WORKERS = int(os.environ.get("EDITOR_TRANSCRIBE_WORKERS", 4))
+TRANSCRIBE_RETRIES = 3
+TRANSCRIBE_BACKEND = os.environ.get("EDITOR_TRANSCRIBE_BACKEND", "openai")
+# Fixed rather than relative, so appending to a recording leaves the earlier chunk boundaries where they were
+CHUNK_SILENCE_THRESHOLD = 0.01
+SUGGESTION_MODEL = "gpt-3.5-turbo"
+# Deterministic, and answered as JSON, so the reply is word numbers rather than free text to re-align
+SUGGESTION_PARAMETERS = {"temperature": 0, "top_p": 1, "response_format": {"type": "json_object"}}
+# The reply's token budget grows with the chunk, since a long chunk can have many short runs to drop
+SUGGESTION_BASE_TOKENS = 256
+SUGGESTION_TOKENS_PER_WORD = 2
+SUGGESTION_MAX_TOKENS = 4096
 
-Your task is to process a given transcript and return a refined version of it. The refined transcript should:
-- Exclude filler words and phrases that do not contribute meaningful content.
-- Remove redundant sentences or phrases that repeat the same information without adding value.
-- Clean up segments with long pauses, which might be represented by multiple ellipses (...) or dashes (-).
-- Edit or omit bad takes, including incomplete thoughts or sentences that derail from the main topic.
+# Results are keyed by what produced them: the chunk's PCM or the transcript text, plus model and prompt
+result_cache = DiskCache("transcripts", int(os.environ.get("EDITOR_TRANSCRIPT_CACHE_MB", 64)) * 1024 * 1024)
 
-The output should retain the original message and information of the transcript but in a more polished, concise form. The structure and flow of the content should remain intact, ensuring that the essence of the speaker's points is preserved without the unnecessary fluff.
+_client = None
 
-Please perform this cleanup operation directly on the following transcript:
+
+def openai_client():
+    # Created on first use, so the editor and the offline backend work without an API key
+    global _client
+    if _client is None:
+        from openai import OpenAI
+        _client = OpenAI()
+    return _client
+
+
+content_prompt = """You are an advanced text refinement tool designed to process video transcripts efficiently. Your primary function is to improve the readability and conciseness of transcripts by identifying filler words ("um", "uh", "you know", etc.), unnecessary repetitions, long pauses indicated by ellipses or repeated punctuation marks, and bad takes such as sentences that start but do not finish properly.
+
+The transcript is given as numbered words, one "number: word" per line. Decide which words to remove so that:
+- Filler words and phrases that do not contribute meaningful content are removed.
+- Redundant sentences or phrases that repeat the same information without adding value are removed.
+- Bad takes, including incomplete thoughts or sentences that derail from the main topic, are removed.
+
+Only remove words; never reword, reorder or add anything. The remaining words must retain the original message and information of the transcript, preserving the essence of the speaker's points.
+
+Reply with a JSON object of the form {"drop": [[first, last], ...]}, where each pair is an inclusive range of word numbers to remove. Reply {"drop": []} if nothing should be removed.
 """
 
-def extract_and_transcribe_audio(file_path):
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as tmpfile:
-        temp_audio_path = tmpfile.name
-
-    if file_path.endswith(('.mp4', '.mov', '.avi')):
-        video = VideoFileClip(file_path)
-        video.audio.write_audiofile(temp_audio_path)
-        video.close()
-    else:
-        temp_audio_path = file_path
-
-    with open(temp_audio_path, "rb") as audio_file:
-        transcription = client.audio.transcriptions.create(
-            model="whisper-1",
-            file=audio_file
+
+class TranscriptionBackend(ABC):
+    # transcribe() gets one chunk as WAV bytes and returns its segments with chunk-relative times
+    name = ""
+
+    @abstractmethod
+    def transcribe(self, audio, duration):
+        pass
+
+    def cache_parameters(self):
+        # Everything besides the audio that changes the result
+        return self.name
+
+
+class OpenAIBackend(TranscriptionBackend):
+    name = "openai"
+
+    def __init__(self, model="whisper-1"):
+        self.model = model
+
+    def cache_parameters(self):
+        return f"{self.name}:{self.model}:word"
+
+    def transcribe(self, audio, duration):
+        transcription = openai_client().audio.transcriptions.create(
+            model=self.model,
+            file=("chunk.wav", audio),
+            response_format="verbose_json",
+            timestamp_granularities=["word", "segment"]
         )
+        words = [{"word": field(word, "word"), "start": field(word, "start"), "end": field(word, "end")}
+                 for word in field(transcription, "words") or []]
+        word_starts = [word["start"] for word in words]
+        segments = []
+        for segment in field(transcription, "segments") or []:
+            start, end = field(segment, "start"), field(segment, "end")
+            first, last = bisect.bisect_left(word_starts, start), bisect.bisect_left(word_starts, end)
+            segments.append({"start": start, "end": end, "text": field(segment, "text").strip(),
+                             "words": words[first:last]})
+        return segments
 
-    if file_path.endswith(('.mp4', '.mov', '.avi')):
-        os.remove(temp_audio_path)
 
-    return transcription.text
+class OfflineBackend(TranscriptionBackend):
+    # Stand-in for tests and offline work: one placeholder segment per stretch of sound in the chunk
+    name = "offline"
 
+    def transcribe(self, audio, duration):
+        with wave.open(io.BytesIO(audio)) as reader:
+            sample_rate = reader.getframerate()
+            samples = np.frombuffer(reader.readframes(reader.getnframes()), dtype="<i2").astype(np.float32) / 32768
+        window = int(sample_rate * 0.05)
+        count = len(samples) // window
+        if count == 0:
+            return []
+        rms = np.sqrt(np.square(samples[:count * window].reshape(count, window)).mean(axis=1))
+        voiced = np.concatenate(([0], (rms >= 0.01).astype(np.int8), [0]))
+        edges = np.diff(voiced)
+        starts = np.flatnonzero(edges == 1) * 0.05
+        ends = np.flatnonzero(edges == -1) * 0.05
+        return [{"start": float(start), "end": float(end), "text": f"[speech {end - start:.1f}s]"}
+                for start, end in zip(starts, ends)]
 
-def get_editing_suggestions(transcript):
-    response = client.chat.completions.create(
-        model="gpt-3.5-turbo",
+
+BACKENDS = {backend.name: backend for backend in (OpenAIBackend, OfflineBackend)}
+
+
+def field(item, name):
+    # The API client returns objects, older versions and stand-ins return dicts
+    return item.get(name) if isinstance(item, dict) else getattr(item, name, None)
+
+
+def default_backend():
+    return BACKENDS[TRANSCRIBE_BACKEND]()
+
+
+def load_peaks(file_path):
+    # The editor has usually decoded these already; reuse them from the peak cache
+    fingerprint = file_fingerprint(file_path)
+    peaks = load_cached_peaks(fingerprint)
+    if peaks is None:
+        peaks = decode_peaks(file_path)
+        if peaks is not None:
+            store_cached_peaks(fingerprint, peaks)
+    return peaks
+
+
+def plan_chunks(peaks, duration, max_chunk=MAX_CHUNK_SECONDS, min_chunk=MIN_CHUNK_SECONDS):
+    # Chunks end in the middle of a silence where possible, so no word is split between two requests.
+    # Boundaries are walked from the start of the file: appending or trimming the end keeps the earlier ones,
+    # but trimming the head moves every boundary, and every chunk is then transcribed again.
+    starts, ends = silent_ranges(peaks, threshold=CHUNK_SILENCE_THRESHOLD)
+    centers = (starts + ends) / 2
+    chunks = []
+    position = 0.0
+    while duration - position > max_chunk:
+        candidates = centers[(centers > position + min_chunk) & (centers <= position + max_chunk)]
+        cut = float(candidates[-1]) if len(candidates) else position + max_chunk
+        chunks.append((position, cut))
+        position = cut
+    chunks.append((position, duration))
+    return chunks
+
+
+def decode_chunk(file_path, start, end, sample_rate=TRANSCRIBE_SAMPLE_RATE):
+    # 16-bit mono PCM of [start, end)
+    executable = ffmpeg_executable()
+    if executable is None:
+        raise RuntimeError("ffmpeg is needed to transcribe")
+    command = [executable, "-v", "error", "-nostdin", "-ss", f"{start:.3f}", "-i", file_path,
+               "-t", f"{end - start:.3f}", "-vn", "-ac", "1", "-ar", str(sample_rate), "-f", "s16le", "-"]
+    result = subprocess.run(command, stdin=subprocess.DEVNULL, capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg could not decode {file_path}: {result.stderr.decode(errors='replace').strip()}")
+    return result.stdout
+
+
+def wav_bytes(pcm, sample_rate=TRANSCRIBE_SAMPLE_RATE):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(sample_rate)
+        writer.writeframes(pcm)
+    return buffer.getvalue()
+
+
+def cache_key(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode())
+        digest.update(b"\0")
+    return f"{digest.hexdigest()}.json"
+
+
+def load_cached_result(key):
+    path = result_cache.get(key)
+    if path is None:
+        return None
+    try:
+        with open(path) as stream:
+            return json.load(stream)
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable transcript cache entry {path}: {e}")
+        return None
+
+
+def store_cached_result(key, result):
+    try:
+        result_cache.put(key, lambda stream: stream.write(json.dumps(result).encode()))
+    except OSError as e:
+        print(f"Could not write transcript cache: {e}")
+
+
+def transcribe_chunk(file_path, start, end, backend):
+    # Identical audio gives identical text, so a chunk is only sent once whatever file or offset it came from
+    pcm = decode_chunk(file_path, start, end)
+    key = cache_key("transcript", TRANSCRIBE_SAMPLE_RATE, backend.cache_parameters(), pcm)
+    segments = load_cached_result(key)
+    if segments is None:
+        audio = wav_bytes(pcm)
+        for attempt in range(TRANSCRIBE_RETRIES):
+            try:
+                segments = backend.transcribe(audio, end - start)
+                break
+            except Exception:
+                if attempt == TRANSCRIBE_RETRIES - 1:
+                    raise
+                time.sleep(2 ** attempt)
+        store_cached_result(key, segments)
+    return [{"start": start + segment["start"], "end": min(start + segment["end"], end), "text": segment["text"],
+             "words": [dict(word, start=start + word["start"], end=start + word["end"])
+                       for word in segment.get("words", [])]}
+            for segment in segments]
+
+
+def transcribe_segments(file_path, backend=None, workers=TRANSCRIBE_WORKERS, progress=None):
+    # Splits the audio on silences and transcribes the chunks concurrently. A failed chunk is reported
+    # and skipped instead of losing the whole transcript.
+    backend = backend or default_backend()
+    peaks = load_peaks(file_path)
+    duration = probe(file_path).duration or (peaks.duration if peaks is not None else 0)
+    chunks = plan_chunks(peaks, duration)
+    segments = []
+    failed = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="transcribe") as pool:
+        futures = {pool.submit(transcribe_chunk, file_path, start, end, backend): (start, end)
+                   for start, end in chunks}
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                segments.extend(dict(segment, chunk=futures[future][0]) for segment in future.result())
+            except Exception as e:
+                start, end = futures[future]
+                failed.append((start, end))
+                print(f"Transcription of {start:.1f}-{end:.1f}s failed: {e}")
+            if progress:
+                progress(done / len(futures))
+    if failed and len(failed) == len(chunks):
+        raise RuntimeError(f"Transcription of {file_path} failed")
+    segments.sort(key=lambda segment: segment["start"])
+    return segments
+
+
+def extract_and_transcribe_audio(file_path, backend=None):
+    return " ".join(segment["text"] for segment in transcribe_segments(file_path, backend) if segment["text"])
+
+
+def suggest_dropped_words(words):
+    # Indices into words that the model suggests removing
+    numbered = "\n".join(f"{index}: {word}" for index, word in enumerate(words))
+    max_tokens = min(SUGGESTION_BASE_TOKENS + SUGGESTION_TOKENS_PER_WORD * len(words), SUGGESTION_MAX_TOKENS)
+    key = cache_key("suggestions", SUGGESTION_MODEL, json.dumps(SUGGESTION_PARAMETERS, sort_keys=True),
+                    max_tokens, content_prompt, numbered)
+    cached = load_cached_result(key)
+    if cached is not None:
+        return cached
+    response = openai_client().chat.completions.create(
+        model=SUGGESTION_MODEL,
         messages=[
             {
                 "role": "system",
@@ -50,18 +281,62 @@ def get_editing_suggestions(transcript):
             },
             {
                 "role": "user",
-                "content": transcript
+                "content": numbered
             }
         ],
-        temperature=0.8,
-        max_tokens=200,
-        top_p=1
+        max_tokens=max_tokens,
+        **SUGGESTION_PARAMETERS
     )
-    return response.choices[0].message.content
+    choice = response.choices[0]
+    if choice.finish_reason != "stop":
+        # A cut-off reply is missing ranges, or is not even valid JSON; nothing of it is applied
+        raise RuntimeError(f"Incomplete editing suggestions ({choice.finish_reason})")
+    suggestions = parse_dropped_words(choice.message.content, len(words))
+    store_cached_result(key, suggestions)
+    return suggestions
+
+
+def get_editing_suggestions(transcript):
+    # The original text in, text out entry point: transcript with the words the model drops left out
+    words = transcript.split()
+    dropped = set(suggest_dropped_words(words))
+    return " ".join(word for index, word in enumerate(words) if index not in dropped)
+
+
+def parse_dropped_words(reply, count):
+    # Sorted word indices from a {"drop": [[first, last], ...]} reply, ignoring anything outside [0, count)
+    dropped = set()
+    for pair in json.loads(reply).get("drop", []):
+        first, last = (pair, pair) if isinstance(pair, int) else pair
+        dropped.update(range(max(int(first), 0), min(int(last), count - 1) + 1))
+    return sorted(dropped)
+
+
+def get_chunked_editing_suggestions(transcript, workers=TRANSCRIBE_WORKERS):
+    # Word indices of transcript to remove. One request per transcription chunk, so after a recording is
+    # extended only the new chunks are sent; a chunk whose request fails is reported and left as it is.
+    chunk_starts = sorted({segment.get("chunk", 0) for segment in transcript.segments}) or [0]
+    chunk_of_word = np.searchsorted(chunk_starts, transcript.starts, side="right")
+    bounds = [0] + np.searchsorted(chunk_of_word, np.arange(2, len(chunk_starts) + 1)).tolist() + [len(transcript)]
+    chunks = [(first, last) for first, last in zip(bounds[:-1], bounds[1:]) if last > first]
+    dropped = []
+    failed = 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="suggest") as pool:
+        futures = {pool.submit(suggest_dropped_words, transcript.words[first:last]): first
+                   for first, last in chunks}
+        for future in as_completed(futures):
+            try:
+                dropped.extend(futures[future] + index for index in future.result())
+            except Exception as e:
+                failed += 1
+                print(f"Editing suggestions for words from {futures[future]} failed: {e}")
+    if chunks and failed == len(chunks):
+        raise RuntimeError("Editing suggestions failed")
+    return sorted(dropped)
 
 
 if __name__ == "__main__":
     file_path = "C1193 - L - Systems and Websites_1.mp4"
-    transcript = extract_and_transcribe_audio(file_path)
-    editing_suggestions = get_editing_suggestions(transcript)
-    print(editing_suggestions)
+    transcript = Transcript.from_segments(transcribe_segments(file_path))
+    dropped = set(get_chunked_editing_suggestions(transcript))
+    print(" ".join(word for index, word in enumerate(transcript.words) if index not in dropped))
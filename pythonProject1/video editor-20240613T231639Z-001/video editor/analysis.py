@@ -0,0 +1,212 @@
+import io
+import os
+import subprocess
+import threading
+import weakref
+import numpy as np
+from PyQt5 import QtCore
+from cache import DiskCache, file_fingerprint
+from ingest import PRIORITY_BACKGROUND, PRIORITY_VISIBLE
+from probe import probe
+from waveform import ffmpeg_executable, silent_ranges
+
+SCENE_DETECTION = os.environ.get("EDITOR_SCENE_DETECTION", "1") != "0"
+SCENE_SAMPLE_FPS = float(os.environ.get("EDITOR_SCENE_FPS", 4))  # Frames compared per second of video
+SCENE_FRAME_WIDTH = 64
+SCENE_FRAME_HEIGHT = 36
+SCENE_BINS = 16  # Histogram bins per colour channel
+SCENE_THRESHOLD = 0.3  # Share of the histogram that has to move between two samples to count as a cut
+SCENE_MIN_GAP = 1.0  # Seconds; the samples of a fade or flash report only its first change
+SCENE_CHUNK_SECONDS = 60  # Video analysed per job, so results stream in and chunks run in parallel
+SILENCE_CUT_SECONDS = 0.5  # Silences at least this long suggest a cut in their middle
+
+analysis_cache = DiskCache("analysis", int(os.environ.get("EDITOR_ANALYSIS_CACHE_MB", 32)) * 1024 * 1024)
+
+
+def silence_cuts(peaks, min_silence=SILENCE_CUT_SECONDS):
+    starts, ends = silent_ranges(peaks, min_silence)
+    return (starts + ends) / 2
+
+
+def decode_frames(path, start, duration, fps=SCENE_SAMPLE_FPS, cancelled=None):
+    # (frames, height, width, 3) uint8 RGB thumbnails sampled at fps from [start, start + duration)
+    executable = ffmpeg_executable()
+    if executable is None:
+        raise RuntimeError("ffmpeg is needed for scene detection")
+    # The loop filter only sharpens detail the tiny frames throw away, so skipping it saves decode time
+    command = [executable, "-v", "error", "-nostdin", "-skip_loop_filter", "all", "-ss", f"{start:.6f}",
+               "-i", path, "-t", f"{duration:.6f}", "-map", "0:v:0", "-an", "-sn",
+               "-vf", f"fps={fps},scale={SCENE_FRAME_WIDTH}:{SCENE_FRAME_HEIGHT}:flags=area",
+               "-pix_fmt", "rgb24", "-f", "rawvideo", "-"]
+    frame_bytes = SCENE_FRAME_WIDTH * SCENE_FRAME_HEIGHT * 3
+    process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                               stderr=subprocess.DEVNULL)
+    data = io.BytesIO()
+    try:
+        while True:
+            block = process.stdout.read(frame_bytes * 16)
+            if not block:
+                break
+            if cancelled and cancelled():
+                return None
+            data.write(block)
+    finally:
+        process.stdout.close()
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+    count = data.tell() // frame_bytes
+    return np.frombuffer(data.getbuffer()[:count * frame_bytes], dtype=np.uint8).reshape(
+        count, SCENE_FRAME_HEIGHT, SCENE_FRAME_WIDTH, 3)
+
+
+def color_histograms(frames, bins=SCENE_BINS):
+    # One normalised RGB histogram per frame, all frames in a single bincount
+    count = len(frames)
+    index = frames // (256 // bins) + np.arange(3, dtype=np.uint8) * bins
+    index = index.reshape(count, -1).astype(np.intp) + (np.arange(count) * 3 * bins)[:, None]
+    histograms = np.bincount(index.ravel(), minlength=count * 3 * bins).reshape(count, 3 * bins)
+    return histograms / (frames[0].size if count else 1)
+
+
+def scene_changes(path, start, end, fps=SCENE_SAMPLE_FPS, threshold=SCENE_THRESHOLD, cancelled=None):
+    # Source times in [start, end) where consecutive samples differ by more than threshold. Decoding starts
+    # one sample early so a cut right at a chunk boundary is compared against the previous chunk's frame.
+    step = 1 / fps
+    seek = max(start - step, 0)
+    frames = decode_frames(path, seek, end - seek, fps, cancelled)
+    if frames is None:
+        return None
+    if len(frames) < 2:
+        return np.zeros(0)
+    histograms = color_histograms(frames)
+    distances = 0.5 * np.abs(np.diff(histograms, axis=0)).sum(axis=1)
+    times = seek + np.arange(1, len(frames)) * step
+    changes = times[distances > threshold]
+    changes = changes[np.diff(changes, prepend=-np.inf) >= SCENE_MIN_GAP]
+    return changes[(changes >= start) & (changes < end)]
+
+
+def scene_key(fingerprint, start):
+    return f"{fingerprint}-scenes-{SCENE_SAMPLE_FPS:g}-{SCENE_THRESHOLD:g}-{SCENE_CHUNK_SECONDS}-{start:g}.npy"
+
+
+class Analyzer(QtCore.QObject):
+    # Finds suggested cut points for each source on the ingest pool: silences from the decoded peaks and
+    # scene changes from chunks of video analysed in parallel, each chunk reported as soon as it is done
+    suggestionsFound = QtCore.pyqtSignal(object, str, object)  # Source, kind, array of source times
+    analysisFinished = QtCore.pyqtSignal(object, str)  # Source, kind whose suggestions are now complete
+
+    def __init__(self, scheduler, parent=None):
+        super().__init__(parent)
+        self.scheduler = scheduler
+        self.jobs = {}  # source -> outstanding jobs
+        self.watched = weakref.WeakSet()  # Sources whose peaksChanged is connected, once each
+        self.scene_chunks = {}  # source -> scene chunks still to report
+        self.lock = threading.Lock()
+        # Emitted from the ingest workers and delivered queued, so sources only change on the GUI thread
+        self.suggestionsFound.connect(self.addSuggestions)
+        self.analysisFinished.connect(self.finishAnalysis)
+
+    def analyze(self, source):
+        with self.lock:
+            if source in self.jobs:
+                return
+            self.jobs[source] = []
+        if source not in self.watched:
+            self.watched.add(source)
+            source.peaksChanged.connect(lambda: self.analyzeSilence(source))
+        self.analyzeSilence(source)
+        if SCENE_DETECTION and "scene" not in source.analyzed:
+            self.submit(source, lambda job: self.planScenes(job, source), PRIORITY_VISIBLE, "scenes")
+
+    def submit(self, source, run, priority, label):
+        with self.lock:
+            jobs = self.jobs.get(source)
+            if jobs is None:
+                return
+            job = self.scheduler.submit(lambda job: self.runJob(job, source, run), priority,
+                                        label=f"{label} {source.file_name}")
+            jobs.append(job)
+
+    def runJob(self, job, source, run):
+        try:
+            run(job)
+        finally:
+            with self.lock:
+                jobs = self.jobs.get(source)
+                if jobs is not None and job in jobs:
+                    jobs.remove(job)
+
+    def analyzeSilence(self, source):
+        # Only the finished pyramid is analysed; partial ones arrive while the waveform is still decoding
+        if source.peaks is None or source.load_progress is not None or "silence" in source.analyzed:
+            return
+        peaks = source.peaks
+        self.submit(source, lambda job: self.findSilences(source, peaks), PRIORITY_VISIBLE, "silences")
+
+    def findSilences(self, source, peaks):
+        self.suggestionsFound.emit(source, "silence", silence_cuts(peaks))
+        self.analysisFinished.emit(source, "silence")
+
+    def planScenes(self, job, source):
+        info = probe(source.path)
+        if not info.has_video or not info.duration:
+            self.analysisFinished.emit(source, "scene")
+            return
+        fingerprint = file_fingerprint(source.path)
+        starts = np.arange(0, info.duration, SCENE_CHUNK_SECONDS).tolist()
+        with self.lock:
+            self.scene_chunks[source] = len(starts)
+        for start in starts:
+            end = min(start + SCENE_CHUNK_SECONDS, info.duration)
+            self.submit(source, lambda job, start=start, end=end: self.detectScenes(job, source, fingerprint,
+                                                                                    start, end),
+                        PRIORITY_BACKGROUND, "scenes")
+
+    def detectScenes(self, job, source, fingerprint, start, end):
+        key = scene_key(fingerprint, start)
+        path = analysis_cache.get(key)
+        if path is not None:
+            try:
+                self.suggestionsFound.emit(source, "scene", np.load(path))
+                self.finishSceneChunk(source)
+                return
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable analysis cache entry {path}: {e}")
+        try:
+            changes = scene_changes(source.path, start, end, cancelled=lambda: job.cancelled)
+        except Exception as e:
+            print(f"Error detecting scenes: {e}")
+            return
+        if changes is None:
+            return
+        try:
+            analysis_cache.put(key, lambda stream: np.save(stream, changes))
+        except OSError as e:
+            print(f"Could not write analysis cache: {e}")
+        self.suggestionsFound.emit(source, "scene", changes)
+        self.finishSceneChunk(source)
+
+    def finishSceneChunk(self, source):
+        # Scenes are complete once every chunk reported; a cancelled or failed chunk leaves them incomplete
+        with self.lock:
+            remaining = self.scene_chunks.get(source)
+            if remaining is None:
+                return
+            self.scene_chunks[source] = remaining - 1
+        if remaining == 1:
+            self.analysisFinished.emit(source, "scene")
+
+    def addSuggestions(self, source, kind, times):
+        source.addSuggestions(kind, times)
+
+    def finishAnalysis(self, source, kind):
+        source.finishAnalysis(kind)
+
+    def cancel(self, source):
+        with self.lock:
+            jobs = self.jobs.pop(source, [])
+            self.scene_chunks.pop(source, None)
+        for job in jobs:
+            self.scheduler.cancel(job)
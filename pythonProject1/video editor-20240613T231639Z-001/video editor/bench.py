@@ -0,0 +1,200 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")  # Before Qt loads, so no display is needed
+
+import numpy as np
+from PyQt5 import QtCore, QtGui, QtWidgets
+import s
+from media import MediaSource
+from thumbnails import THUMBNAIL_HEIGHT, ThumbnailProvider, thumbnail_interval
+from timeline import Track
+from waveform import BASE_SHIFT, WAVEFORM_SAMPLE_RATE, PeakPyramid
+
+VIEW_WIDTH = 1920  # Pixels rendered per frame, as in a maximised window
+TRACK_HEIGHT = 60
+RULER_HEIGHT = 50
+SCROLL_STEP = VIEW_WIDTH // 4  # Each frame scrolls a quarter of the view, so tile caches get hits and misses
+DURATIONS = [60, 3600]
+PIXEL_PER_SECONDS = [0.05, 1, 10, 100]
+CUT_COUNTS = [0, 100, 1000]
+PAINT_MODES = ["batched", "per-pixel"]
+WIDGETS = ["audio", "video", "ruler"]
+FRAMES = 20
+REGRESSION_THRESHOLD = 1.2  # A case this much slower than the baseline is reported as a regression,
+REGRESSION_MIN_MS = 0.1  # unless it lost less than this, which is timer noise for the cheapest cases
+
+
+def synthetic_peaks(duration, seed=0):
+    # Base-level bins for a speech-like signal: loud bursts with pauses between them, no PCM is materialised
+    bins = int(duration * WAVEFORM_SAMPLE_RATE) >> BASE_SHIFT
+    generator = np.random.default_rng(seed)
+    envelope = np.repeat(generator.uniform(0, 1, bins // 64 + 1) > 0.3, 64)[:bins].astype(np.float32)
+    amplitude = generator.uniform(0.05, 0.9, bins).astype(np.float32) * (0.02 + envelope)
+    base = (-amplitude, amplitude, np.square(amplitude * 0.7))
+    return PeakPyramid(PeakPyramid.build_levels(base), WAVEFORM_SAMPLE_RATE, bins << BASE_SHIFT)
+
+
+def synthetic_track(duration, cut_count, seed=0):
+    # cut_count random cuts with every third segment deleted
+    track = Track(None, duration)
+    cuts = np.sort(np.random.default_rng(seed).uniform(0, duration, cut_count)).tolist()
+    bounds = [0] + cuts + [duration]
+    track.edit(cuts, [(bounds[index], bounds[index + 1]) for index in range(0, len(bounds) - 1, 3)])
+    return track
+
+
+def synthetic_thumbnails(provider, path, duration, pixel_per_second):
+    # Fills the memory cache for every filmstrip slot at this zoom, so no extraction is ever requested
+    width = round(THUMBNAIL_HEIGHT * 16 / 9)
+    image = QtGui.QImage(width, THUMBNAIL_HEIGHT, QtGui.QImage.Format_RGB888)
+    image.fill(QtGui.QColor(90, 110, 140))
+    interval = thumbnail_interval(width, pixel_per_second)
+    for seconds in range(0, int(duration), interval):
+        provider.cache.put((path, seconds), image)
+
+
+class BenchHost:
+    # Stands in for BottomHalfWidget, which the timeline widgets only ask for its thumbnail provider
+    def __init__(self, thumbnailProvider):
+        self.thumbnailProvider = thumbnailProvider
+        self.cuttingMode = False
+
+
+def make_widget(kind, duration, pixel_per_second, cut_count, paint_mode):
+    if kind == "ruler":
+        viewport = s.ViewportTransform(pixel_per_second)
+        widget = s.TimeRulerWidget(viewport=viewport)
+        widget.setDuration(duration)
+        widget.updatePixelPerSecond(pixel_per_second)
+        widget.resize(widget.minimumWidth(), RULER_HEIGHT)
+        return widget
+    source = MediaSource(f"synthetic-{duration}.mp4")
+    source.duration = duration
+    track = synthetic_track(duration, cut_count)
+    if kind == "audio":
+        source.peaks = synthetic_peaks(duration)
+        widget = s.AudioWaveformWidget(None, source.file_name, 0, source, track)
+        widget.setDuration(duration)
+    else:
+        provider = ThumbnailProvider(None)
+        synthetic_thumbnails(provider, source.path, duration, pixel_per_second)
+        widget = s.VideoTimelineWidget(None, BenchHost(provider), source.file_name, 0, source, track)
+        widget.updateDuration(duration, source.file_name)
+    widget.batched_painting = paint_mode == "batched"
+    widget.updatePixelPerSecond(pixel_per_second)
+    widget.resize(max(int(duration * pixel_per_second), 1), TRACK_HEIGHT)
+    return widget
+
+
+def render_frames(widget, frames):
+    # Renders a VIEW_WIDTH window of widget per frame, scrolling by SCROLL_STEP and wrapping at the end
+    image = QtGui.QImage(VIEW_WIDTH, widget.height(), QtGui.QImage.Format_ARGB32_Premultiplied)
+    span = max(widget.width() - VIEW_WIDTH, 0)
+    for frame in range(frames):
+        x = (frame * SCROLL_STEP) % (span + SCROLL_STEP) if span else 0
+        image.fill(QtCore.Qt.transparent)
+        yield lambda x=min(x, span): widget.render(image, QtCore.QPoint(), QtGui.QRegion(x, 0, VIEW_WIDTH,
+                                                                                       widget.height()))
+
+
+def measure(kind, duration, pixel_per_second, cut_count, paint_mode, frames=FRAMES):
+    widget = make_widget(kind, duration, pixel_per_second, cut_count, paint_mode)
+    times = []
+    for render in render_frames(widget, frames):
+        started = time.perf_counter()
+        render()
+        times.append((time.perf_counter() - started) * 1000)
+    # A second, identical pass under tracemalloc, so tracing does not skew the timings
+    widget = make_widget(kind, duration, pixel_per_second, cut_count, paint_mode)
+    tracemalloc.start()
+    peaks = []
+    allocated = []
+    for render in render_frames(widget, frames):
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        render()
+        after, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - before)
+        allocated.append(after - before)
+    tracemalloc.stop()
+    times = np.array(times)
+    return {"widget": kind, "duration": duration, "pixel_per_second": pixel_per_second, "cuts": cut_count,
+            "paint_mode": paint_mode, "frames": frames,
+            "frame_ms": {"first": round(float(times[0]), 3), "mean": round(float(times.mean()), 3),
+                         "p50": round(float(np.percentile(times, 50)), 3),
+                         "p95": round(float(np.percentile(times, 95)), 3), "max": round(float(times.max()), 3)},
+            "python_alloc_kb": {"peak": round(max(peaks) / 1024, 1),
+                                "retained_per_frame": round(float(np.mean(allocated)) / 1024, 1)}}
+
+
+def case_key(result):
+    return result["widget"], result["duration"], result["pixel_per_second"], result["cuts"], result["paint_mode"]
+
+
+def compare(results, baseline_path, threshold=REGRESSION_THRESHOLD):
+    # Lines describing every case whose median frame time grew by more than threshold against the baseline
+    with open(baseline_path) as stream:
+        baseline = {case_key(result): result for result in json.load(stream)["results"]}
+    regressions = []
+    for result in results:
+        previous = baseline.get(case_key(result))
+        if previous is None:
+            continue
+        before = previous["frame_ms"]["p50"]
+        after = result["frame_ms"]["p50"]
+        if after - before > REGRESSION_MIN_MS and after > before * threshold:
+            regressions.append(f"{case_key(result)}: p50 {before:.3f} ms -> {after:.3f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offscreen paint benchmark for the timeline widgets")
+    parser.add_argument("--widgets", default=",".join(WIDGETS))
+    parser.add_argument("--durations", default=",".join(map(str, DURATIONS)))
+    parser.add_argument("--zooms", default=",".join(map(str, PIXEL_PER_SECONDS)), help="Pixels per second")
+    parser.add_argument("--cuts", default=",".join(map(str, CUT_COUNTS)))
+    parser.add_argument("--paint-modes", default=",".join(PAINT_MODES))
+    parser.add_argument("--frames", type=int, default=FRAMES)
+    parser.add_argument("--output", help="Write the JSON here instead of stdout")
+    parser.add_argument("--baseline", help="Earlier JSON output to compare against; exits 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="Slowdown factor of the median frame time that counts as a regression")
+    arguments = parser.parse_args()
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv[:1])
+    matrix = itertools.product(arguments.widgets.split(","), map(float, arguments.durations.split(",")),
+                               map(float, arguments.zooms.split(",")), map(int, arguments.cuts.split(",")),
+                               arguments.paint_modes.split(","))
+    results = []
+    for kind, duration, pixel_per_second, cut_count, paint_mode in matrix:
+        if kind == "ruler" and (cut_count != 0 or paint_mode != "batched"):
+            continue  # The ruler has no cuts and only one paint path
+        results.append(measure(kind, duration, pixel_per_second, cut_count, paint_mode, arguments.frames))
+        print(f"{case_key(results[-1])}: p50 {results[-1]['frame_ms']['p50']:.3f} ms", file=sys.stderr)
+    report = {"meta": {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                       "qt": QtCore.QT_VERSION_STR, "pyqt": QtCore.PYQT_VERSION_STR, "platform": platform.platform(),
+                       "qpa": app.platformName(), "view_width": VIEW_WIDTH},
+              "results": results}
+    text = json.dumps(report, indent=1)
+    if arguments.output:
+        with open(arguments.output, "w") as stream:
+            stream.write(text)
+    else:
+        print(text)
+    if arguments.baseline:
+        regressions = compare(results, arguments.baseline, arguments.threshold)
+        for line in regressions:
+            print(f"Regression {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+import hashlib
+import os
+import threading
+
+CACHE_ROOT = os.environ.get("EDITOR_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "video-editor"))
+PARTIAL_HASH_BYTES = 1 << 20  # Hash the first and last megabyte of each file
+
+
+def file_fingerprint(path):
+    # Cheap content key: path, size and mtime plus a partial hash of the file contents
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    digest = hashlib.sha1(f"{path}|{stat.st_size}|{stat.st_mtime_ns}".encode())
+    with open(path, "rb") as media:
+        digest.update(media.read(PARTIAL_HASH_BYTES))
+        if stat.st_size > 2 * PARTIAL_HASH_BYTES:
+            media.seek(-PARTIAL_HASH_BYTES, os.SEEK_END)
+            digest.update(media.read(PARTIAL_HASH_BYTES))
+    return digest.hexdigest()
+
+
+class DiskCache:
+    def __init__(self, name, max_bytes):
+        self.directory = os.path.join(CACHE_ROOT, name)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+
+    def path_for(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        path = self.path_for(key)
+        try:
+            os.utime(path)  # Mark as recently used for LRU eviction
+        except OSError:
+            return None
+        return path
+
+    def put(self, key, write):
+        # write(stream) fills a temporary file which is then swapped in atomically
+        def make(temp_path):
+            with open(temp_path, "wb") as stream:
+                write(stream)
+        return self.put_file(key, make)
+
+    def put_file(self, key, make):
+        # For entries produced by an external tool: make(temp_path) creates the file
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path_for(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            make(temp_path)
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        self.evict()
+        return path
+
+    def evict(self):
+        with self.lock:
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
@@ -0,0 +1,273 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PyQt5 import QtCore
+from probe import probe
+from waveform import ffmpeg_executable
+
+EXPORT_WORKERS = int(os.environ.get("EDITOR_EXPORT_WORKERS", 0)) or max(1, min(4, (os.cpu_count() or 2) // 2))
+# Codecs whose cut edges we can re-encode to splice with stream-copied GOPs
+EDGE_ENCODERS = {"h264": "libx264", "hevc": "libx265"}
+EDGE_CRF = 18
+MIN_PIECE_SECONDS = 0.001
+# MPEG-TS keeps the parameter sets in band, so copied and re-encoded pieces still decode after concatenation
+PIECE_FORMAT = os.environ.get("EDITOR_EXPORT_PIECE_FORMAT", "mpegts")
+PIECE_EXTENSIONS = {"mpegts": "ts", "matroska": "mkv", "nut": "nut"}
+
+
+class Piece:
+    # One contiguous source range of the output, either stream-copied or re-encoded
+    def __init__(self, path, start, end, copy, output_path):
+        self.path = path
+        self.start = start
+        self.end = end
+        self.copy = copy
+        self.output_path = output_path
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+
+def stream_signature(info):
+    video = info.stream("video") or {}
+    audio = info.stream("audio") or {}
+    return (video.get("codec"), info.width, info.height, info.pix_fmt, info.fps,
+            audio.get("codec"), info.sample_rate, info.channels)
+
+
+def can_splice(infos):
+    # Copied GOPs can only be joined if every clip shares one format we can re-encode the edges to;
+    # otherwise everything is re-encoded to the first clip's format
+    signatures = {stream_signature(info) for info in infos}
+    return len(signatures) == 1 and next(iter(signatures))[0] in EDGE_ENCODERS
+
+
+def plan_pieces(ranges, work_dir, copy=True):
+    # ranges are (path, start, end) in output order. Inside each range the GOPs between the first and last
+    # keyframe are copied untouched; only the partial GOPs at the edges are re-encoded. Without copy every
+    # range is re-encoded.
+    infos = {path: probe(path, keyframes=True) for path in dict.fromkeys(path for path, _, _ in ranges)}
+    copyable = copy and can_splice(infos.values())
+    pieces = []
+
+    def add(path, start, end, copy):
+        if end - start >= MIN_PIECE_SECONDS:
+            name = f"piece{len(pieces):05d}.{PIECE_EXTENSIONS.get(PIECE_FORMAT, 'bin')}"
+            pieces.append(Piece(path, start, end, copy, os.path.join(work_dir, name)))
+
+    for path, start, end in ranges:
+        info = infos[path]
+        end = min(end, info.duration) if info.duration else end
+        first_key = info.keyframe_after(start)
+        last_key = info.keyframe_before(end)
+        if not copyable or not len(info.keyframes) or first_key >= last_key:
+            add(path, start, end, False)
+            continue
+        add(path, start, first_key, False)
+        add(path, first_key, last_key, True)
+        add(path, last_key, end, False)
+    return pieces, infos, copyable
+
+
+def piece_command(executable, piece, info, reference, copyable):
+    command = [executable, "-v", "error", "-nostdin", "-y", "-ss", f"{piece.start:.6f}", "-i", piece.path,
+               "-t", f"{piece.duration:.6f}", "-map", "0:v:0?", "-map", "0:a:0?"]
+    if piece.copy:
+        command += ["-c:v", "copy"]
+        if info.fps:
+            # -t cuts copied packets by decode time, which would let in the keyframe that starts the next
+            # piece; whole GOPs hold an exact number of frames
+            command += ["-frames:v", str(round(piece.duration * info.fps))]
+    else:
+        video = reference.stream("video") or {}
+        command += ["-c:v", EDGE_ENCODERS.get(video.get("codec"), "libx264") if copyable else "libx264",
+                    "-preset", "medium", "-crf", str(EDGE_CRF), "-pix_fmt", reference.pix_fmt or "yuv420p"]
+        if copyable and video.get("b_frames") is False:
+            # Edges reordered by B-frames would start their decode times before the copied GOP ends
+            command += ["-bf", "0"]
+        if not copyable and reference.width and reference.height:
+            command += ["-vf", f"scale={reference.width}:{reference.height},setsar=1"]
+        if reference.fps:
+            command += ["-r", f"{reference.fps:.6f}"]
+    # Audio is encoded the same way in every piece, so copied and re-encoded pieces always share one codec
+    command += ["-c:a", "aac", "-b:a", "192k"]
+    if reference.sample_rate:
+        command += ["-ar", str(reference.sample_rate)]
+    if reference.channels:
+        command += ["-ac", str(reference.channels)]
+    command += ["-avoid_negative_ts", "make_zero", "-progress", "pipe:1", "-nostats",
+                "-f", PIECE_FORMAT, piece.output_path]
+    return command
+
+
+def run_ffmpeg(command, progress=None, cancelled=None, messages=None):
+    # progress(seconds) gets the output time written so far; returns False if cancelled() turned true.
+    # messages, if given, collects what ffmpeg logged.
+    process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE, text=True)
+    try:
+        for line in process.stdout:
+            if cancelled and cancelled():
+                return False
+            key, _, value = line.strip().partition("=")
+            if key == "out_time_us" and progress and value.isdigit():
+                progress(int(value) / 1e6)
+    finally:
+        process.stdout.close()
+        if process.poll() is None:
+            process.kill()
+        status = process.wait()
+        errors = process.stderr.read()
+        process.stderr.close()
+    if messages is not None:
+        messages.append(errors)
+    if cancelled and cancelled():
+        return False
+    if status != 0:
+        raise RuntimeError(f"ffmpeg failed ({status}): {errors.strip()}")
+    return True
+
+
+def render_pieces(executable, pieces, infos, reference, copyable, report, cancelled, workers):
+    # Returns False if cancelled. When a piece fails the others are stopped before the error is raised.
+    failed = threading.Event()
+
+    def stopped():
+        return failed.is_set() or bool(cancelled and cancelled())
+
+    def render(index):
+        piece = pieces[index]
+        command = piece_command(executable, piece, infos[piece.path], reference, copyable)
+        return run_ffmpeg(command, lambda seconds: report(index, seconds), stopped)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="export") as pool:
+        futures = [pool.submit(render, index) for index in range(len(pieces))]
+        try:
+            for future in futures:
+                if not future.result():
+                    return False
+        except Exception:
+            failed.set()
+            raise
+        finally:
+            for future in futures:
+                future.cancel()
+    return True
+
+
+def concat_pieces(executable, pieces, work_dir, output_path, cancelled):
+    # Joins the pieces with the concat demuxer. Returns False if cancelled; raises if the joins did not line up.
+    list_path = os.path.join(work_dir, "pieces.txt")
+    with open(list_path, "w") as stream:
+        for piece in pieces:
+            escaped = piece.output_path.replace("'", "'\\''")
+            stream.write(f"file '{escaped}'\n")
+    command = [executable, "-v", "warning", "-nostdin", "-y", "-f", "concat", "-safe", "0", "-i", list_path,
+               "-map", "0", "-c", "copy", "-movflags", "+faststart", "-progress", "pipe:1", "-nostats",
+               output_path]
+    messages = []
+    if not run_ffmpeg(command, cancelled=cancelled, messages=messages):
+        return False
+    if "Non-monotonic DTS" in messages[0]:
+        # The muxer papers over these by nudging timestamps, which shows up as stutter or desync at the joins
+        raise RuntimeError("Pieces did not join with increasing timestamps")
+    return True
+
+
+def verify_output(executable, output_path, progress=None, cancelled=None):
+    # Decodes the whole output and fails on the first error, so a broken file is never reported as exported
+    command = [executable, "-v", "error", "-nostdin", "-xerror", "-i", output_path, "-map", "0:v?", "-map", "0:a?",
+               "-f", "null", "-progress", "pipe:1", "-nostats", "-"]
+    return run_ffmpeg(command, progress, cancelled)
+
+
+def export_timeline(ranges, output_path, progress=None, cancelled=None, workers=EXPORT_WORKERS):
+    # Renders the pieces on a bounded pool of ffmpeg processes, joins them with the concat demuxer and checks
+    # that the result decodes. A stream-copied export that fails is redone as a full re-encode.
+    # Returns False if cancelled.
+    executable = ffmpeg_executable()
+    if executable is None:
+        raise RuntimeError("ffmpeg is needed to export")
+    if not ranges:
+        raise ValueError("Nothing to export")
+    work_dir = tempfile.mkdtemp(prefix="export-")
+    try:
+        pieces, infos, copyable = plan_pieces(ranges, work_dir)
+        try:
+            return render_timeline(executable, ranges, pieces, infos, copyable, work_dir, output_path, progress,
+                                   cancelled, workers)
+        except RuntimeError as e:
+            if not copyable:
+                raise
+            print(f"Stream-copied export failed, re-encoding everything: {e}")
+        pieces, infos, copyable = plan_pieces(ranges, work_dir, copy=False)
+        return render_timeline(executable, ranges, pieces, infos, copyable, work_dir, output_path, progress,
+                               cancelled, workers)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def render_timeline(executable, ranges, pieces, infos, copyable, work_dir, output_path, progress, cancelled,
+                    workers):
+    reference = infos[ranges[0][0]]
+    total = sum(piece.duration for piece in pieces) or 1
+    done = [0.0] * len(pieces)
+    lock = threading.Lock()
+
+    def report(index, seconds):
+        with lock:
+            done[index] = min(seconds, pieces[index].duration)
+            fraction = sum(done) / total
+        if progress:
+            progress(fraction * 0.8)  # Joining is quick, the decode check after it is not
+
+    def report_check(seconds):
+        if progress:
+            progress(0.8 + 0.2 * min(seconds / total, 1))
+
+    if not render_pieces(executable, pieces, infos, reference, copyable, report, cancelled, workers):
+        return False
+    if not concat_pieces(executable, pieces, work_dir, output_path, cancelled):
+        return False
+    if not verify_output(executable, output_path, report_check, cancelled):
+        return False
+    if progress:
+        progress(1.0)
+    return True
+
+
+class Exporter(QtCore.QObject):
+    progressChanged = QtCore.pyqtSignal(float)
+    finished = QtCore.pyqtSignal(bool, str)  # Success, and the output path or the error message
+
+    def __init__(self, ranges, output_path, parent=None):
+        super().__init__(parent)
+        self.ranges = ranges
+        self.output_path = output_path
+        self.cancel_event = threading.Event()
+        self.last_percent = -1
+        self.thread = threading.Thread(target=self.run, name="export", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        try:
+            if export_timeline(self.ranges, self.output_path, self.reportProgress, self.cancel_event.is_set):
+                self.finished.emit(True, self.output_path)
+            else:
+                self.finished.emit(False, "Export cancelled")
+        except Exception as e:
+            self.finished.emit(False, str(e))
+
+    def reportProgress(self, fraction):
+        if int(fraction * 100) != self.last_percent:
+            self.last_percent = int(fraction * 100)
+            self.progressChanged.emit(fraction)
@@ -0,0 +1,161 @@
+import os
+from abc import ABC, abstractmethod
+from collections import deque
+
+DEFAULT_MEMORY_BUDGET = int(os.environ.get("EDITOR_UNDO_BUDGET_KB", 1024)) * 1024
+
+
+class Command(ABC):
+    # Commands store only what they change, in seconds, so they stay valid at any zoom level
+    label = ""
+    cost = 96  # Rough bytes held by one command, for the history memory budget
+
+    @abstractmethod
+    def redo(self):
+        pass
+
+    @abstractmethod
+    def undo(self):
+        pass
+
+
+class AddCut(Command):
+    label = "Cut"
+
+    def __init__(self, track, position):
+        self.track = track
+        self.position = position
+
+    def redo(self):
+        self.track.add_cut(self.position)
+
+    def undo(self):
+        self.track.remove_cut(self.position)
+
+
+class RemoveCut(AddCut):
+    label = "Remove cut"
+
+    def redo(self):
+        self.track.remove_cut(self.position)
+
+    def undo(self):
+        self.track.add_cut(self.position)
+
+
+class DeleteRange(Command):
+    label = "Delete"
+
+    def __init__(self, track, start, end):
+        self.track = track
+        self.start = start
+        self.end = end
+        # Ranges already deleted inside [start, end] must survive an undo
+        self.previous = [(max(s, start), min(e, end)) for s, e in zip(track.deleted_starts, track.deleted_ends)
+                         if s < end and e > start]
+        self.cost = Command.cost + 32 * len(self.previous)
+
+    def redo(self):
+        self.track.delete_range(self.start, self.end)
+
+    def undo(self):
+        self.track.restore_range(self.start, self.end)
+        for start, end in self.previous:
+            self.track.delete_range(start, end)
+
+
+class BulkEdit(Command):
+    # Many cuts and deleted ranges on one track applied in a single pass; undo restores the track as it was
+    label = "Edit"
+
+    def __init__(self, track, cuts, ranges, label=None):
+        self.track = track
+        self.cuts = list(cuts)
+        self.ranges = list(ranges)
+        if label is not None:
+            self.label = label
+        self.previous = track.snapshot()
+        self.cost = Command.cost + 16 * (len(self.cuts) + 2 * len(self.ranges)) + 8 * sum(map(len, self.previous))
+
+    def redo(self):
+        self.track.edit(self.cuts, self.ranges)
+
+    def undo(self):
+        self.track.restore_snapshot(self.previous)
+
+
+class Transaction(Command):
+    def __init__(self, label=""):
+        self.label = label
+        self.commands = []
+        self.cost = Command.cost
+
+    def add(self, command):
+        self.commands.append(command)
+        self.cost += command.cost
+
+    def redo(self):
+        for command in self.commands:
+            command.redo()
+
+    def undo(self):
+        for command in reversed(self.commands):
+            command.undo()
+
+
+class History:
+    def __init__(self, memory_budget=DEFAULT_MEMORY_BUDGET):
+        self.memory_budget = memory_budget
+        self.undo_stack = deque()
+        self.redo_stack = deque()
+        self.used = 0  # Cost of everything on both stacks
+        self.transactions = []
+
+    def push(self, command, apply=True):
+        # apply=False records a command whose effect has already happened
+        if apply:
+            command.redo()
+        if self.transactions:
+            self.transactions[-1].add(command)
+            return
+        self.undo_stack.append(command)
+        self.used += command.cost - sum(redone.cost for redone in self.redo_stack)
+        self.redo_stack.clear()
+        self.trim()
+
+    def begin(self, label=""):
+        self.transactions.append(Transaction(label))
+
+    def end(self):
+        transaction = self.transactions.pop()
+        if transaction.commands:
+            self.push(transaction, apply=False)
+
+    def undo(self):
+        if not self.undo_stack:
+            return None
+        command = self.undo_stack.pop()
+        command.undo()
+        self.redo_stack.append(command)
+        return command
+
+    def redo(self):
+        if not self.redo_stack:
+            return None
+        command = self.redo_stack.pop()
+        command.redo()
+        self.undo_stack.append(command)
+        return command
+
+    def trim(self):
+        # Forget the oldest steps once the budget is exceeded, then the redo steps furthest from the present,
+        # but always keep the latest undo step
+        while self.used > self.memory_budget and len(self.undo_stack) > 1:
+            self.used -= self.undo_stack.popleft().cost
+        while self.used > self.memory_budget and self.redo_stack:
+            self.used -= self.redo_stack.popleft().cost
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.used = 0
@@ -0,0 +1,113 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from PyQt5 import QtCore
+
+PRIORITY_VISIBLE = 0
+PRIORITY_BACKGROUND = 10
+
+
+class IngestJob:
+    def __init__(self, run, priority, label=""):
+        self.run = run  # Called as run(job) on a worker thread; long jobs should poll job.cancelled
+        self.priority = priority
+        self.label = label
+        self.cancel_event = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+
+class IngestScheduler(QtCore.QObject):
+    queueDepthChanged = QtCore.pyqtSignal(int)  # Jobs waiting plus jobs running
+
+    def __init__(self, max_workers=None, parent=None):
+        super().__init__(parent)
+        # Each job mostly waits on an ffmpeg process, so half the cores is enough to keep them busy
+        self.max_workers = max_workers or max(1, min(4, (os.cpu_count() or 2) // 2))
+        self.condition = threading.Condition()
+        self.queue = []  # Heap of (priority, sequence, job)
+        self.sequence = itertools.count()
+        self.workers = []
+        self.idle_workers = 0
+        self.active = set()
+        self.shutting_down = False
+
+    def submit(self, run, priority=PRIORITY_BACKGROUND, label=""):
+        job = IngestJob(run, priority, label)
+        with self.condition:
+            heapq.heappush(self.queue, (priority, next(self.sequence), job))
+            if self.idle_workers == 0 and len(self.workers) < self.max_workers:
+                worker = threading.Thread(target=self.workerLoop, name=f"ingest-{len(self.workers)}", daemon=True)
+                self.workers.append(worker)
+                worker.start()
+            self.condition.notify()
+        self.emitQueueDepth()
+        return job
+
+    def reprioritize(self, job, priority):
+        with self.condition:
+            if job.priority == priority:
+                return
+            job.priority = priority
+            for index, (_, sequence, queued) in enumerate(self.queue):
+                if queued is job:
+                    self.queue[index] = (priority, sequence, job)
+                    heapq.heapify(self.queue)
+                    break
+
+    def cancel(self, job):
+        if job is None:
+            return
+        job.cancel_event.set()
+        with self.condition:
+            remaining = [entry for entry in self.queue if entry[2] is not job]
+            if len(remaining) != len(self.queue):
+                self.queue = remaining
+                heapq.heapify(self.queue)
+        self.emitQueueDepth()
+
+    def queueDepth(self):
+        with self.condition:
+            return len(self.queue) + len(self.active)
+
+    def emitQueueDepth(self):
+        self.queueDepthChanged.emit(self.queueDepth())
+
+    def shutdown(self, timeout=2.0):
+        with self.condition:
+            self.shutting_down = True
+            for _, _, job in self.queue:
+                job.cancel_event.set()
+            for job in self.active:
+                job.cancel_event.set()
+            self.queue = []
+            self.condition.notify_all()
+        # Give cancelled jobs a moment to stop their decoders and subprocesses before the interpreter exits
+        deadline = time.monotonic() + timeout
+        for worker in self.workers:
+            worker.join(max(0.0, deadline - time.monotonic()))
+
+    def workerLoop(self):
+        while True:
+            with self.condition:
+                self.idle_workers += 1
+                while not self.queue and not self.shutting_down:
+                    self.condition.wait()
+                self.idle_workers -= 1
+                if self.shutting_down:
+                    return
+                _, _, job = heapq.heappop(self.queue)
+                self.active.add(job)
+            try:
+                if not job.cancelled:
+                    job.run(job)
+            except Exception as e:
+                print(f"Ingest job {job.label} failed: {e}")
+            finally:
+                with self.condition:
+                    self.active.discard(job)
+                self.emitQueueDepth()
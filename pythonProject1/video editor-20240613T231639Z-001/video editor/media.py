@@ -0,0 +1,96 @@
+import os
+import weakref
+import numpy as np
+from PyQt5 import QtCore
+
+
+class MediaSource(QtCore.QObject):
+    # One per source file; every segment cut from it shares these peaks and caches
+    durationChanged = QtCore.pyqtSignal(float)
+    peaksChanged = QtCore.pyqtSignal()
+    loadProgressChanged = QtCore.pyqtSignal()
+    proxyChanged = QtCore.pyqtSignal()
+    suggestionsChanged = QtCore.pyqtSignal()
+
+    def __init__(self, path, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.file_name = os.path.basename(path)
+        self.duration = 0
+        self.info = None  # MediaInfo from the probe, once it has run
+        self.peaks = None
+        self.load_progress = None  # Fraction decoded while the waveform is loading
+        self.loader = None
+        self.ingest_job = None
+        self.proxy_path = None  # Low resolution copy for playback; edits and export use path
+        self.proxy_progress = None  # Fraction transcoded while the proxy is being built
+        self.proxy_job = None
+        self.transcript = None  # Word level Transcript once transcribed
+        self.suggestions = {}  # Kind of suggested cut -> sorted array of source times, filled in as analysis runs
+        self.analyzed = set()  # Kinds whose analysis ran to the end, so suggestions holds all of them
+
+    @property
+    def playback_path(self):
+        return self.proxy_path or self.path
+
+    def setDuration(self, duration):
+        self.duration = duration
+        self.durationChanged.emit(duration)
+
+    def setInfo(self, info):
+        self.info = info
+
+    def setPeaks(self, peaks):
+        self.peaks = peaks
+        self.peaksChanged.emit()
+
+    def setLoadProgress(self, fraction):
+        if self.load_progress is not None:
+            self.load_progress = fraction
+            self.loadProgressChanged.emit()
+
+    def finishLoading(self, peaks):
+        self.load_progress = None
+        self.loader = None
+        self.ingest_job = None
+        if peaks is not None:
+            self.peaks = peaks
+        self.peaksChanged.emit()
+
+    def cancelLoading(self, scheduler):
+        scheduler.cancel(self.ingest_job)
+        self.load_progress = None
+        self.loader = None
+        self.ingest_job = None
+        self.loadProgressChanged.emit()
+
+    def setProxyProgress(self, fraction):
+        if self.proxy_progress is not None:
+            self.proxy_progress = fraction
+            self.proxyChanged.emit()
+
+    def finishProxy(self, proxy_path):
+        self.proxy_progress = None
+        self.proxy_job = None
+        self.proxy_path = proxy_path
+        self.proxyChanged.emit()
+
+    def finishAnalysis(self, kind):
+        self.analyzed.add(kind)
+
+    def addSuggestions(self, kind, times):
+        existing = self.suggestions.get(kind)
+        self.suggestions[kind] = times if existing is None else np.union1d(existing, times)
+        self.suggestionsChanged.emit()
+
+
+_sources = weakref.WeakValueDictionary()
+
+
+def source_for(path):
+    key = os.path.abspath(path)
+    source = _sources.get(key)
+    if source is None:
+        source = MediaSource(path)
+        _sources[key] = source
+    return source
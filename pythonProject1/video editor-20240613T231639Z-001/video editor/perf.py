@@ -0,0 +1,147 @@
+import functools
+import json
+import os
+import threading
+import time
+import numpy as np
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+# Set EDITOR_PERF=1 to record from startup; showing the overlay turns recording on as well
+PERF = os.environ.get("EDITOR_PERF", "0") != "0"
+PERF_BUFFER_SIZE = int(os.environ.get("EDITOR_PERF_BUFFER", 4096))  # Samples kept per timer
+PERF_DUMP = os.environ.get("EDITOR_PERF_DUMP", "")  # Also dump here when the editor closes
+OVERLAY_INTERVAL_MS = 500
+FPS_WINDOW = 2.0  # Seconds of frames the overlay's FPS is averaged over
+
+
+class RingBuffer:
+    # The latest samples of one timer as (start, milliseconds); once full the oldest are overwritten
+    def __init__(self, capacity=PERF_BUFFER_SIZE):
+        self.starts = np.zeros(capacity)
+        self.durations = np.zeros(capacity)
+        self.count = 0
+
+    def add(self, start, milliseconds):
+        index = self.count % len(self.starts)
+        self.starts[index] = start
+        self.durations[index] = milliseconds
+        self.count += 1
+
+    def samples(self):
+        # Oldest first
+        if self.count <= len(self.starts):
+            return self.starts[:self.count].copy(), self.durations[:self.count].copy()
+        index = self.count % len(self.starts)
+        return (np.concatenate((self.starts[index:], self.starts[:index])),
+                np.concatenate((self.durations[index:], self.durations[:index])))
+
+
+class PerfRecorder:
+    def __init__(self, enabled=PERF):
+        self.enabled = enabled
+        self.buffers = {}
+        self.lock = threading.Lock()  # Decoders record from the ingest workers
+
+    def record(self, name, start, milliseconds):
+        with self.lock:
+            buffer = self.buffers.get(name)
+            if buffer is None:
+                buffer = self.buffers[name] = RingBuffer()
+            buffer.add(start, milliseconds)
+
+    def samples(self, prefix=""):
+        # Durations of every timer whose name starts with prefix, merged
+        with self.lock:
+            parts = [buffer.samples() for name, buffer in self.buffers.items() if name.startswith(prefix)]
+        return (np.concatenate([starts for starts, _ in parts]) if parts else np.zeros(0),
+                np.concatenate([durations for _, durations in parts]) if parts else np.zeros(0))
+
+    def rate(self, name, window=FPS_WINDOW):
+        starts, _ = self.samples(name)
+        now = time.perf_counter()
+        return np.count_nonzero(starts >= now - window) / window
+
+    def summary(self):
+        with self.lock:
+            names = list(self.buffers)
+        summary = {}
+        for name in sorted(names):
+            _, durations = self.samples(name)
+            if len(durations):
+                summary[name] = {"count": self.buffers[name].count, "p50": float(np.percentile(durations, 50)),
+                                 "p99": float(np.percentile(durations, 99)), "max": float(durations.max())}
+        return summary
+
+    def dump(self, path):
+        # Every buffered sample, with start times in seconds on the perf_counter clock, for offline analysis
+        with self.lock:
+            buffers = {name: buffer.samples() for name, buffer in self.buffers.items()}
+        data = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "clock": "perf_counter", "summary": self.summary(),
+                "timers": {name: {"start": starts.tolist(), "ms": durations.tolist()}
+                           for name, (starts, durations) in buffers.items()}}
+        with open(path, "w") as stream:
+            json.dump(data, stream)
+        return path
+
+
+perf = PerfRecorder()
+
+
+def timed(name):
+    # Costs one attribute check per call while recording is off. Only wrap slots that take every argument
+    # their signal sends: PyQt cannot drop surplus arguments through the wrapper.
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not perf.enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                perf.record(name, start, (time.perf_counter() - start) * 1000)
+        return wrapper
+    return decorate
+
+
+class PerfOverlay(QtWidgets.QLabel):
+    # Frame rate, paint times and the ingest queue, drawn over the top right corner of window
+    def __init__(self, window, scheduler):
+        super().__init__(window)
+        self.scheduler = scheduler
+        self.setAttribute(QtCore.Qt.WA_TransparentForMouseEvents)
+        self.setStyleSheet("background-color: rgba(0, 0, 0, 160); color: white; padding: 4px;")
+        self.setFont(QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.FixedFont))
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(OVERLAY_INTERVAL_MS)
+        self.timer.timeout.connect(self.refresh)
+        # Every repaint of the window is one UpdateRequest, so counting them gives frames per second
+        window.installEventFilter(self)
+        self.hide()
+
+    def eventFilter(self, watched, event):
+        if event.type() == QtCore.QEvent.UpdateRequest and perf.enabled:
+            perf.record("frame", time.perf_counter(), 0.0)
+        return False
+
+    def toggle(self):
+        if self.isVisible():
+            self.timer.stop()
+            self.hide()
+            perf.enabled = PERF
+        else:
+            perf.enabled = True
+            self.refresh()
+            self.show()
+            self.raise_()
+            self.timer.start()
+
+    def refresh(self):
+        _, paints = perf.samples("paint")
+        lines = [f"FPS    {perf.rate('frame'):6.1f}"]
+        if len(paints):
+            lines.append(f"paint  p50 {np.percentile(paints, 50):6.2f} ms  p99 {np.percentile(paints, 99):6.2f} ms")
+        lines.append(f"queue  {self.scheduler.queueDepth()}")
+        self.setText("\n".join(lines))
+        self.adjustSize()
+        self.move(self.parent().width() - self.width() - 10, 10)
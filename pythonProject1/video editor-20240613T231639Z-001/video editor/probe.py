@@ -0,0 +1,258 @@
+import json
+import os
+import re
+import shutil
+import subprocess
+import threading
+import numpy as np
+from cache import DiskCache, file_fingerprint
+from waveform import ffmpeg_executable
+
+PROBE_VERSION = 4
+
+probe_cache = DiskCache("probes", int(os.environ.get("EDITOR_PROBE_CACHE_MB", 64)) * 1024 * 1024)
+
+
+class MediaInfo:
+    # What one probe learns about a file; shared by the loader, thumbnails, proxies, playhead and export
+    def __init__(self, path, duration=0.0, streams=None, keyframes=None):
+        self.path = path
+        self.duration = duration
+        self.streams = streams or []  # Dicts with index, type, codec and the type specific fields
+        self.keyframes = np.asarray(keyframes if keyframes is not None else [], dtype=np.float64)
+        self.indexed = keyframes is not None  # Whether keyframes has been built; see probe(keyframes=True)
+        video = self.stream("video")
+        audio = self.stream("audio")
+        self.has_video = video is not None
+        self.has_audio = audio is not None
+        self.width = video.get("width", 0) if video else 0
+        self.height = video.get("height", 0) if video else 0
+        self.fps = video.get("fps", 0.0) if video else 0.0
+        self.pix_fmt = video.get("pix_fmt", "") if video else ""
+        self.sample_rate = audio.get("sample_rate", 0) if audio else 0
+        self.channels = audio.get("channels", 0) if audio else 0
+
+    def stream(self, stream_type):
+        return next((stream for stream in self.streams if stream["type"] == stream_type), None)
+
+    def keyframe_before(self, seconds):
+        # Latest keyframe at or before seconds; 0 when the index is unknown
+        index = np.searchsorted(self.keyframes, seconds + 1e-6, side="right") - 1
+        return float(self.keyframes[index]) if index >= 0 else 0.0
+
+    def keyframe_after(self, seconds):
+        # Earliest keyframe at or after seconds; the duration when there is none
+        index = np.searchsorted(self.keyframes, seconds - 1e-6, side="left")
+        return float(self.keyframes[index]) if index < len(self.keyframes) else self.duration
+
+    def snap_to_frame(self, seconds):
+        if not self.fps:
+            return seconds
+        return round(seconds * self.fps) / self.fps
+
+    def to_json(self):
+        return {"version": PROBE_VERSION, "duration": self.duration, "streams": self.streams,
+                "keyframes": self.keyframes.tolist() if self.indexed else None}
+
+    @classmethod
+    def from_json(cls, path, data):
+        if data.get("version") != PROBE_VERSION:
+            raise ValueError("unsupported probe version")
+        return cls(path, data["duration"], data["streams"], data["keyframes"])
+
+
+def parse_rate(rate):
+    numerator, _, denominator = str(rate).partition("/")
+    try:
+        numerator = float(numerator)
+        denominator = float(denominator or 1)
+    except ValueError:
+        return 0.0
+    return numerator / denominator if numerator and denominator else 0.0
+
+
+def probe_ffprobe(path, executable):
+    # Container and stream headers only, which ffprobe reads without touching the packets
+    command = [executable, "-v", "error", "-of", "json", "-show_entries",
+               "format=duration:stream=index,codec_type,codec_name,width,height,pix_fmt,avg_frame_rate,"
+               "r_frame_rate,has_b_frames,sample_rate,channels", path]
+    result = subprocess.run(command, stdin=subprocess.DEVNULL, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe could not read {path}: {result.stderr.strip()}")
+    data = json.loads(result.stdout)
+    streams = []
+    for stream in data.get("streams", []):
+        entry = {"index": stream["index"], "type": stream.get("codec_type", ""), "codec": stream.get("codec_name", "")}
+        if entry["type"] == "video":
+            entry["width"] = int(stream.get("width", 0))
+            entry["height"] = int(stream.get("height", 0))
+            entry["pix_fmt"] = stream.get("pix_fmt", "")
+            entry["fps"] = parse_rate(stream.get("avg_frame_rate")) or parse_rate(stream.get("r_frame_rate"))
+            entry["b_frames"] = int(stream.get("has_b_frames", 0)) > 0
+        elif entry["type"] == "audio":
+            entry["sample_rate"] = int(stream.get("sample_rate", 0))
+            entry["channels"] = int(stream.get("channels", 0))
+        streams.append(entry)
+    duration = float(data.get("format", {}).get("duration", 0) or 0)
+    return MediaInfo(path, duration, streams)
+
+
+def keyframes_ffprobe(path, executable):
+    # Decodes only the keyframes of the first video stream and lists their times
+    command = [executable, "-v", "error", "-select_streams", "v:0", "-skip_frame", "nokey",
+               "-show_entries", "frame=best_effort_timestamp_time", "-of", "csv=p=0", path]
+    result = subprocess.run(command, stdin=subprocess.DEVNULL, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe could not index {path}: {result.stderr.strip()}")
+    return sorted(float(line.strip(",")) for line in result.stdout.split() if line.strip(",") not in ("", "N/A"))
+
+
+STREAM_PATTERN = re.compile(r"Stream #\d+:(\d+)[^:]*: (Video|Audio|Subtitle|Data): (\w+)(.*)")
+DURATION_PATTERN = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+CHANNEL_LAYOUTS = {"mono": 1, "stereo": 2, "2.1": 3, "quad": 4, "5.0": 5, "5.1": 6, "7.1": 8}
+
+
+def probe_ffmpeg(path, executable):
+    # Without ffprobe, ffmpeg prints the same headers when given an input and no output
+    command = [executable, "-hide_banner", "-nostdin", "-i", path]
+    result = subprocess.run(command, stdin=subprocess.DEVNULL, capture_output=True, text=True, errors="replace")
+    output = result.stderr
+    match = DURATION_PATTERN.search(output)
+    if match is None:
+        raise RuntimeError(f"ffmpeg could not read {path}")
+    hours, minutes, seconds = match.groups()
+    duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    streams = []
+    for index, stream_type, codec, details in STREAM_PATTERN.findall(output):
+        entry = {"index": int(index), "type": stream_type.lower(), "codec": codec}
+        if entry["type"] == "video":
+            size = re.search(r"(\d{2,5})x(\d{2,5})(?=[\s,\[])", details)
+            rate = re.search(r"(\d+(?:\.\d+)?) (?:fps|tbr)", details)
+            entry["width"], entry["height"] = (int(size.group(1)), int(size.group(2))) if size else (0, 0)
+            entry["fps"] = float(rate.group(1)) if rate else 0.0
+            pix_fmt = re.search(r"^(?:\s*\([^)]*\))*, (\w+)[(,]", details)
+            entry["pix_fmt"] = pix_fmt.group(1) if pix_fmt else ""
+            # Only a Baseline profile rules B-frames out; otherwise ffmpeg's banner does not tell
+            entry["b_frames"] = False if re.match(r"\s*\((?:Constrained )?Baseline\)", details) else None
+        elif entry["type"] == "audio":
+            rate = re.search(r"(\d+) Hz", details)
+            layout = re.search(r"Hz, ([\w.]+)", details)
+            entry["sample_rate"] = int(rate.group(1)) if rate else 0
+            entry["channels"] = CHANNEL_LAYOUTS.get(layout.group(1), 0) if layout else 0
+        streams.append(entry)
+    return MediaInfo(path, duration, streams)
+
+
+def keyframes_ffmpeg(path, executable):
+    # ffmpeg decoding only the keyframes of the first video stream, with showinfo printing their times
+    command = [executable, "-hide_banner", "-nostdin", "-nostats", "-skip_frame", "nokey", "-i", path,
+               "-map", "0:v:0?", "-vf", "showinfo", "-an", "-sn", "-f", "null", "-"]
+    result = subprocess.run(command, stdin=subprocess.DEVNULL, capture_output=True, text=True, errors="replace")
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg could not index {path}")
+    return sorted(float(value) for value in re.findall(r"pts_time:(-?\d+(?:\.\d+)?)", result.stderr))
+
+
+def probe_opencv(path):
+    # Last resort: container totals only, with no keyframe index
+    import cv2
+    capture = cv2.VideoCapture(path)
+    try:
+        if not capture.isOpened():
+            raise RuntimeError(f"Could not open {path}")
+        fps = capture.get(cv2.CAP_PROP_FPS)
+        frames = capture.get(cv2.CAP_PROP_FRAME_COUNT)
+        streams = [{"index": 0, "type": "video", "codec": "", "fps": fps,
+                    "width": int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                    "height": int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))}]
+    finally:
+        capture.release()
+    duration = frames / fps if fps > 0 and frames > 0 else 0.0
+    return MediaInfo(path, duration, streams)
+
+
+def run_probe(path):
+    executable = shutil.which("ffprobe")
+    if executable:
+        return probe_ffprobe(path, executable)
+    executable = ffmpeg_executable()
+    if executable:
+        return probe_ffmpeg(path, executable)
+    return probe_opencv(path)
+
+
+def run_keyframe_index(path, info):
+    if not info.has_video:
+        return []
+    executable = shutil.which("ffprobe")
+    if executable:
+        return keyframes_ffprobe(path, executable)
+    executable = ffmpeg_executable()
+    if executable:
+        return keyframes_ffmpeg(path, executable)
+    return []  # OpenCV cannot list keyframes; callers treat the file as having none
+
+
+_probes = {}
+_probe_locks = {}
+_probes_lock = threading.Lock()
+
+
+def probe(path, keyframes=False):
+    # Cached per file in memory and on disk; concurrent callers for the same file wait for one probe.
+    # The headers are cheap and come first. The keyframe index needs a pass over the whole video stream, so
+    # it is only built for callers that pass keyframes, and is then kept with the headers.
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    with _probes_lock:
+        info = _probes.get(key)
+        if info is not None and (info.indexed or not keyframes):
+            return info
+        lock = _probe_locks.setdefault(path, threading.Lock())
+    with lock:
+        with _probes_lock:
+            info = _probes.get(key)
+        if info is None:
+            info = load_cached_probe(path) or store_cached_probe(path, run_probe(path))
+            with _probes_lock:
+                _probes[key] = info
+        if keyframes and not info.indexed:
+            try:
+                info.keyframes = np.asarray(run_keyframe_index(path, info), dtype=np.float64)
+                info.indexed = True
+                store_cached_probe(path, info)
+            except RuntimeError as e:
+                # Left without an index for this session rather than rescanning the file on every call
+                print(f"Could not index keyframes: {e}")
+                info.indexed = True
+    return info
+
+
+def remember_probe(info):
+    # Takes info, e.g. from a saved project, as the probe of its file as it is now on disk
+    path = os.path.abspath(info.path)
+    stat = os.stat(path)
+    with _probes_lock:
+        _probes.setdefault((path, stat.st_size, stat.st_mtime_ns), info)
+
+
+def load_cached_probe(path):
+    entry = probe_cache.get(f"{file_fingerprint(path)}.json")
+    if entry is None:
+        return None
+    try:
+        with open(entry) as stream:
+            return MediaInfo.from_json(path, json.load(stream))
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Ignoring unreadable probe cache entry {entry}: {e}")
+        return None
+
+
+def store_cached_probe(path, info):
+    try:
+        probe_cache.put(f"{file_fingerprint(path)}.json",
+                        lambda stream: stream.write(json.dumps(info.to_json()).encode()))
+    except OSError as e:
+        print(f"Could not write probe cache: {e}")
+    return info
@@ -0,0 +1,182 @@
+import json
+import os
+import numpy as np
+from cache import file_fingerprint
+from probe import MediaInfo
+from transcript import Transcript
+from waveform import PeakPyramid
+
+PROJECT_VERSION = 1
+PROJECT_EXTENSION = ".vproj"
+
+
+class SourceState:
+    # What a project remembers about one source file. The arrays are memory-mapped from the sidecars, so
+    # opening a project only reads the pages the editor actually touches.
+    def __init__(self, path, duration=0.0, info=None, peaks=None, transcript=None, suggestions=None,
+                 thumbnails=None, analyzed=(), proxy_path=None):
+        self.path = path
+        self.duration = duration
+        self.info = info
+        self.peaks = peaks
+        self.transcript = transcript
+        self.suggestions = suggestions or {}
+        self.thumbnails = thumbnails  # (times, RGB images) as stacked arrays, or None
+        self.analyzed = set(analyzed)  # Suggestion kinds that are complete and need no new analysis
+        self.proxy_path = proxy_path  # In the proxy cache, which a project does not own
+
+
+class ClipState:
+    def __init__(self, source_index, start_time, duration, cuts, deleted, linked=True):
+        self.source_index = source_index
+        self.start_time = start_time
+        self.duration = duration
+        self.cuts = cuts
+        self.deleted = deleted  # [(start, end)] in clip-local seconds
+        self.linked = linked
+
+
+class Project:
+    def __init__(self, sources=None, clips=None, selected=None, current_source=None, pixel_per_second=None):
+        self.sources = sources or []
+        self.clips = clips or []
+        self.selected = selected  # Index into clips
+        self.current_source = current_source  # Index into sources of the clip in the player
+        self.pixel_per_second = pixel_per_second
+
+
+def sidecar_directory(project_path):
+    return os.path.splitext(project_path)[0] + "_data"
+
+
+def write_atomically(path, write):
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, "wb") as stream:
+            write(stream)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def save_array(directory, name, array):
+    try:
+        write_atomically(os.path.join(directory, name), lambda stream: np.save(stream, np.asarray(array)))
+    except OSError as e:
+        # Happens on platforms that refuse to replace a file that is still mapped; the old sidecar stays valid
+        print(f"Could not write project sidecar {name}: {e}")
+    return name
+
+
+def save_source(directory, state):
+    stat = os.stat(state.path)
+    fingerprint = file_fingerprint(state.path)
+    entry = {"path": state.path, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "fingerprint": fingerprint,
+             "duration": state.duration}
+    if state.info is not None:
+        entry["info"] = state.info.to_json()
+    peaks = state.peaks
+    if peaks is not None and peaks.levels:
+        # Every pyramid level is stored, so opening needs no rebuild; peaks never change for a file
+        name = f"{fingerprint}-peaks.npy"
+        if not os.path.exists(os.path.join(directory, name)):
+            save_array(directory, name, np.concatenate([np.stack(level).astype(np.float32)
+                                                        for level in peaks.levels], axis=1))
+        entry["peaks"] = {"file": name, "sample_rate": peaks.sample_rate, "sample_count": peaks.sample_count,
+                          "base_shift": peaks.base_shift, "levels": [len(level[0]) for level in peaks.levels]}
+    transcript = state.transcript
+    if transcript is not None:
+        entry["transcript"] = {"times": save_array(directory, f"{fingerprint}-transcript.npy",
+                                                   np.stack((transcript.starts, transcript.ends))),
+                               "words": transcript.words, "segments": transcript.segments}
+    entry["suggestions"] = {kind: save_array(directory, f"{fingerprint}-{kind}.npy", times)
+                            for kind, times in state.suggestions.items()}
+    entry["analyzed"] = sorted(kind for kind in state.analyzed if kind in state.suggestions)
+    if state.proxy_path:
+        entry["proxy"] = state.proxy_path
+    if state.thumbnails is not None:
+        times, images = state.thumbnails
+        entry["thumbnails"] = {"times": save_array(directory, f"{fingerprint}-thumbnail-times.npy", times),
+                               "images": save_array(directory, f"{fingerprint}-thumbnails.npy", images)}
+    return entry
+
+
+def save_project(project_path, project):
+    directory = sidecar_directory(project_path)
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.dirname(os.path.abspath(project_path))
+    sources = []
+    for state in project.sources:
+        entry = save_source(directory, state)
+        # Relative paths keep a project and its media movable together
+        entry["relative_path"] = os.path.relpath(os.path.abspath(state.path), base)
+        sources.append(entry)
+    manifest = {"version": PROJECT_VERSION, "sources": sources,
+                "clips": [{"source": clip.source_index, "start_time": clip.start_time, "duration": clip.duration,
+                           "cuts": list(clip.cuts), "deleted": [list(pair) for pair in clip.deleted],
+                           "linked": clip.linked} for clip in project.clips],
+                "selected": project.selected, "current_source": project.current_source,
+                "pixel_per_second": project.pixel_per_second}
+    write_atomically(project_path, lambda stream: stream.write(json.dumps(manifest, indent=1).encode()))
+
+
+def load_array(directory, name):
+    return np.load(os.path.join(directory, name), mmap_mode="r")
+
+
+def load_source(directory, base, entry):
+    path = entry["path"]
+    if "relative_path" in entry and os.path.exists(os.path.join(base, entry["relative_path"])):
+        path = os.path.normpath(os.path.join(base, entry["relative_path"]))
+    state = SourceState(path, entry.get("duration", 0.0))
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return state
+    if (stat.st_size, stat.st_mtime_ns) != (entry.get("size"), entry.get("mtime_ns")):
+        # The media changed since the save; everything derived from it is rebuilt
+        state.duration = 0.0
+        return state
+    try:
+        if "info" in entry:
+            try:
+                state.info = MediaInfo.from_json(path, entry["info"])
+            except ValueError:
+                pass  # Saved by another probe version; probed again, the rest of the data still holds
+        peaks = entry.get("peaks")
+        if peaks:
+            data = load_array(directory, peaks["file"])
+            bounds = np.cumsum([0] + peaks["levels"]).tolist()
+            levels = [(data[0, start:end], data[1, start:end], data[2, start:end])
+                      for start, end in zip(bounds[:-1], bounds[1:])]
+            state.peaks = PeakPyramid(levels, peaks["sample_rate"], peaks["sample_count"], peaks["base_shift"])
+        transcript = entry.get("transcript")
+        if transcript:
+            times = load_array(directory, transcript["times"])
+            state.transcript = Transcript(transcript["words"], times[0], times[1], transcript["segments"])
+        state.suggestions = {kind: load_array(directory, name) for kind, name in entry.get("suggestions", {}).items()}
+        state.analyzed = {kind for kind in entry.get("analyzed", []) if kind in state.suggestions}
+        if entry.get("proxy") and os.path.exists(entry["proxy"]):
+            state.proxy_path = entry["proxy"]
+        thumbnails = entry.get("thumbnails")
+        if thumbnails:
+            state.thumbnails = (load_array(directory, thumbnails["times"]), load_array(directory, thumbnails["images"]))
+    except (OSError, ValueError, KeyError, IndexError) as e:
+        print(f"Ignoring unreadable project data for {path}: {e}")
+    return state
+
+
+def load_project(project_path):
+    with open(project_path) as stream:
+        manifest = json.load(stream)
+    if manifest.get("version") != PROJECT_VERSION:
+        raise ValueError("Unsupported project version")
+    directory = sidecar_directory(project_path)
+    base = os.path.dirname(os.path.abspath(project_path))
+    sources = [load_source(directory, base, entry) for entry in manifest["sources"]]
+    clips = [ClipState(clip["source"], clip["start_time"], clip["duration"], clip["cuts"],
+                       [tuple(pair) for pair in clip["deleted"]], clip.get("linked", True))
+             for clip in manifest["clips"]]
+    return Project(sources, clips, manifest.get("selected"), manifest.get("current_source"),
+                   manifest.get("pixel_per_second"))
@@ -0,0 +1,113 @@
+import os
+import subprocess
+from PyQt5 import QtCore
+from cache import DiskCache, file_fingerprint
+from ingest import PRIORITY_BACKGROUND, IngestScheduler
+from probe import probe
+from waveform import ffmpeg_executable
+
+PROXY_HEIGHT = int(os.environ.get("EDITOR_PROXY_HEIGHT", 360))
+# Keyframe every PROXY_GOP frames so any seek decodes only a few frames; 1 makes the proxy all-intra
+PROXY_GOP = int(os.environ.get("EDITOR_PROXY_GOP", 12))
+# Transcodes run on their own small pool, so hour-long proxies never hold the workers waveforms, thumbnails
+# and transcripts are queued for
+PROXY_WORKERS = int(os.environ.get("EDITOR_PROXY_WORKERS", 1))
+
+proxy_cache = DiskCache("proxies", int(os.environ.get("EDITOR_PROXY_CACHE_MB", 8192)) * 1024 * 1024)
+
+
+def proxy_key(fingerprint):
+    return f"{fingerprint}-{PROXY_HEIGHT}p-g{PROXY_GOP}.mp4"
+
+
+def transcode_proxy(path, output_path, duration=0, progress=None, cancelled=None):
+    # Small, fast-decoding H.264 copy of path with the same timing; returns False if cancelled
+    executable = ffmpeg_executable()
+    if executable is None:
+        raise RuntimeError("ffmpeg is needed to build proxy media")
+    command = [executable, "-v", "error", "-nostdin", "-y", "-i", path,
+               "-map", "0:v:0", "-map", "0:a:0?", "-vf", f"scale=-2:{PROXY_HEIGHT}",
+               "-c:v", "libx264", "-preset", "ultrafast", "-tune", "fastdecode", "-crf", "28",
+               "-g", str(PROXY_GOP), "-keyint_min", str(PROXY_GOP), "-sc_threshold", "0", "-pix_fmt", "yuv420p",
+               "-c:a", "aac", "-b:a", "128k", "-movflags", "+faststart",
+               "-progress", "pipe:1", "-nostats", "-f", "mp4", output_path]
+    process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE, text=True)
+    try:
+        for line in process.stdout:
+            if cancelled and cancelled():
+                return False
+            key, _, value = line.strip().partition("=")
+            if key == "out_time_us" and progress and duration and value.isdigit():
+                progress(min(int(value) / 1e6 / duration, 1.0))
+    finally:
+        process.stdout.close()
+        if process.poll() is None:
+            process.kill()
+        status = process.wait()
+        errors = process.stderr.read()
+        process.stderr.close()
+    if status != 0:
+        raise RuntimeError(f"ffmpeg could not build a proxy for {path}: {errors.strip()}")
+    return True
+
+
+class ProxyManager(QtCore.QObject):
+    # Builds one proxy per source on a pool of PROXY_WORKERS. Playback and scrubbing use
+    # source.playback_path; export keeps reading source.path, the original.
+    progressChanged = QtCore.pyqtSignal(object, float)
+    proxyReady = QtCore.pyqtSignal(object, object)  # Source, proxy path or None on failure
+
+    def __init__(self, scheduler=None, parent=None):
+        super().__init__(parent)
+        self.scheduler = scheduler or IngestScheduler(PROXY_WORKERS, parent=self)
+        # Emitted from the ingest workers and delivered queued, so sources only change on the GUI thread
+        self.progressChanged.connect(self.updateProgress)
+        self.proxyReady.connect(self.finishProxy)
+
+    def request(self, source, priority=PRIORITY_BACKGROUND):
+        if source.proxy_path is None and source.proxy_job is None:
+            source.proxy_progress = 0.0
+            source.proxyChanged.emit()
+            source.proxy_job = self.scheduler.submit(lambda job: self.build(job, source), priority,
+                                                     label=f"proxy {source.file_name}")
+        return source.proxy_job
+
+    def build(self, job, source):
+        proxy_path = None
+        last_percent = [0]
+
+        def report(fraction):
+            if int(fraction * 100) != last_percent[0]:
+                last_percent[0] = int(fraction * 100)
+                self.progressChanged.emit(source, fraction)
+
+        try:
+            info = probe(source.path)
+            if not info.has_video or 0 < info.height <= PROXY_HEIGHT:
+                # Already as light as a proxy would be
+                self.proxyReady.emit(source, None)
+                return
+            key = proxy_key(file_fingerprint(source.path))
+            proxy_path = proxy_cache.get(key)
+            if proxy_path is None:
+                proxy_path = proxy_cache.put_file(
+                    key, lambda temp_path: self.transcode(job, source.path, info.duration, temp_path, report))
+        except Exception as e:
+            proxy_path = None
+            if not job.cancelled:
+                print(f"Error building proxy: {e}")
+        self.proxyReady.emit(source, proxy_path)
+
+    def transcode(self, job, path, duration, temp_path, report):
+        if not transcode_proxy(path, temp_path, duration, report, lambda: job.cancelled):
+            raise RuntimeError("cancelled")
+
+    def updateProgress(self, source, fraction):
+        source.setProxyProgress(fraction)
+
+    def finishProxy(self, source, proxy_path):
+        source.finishProxy(proxy_path)
+
+    def cancel(self, source):
+        self.scheduler.cancel(source.proxy_job)
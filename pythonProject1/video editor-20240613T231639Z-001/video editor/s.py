@@ -1,15 +1,128 @@
+from startup import startup_report, warm_up  # First, so the startup report's clock starts before the Qt imports
 from PyQt5 import QtCore, QtGui, QtWidgets
 from PyQt5.QtMultimedia import QMediaPlayer, QMediaContent
 from PyQt5.QtMultimediaWidgets import QVideoWidget
 import sys
 import os
-import librosa
-from moviepy.editor import VideoFileClip
-import threading
-from collections import deque
-import cv2
+import math
+import time
+from collections import OrderedDict
+import numpy as np
+from waveform import decode_peaks, load_cached_peaks, store_cached_peaks
+from cache import file_fingerprint
+from ingest import IngestScheduler, PRIORITY_BACKGROUND, PRIORITY_VISIBLE
+from media import source_for
+from timeline import Track
+from history import AddCut, BulkEdit, Command, DeleteRange, History
+from thumbnails import THUMBNAIL_HEIGHT, ThumbnailProvider, thumbnail_interval
+from proxy import ProxyManager
+from analysis import Analyzer
+from probe import probe, remember_probe
+from project import PROJECT_EXTENSION, ClipState, Project, SourceState, load_project, save_project
+from export import Exporter
+from transcript import Transcript
+from ai import get_chunked_editing_suggestions, transcribe_segments
+from perf import PERF_DUMP, PerfOverlay, perf, timed
+
+# Set EDITOR_PAINT_MODE=per-pixel to compare against the original unclipped, per-column painting
+BATCHED_PAINTING = os.environ.get("EDITOR_PAINT_MODE", "batched") != "per-pixel"
+FILMSTRIP = os.environ.get("EDITOR_FILMSTRIP", "1") != "0"
+WAVEFORM_TILE_WIDTH = 256
+MAX_WAVEFORM_TILES = 64
+SEGMENT_COLOR = QtGui.QColor(70, 130, 180)
+DELETED_SEGMENT_COLOR = QtGui.QColor(70, 130, 180, 60)
+RULER_TILE_WIDTH = 512
+MAX_RULER_TILES = 64
+RULER_LABEL_WIDTH = 120  # Widest tick label, so labels spilling into the next tile are drawn there too
+MIN_RULER_DURATION = 600  # Ruler length in seconds before any clip is loaded
+MIN_PIXEL_PER_SECOND = 0.05
+MAX_PIXEL_PER_SECOND = 200
+DEFAULT_PIXEL_PER_SECOND = 10
+ZOOM_SLIDER_STEPS = 1000
+WHEEL_ZOOM_FACTOR = 1.25  # Per 15 degree wheel notch
+ZOOM_SETTLE_MS = 30  # Zoom events closer together than this form one gesture and share one re-layout
+# Tick spacings the ruler may use, in seconds; the level of detail is picked from the current zoom
+RULER_INTERVALS = [1, 2, 5, 10, 15, 30, 60, 120, 300, 600, 900, 1800, 3600, 7200]
+RULER_LABEL_SPACING = 90  # Minimum pixels between labelled ticks
+RULER_MINOR_SPACING = 8  # Minimum pixels between minor ticks
+PLAYHEAD_MAX_HOLD = 0.25  # Seconds the playhead may run ahead of a decoder report before it jumps back
+SUGGESTION_COLORS = {"scene": QtGui.QColor(255, 90, 90), "silence": QtGui.QColor(255, 200, 0)}
+SUGGESTION_SNAP_PIXELS = 6  # A cut clicked this close to a suggested cut lands on it
+STATUS_MESSAGE_MS = 5000
+
+
+class ViewportTransform(QtCore.QObject):
+    # The single time-to-pixel mapping shared by the ruler, the tracks and the playhead
+    changed = QtCore.pyqtSignal(float)
+
+    def __init__(self, pixel_per_second=DEFAULT_PIXEL_PER_SECOND, parent=None):
+        super().__init__(parent)
+        self.pixel_per_second = pixel_per_second
+
+    def setPixelPerSecond(self, pixel_per_second):
+        pixel_per_second = min(max(pixel_per_second, MIN_PIXEL_PER_SECOND), MAX_PIXEL_PER_SECOND)
+        if pixel_per_second != self.pixel_per_second:
+            self.pixel_per_second = pixel_per_second
+            self.changed.emit(pixel_per_second)
+
+    def sliderValue(self):
+        span = math.log(MAX_PIXEL_PER_SECOND / MIN_PIXEL_PER_SECOND)
+        return round(math.log(self.pixel_per_second / MIN_PIXEL_PER_SECOND) / span * ZOOM_SLIDER_STEPS)
+
+    def setSliderValue(self, value):
+        span = math.log(MAX_PIXEL_PER_SECOND / MIN_PIXEL_PER_SECOND)
+        self.setPixelPerSecond(MIN_PIXEL_PER_SECOND * math.exp(value / ZOOM_SLIDER_STEPS * span))
+
+
+def drawTrackSegments(widget, painter, rect):
+    # Draws only the segments of widget.track that overlap rect, with a gap at each cut
+    pixel_per_second = widget.pixel_per_second
+    total_width = int(widget.duration * pixel_per_second)
+    track = widget.track
+    drawn = []
+    for start, end in track.segments_between(rect.left() / pixel_per_second, (rect.right() + 1) / pixel_per_second):
+        start_x = int(start * pixel_per_second) + 2 if start > 0 else 0  # Add space between segments
+        end_x = int(end * pixel_per_second) - 2 if end < widget.duration else total_width
+        deleted = track.is_deleted((start + end) / 2)
+        painter.setBrush(DELETED_SEGMENT_COLOR if deleted else SEGMENT_COLOR)
+        widget.drawSegment(painter, start_x, end_x)
+        drawn.append((start_x, end_x, deleted))
+    return drawn
+
+
+def suggestionsBetween(widget, kinds, start, end):
+    # Suggested cuts of the given kinds inside [start, end] of the clip, in clip-local seconds
+    if widget.source is None:
+        return np.zeros(0)
+    start = widget.start_time + max(start, 0)
+    end = widget.start_time + min(end, widget.duration)
+    found = []
+    for kind in kinds:
+        times = widget.source.suggestions.get(kind)
+        if times is not None:
+            found.append(times[np.searchsorted(times, start):np.searchsorted(times, end, side="right")])
+    return np.concatenate(found) - widget.start_time if found else np.zeros(0)
+
+
+def drawSuggestions(widget, painter, rect, kinds):
+    # Suggested cuts are dashed lines, so they read differently from the gaps of real cuts
+    pixel_per_second = widget.pixel_per_second
+    painter.save()
+    for kind in kinds:
+        times = suggestionsBetween(widget, [kind], (rect.left() - 1) / pixel_per_second,
+                                   (rect.right() + 2) / pixel_per_second)
+        if len(times):
+            painter.setPen(QtGui.QPen(SUGGESTION_COLORS[kind], 2, QtCore.Qt.DashLine))
+            painter.drawLines([QtCore.QLineF(x, 0, x, widget.height()) for x in (times * pixel_per_second).tolist()])
+    painter.restore()
+
 
 class Playhead(QtWidgets.QFrame):
+    # Follows the media clock: each decoder position report re-anchors the clock, and between reports the
+    # position is interpolated once per display refresh. Moving the 3 px frame only repaints the strips it
+    # leaves and enters.
+    seekRequested = QtCore.pyqtSignal(float)
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setMinimumWidth(3)
@@ -17,56 +130,91 @@ class Playhead(QtWidgets.QFrame):
         self.setStyleSheet("background-color: red;")
         self.setMouseTracking(True)
         self.dragging = False
-        self.pixel_per_second = 10
-        self.timer = QtCore.QTimer(self)
-        self.timer.timeout.connect(self.movePlayhead)
+        self.pixel_per_second = DEFAULT_PIXEL_PER_SECOND
+        self.origin = 0  # Contents x of time zero
+        self.frame_rate = 0  # Probed rate of the playing clip; 0 leaves positions unsnapped
         self.position = 0  # Track the position in seconds
+        self.playing = False
+        self.playback_rate = 1.0
+        self.clock_position = 0  # Media position at the last decoder report, in seconds
+        self.clock_time = time.monotonic()
+        self.timer = QtCore.QTimer(self)
+        self.timer.setTimerType(QtCore.Qt.PreciseTimer)
+        self.timer.timeout.connect(self.tick)
 
     def mousePressEvent(self, event):
         if event.button() == QtCore.Qt.LeftButton:
             self.dragging = True
-            self.timer.stop()
             event.accept()
 
     def mouseMoveEvent(self, event):
         if self.dragging:
-            cursor_position = event.globalX()
-            parent_position = self.parent().mapToGlobal(self.parent().pos())
-            new_x = cursor_position - parent_position.x()
+            new_x = self.parent().mapFromGlobal(event.globalPos()).x() - self.origin
             if 0 <= new_x <= self.parent().width():
-                self.move(int(new_x), self.y())
-                self.position = new_x / self.pixel_per_second  # Update position in seconds
+                self.showTime(self.snapToFrame(new_x / self.pixel_per_second, round))
             event.accept()
 
     def mouseReleaseEvent(self, event):
-        self.dragging = False
+        if self.dragging:
+            self.dragging = False
+            self.seekRequested.emit(self.position)
         event.accept()
 
-    def movePlayhead(self):
+    def refreshInterval(self):
+        screen = self.window().windowHandle().screen() if self.window().windowHandle() else None
+        screen = screen or QtGui.QGuiApplication.primaryScreen()
+        refresh_rate = screen.refreshRate() if screen else 0
+        return max(1, int(1000 / (refresh_rate or 60)))
+
+    def syncToMedia(self, position):
+        self.clock_position = position
+        self.clock_time = time.monotonic()
         if not self.dragging:
-            new_x = int(self.position * self.pixel_per_second + self.pixel_per_second / 10)
-            if new_x <= self.parent().width():
-                self.position += 0.1  # Move the position by 0.1 seconds
-                self.move(int(self.position * self.pixel_per_second), self.y())
-            else:
-                self.timer.stop()
+            # Small corrections backwards would make the line jitter while playing; the clock catches up
+            behind = self.position - self.snapToFrame(position)
+            if not self.playing or not 0 < behind < PLAYHEAD_MAX_HOLD:
+                self.showTime(self.snapToFrame(position))
+
+    def setPlaying(self, playing, playback_rate=1.0):
+        self.syncToMedia(self.clockPosition())
+        self.playing = playing
+        self.playback_rate = playback_rate
+        if playing:
+            self.timer.start(self.refreshInterval())
+        else:
+            self.timer.stop()
 
-    def updatePixelPerSecond(self, pixel_per_second):
-        self.pixel_per_second = pixel_per_second
-        self.updatePosition(self.position)  # Ensure playhead is updated with new scaling
+    def clockPosition(self):
+        if not self.playing:
+            return self.clock_position
+        return self.clock_position + (time.monotonic() - self.clock_time) * self.playback_rate
 
-    def updatePosition(self, position):
+    def tick(self):
+        if not self.dragging:
+            position = self.snapToFrame(self.clockPosition())
+            if position > self.position:
+                self.showTime(position)
+
+    def snapToFrame(self, position, rounding=math.floor):
+        # While playing, the frame on screen is the last one whose presentation time has passed.
+        # Media positions are whole milliseconds, hence the half millisecond of slack.
+        if not self.frame_rate:
+            return position
+        return rounding((position + 0.0005) * self.frame_rate) / self.frame_rate
+
+    def showTime(self, position):
         self.position = position
-        new_x = int(self.position * self.pixel_per_second)
-        self.move(new_x, self.y())
+        x = self.origin + int(round(position * self.pixel_per_second))
+        if x != self.x():
+            self.move(x, self.y())
 
-    def updatePlayheadFromVideoPosition(self, video_position):
-        self.position = video_position
-        self.updatePosition(self.position)
+    def updatePixelPerSecond(self, pixel_per_second):
+        self.pixel_per_second = pixel_per_second
+        self.showTime(self.position)  # Ensure playhead is updated with new scaling
 
 
 class VideoTimelineWidget(QtWidgets.QWidget):
-    def __init__(self, parent=None, bottom_half_widget=None, file_name="", start_time=0):
+    def __init__(self, parent=None, bottom_half_widget=None, file_name="", start_time=0, source=None, track=None):
         super().__init__(parent)
         self.layout = QtWidgets.QHBoxLayout(self)
         self.layout.setSpacing(0)  # Reduce space between widgets
@@ -77,45 +225,43 @@ class VideoTimelineWidget(QtWidgets.QWidget):
         self.video_loaded = False
         self.file_name = file_name  # Track the file name
         self.bottom_half_widget = bottom_half_widget
-        self.cuts = []
+        self.track = track if track is not None else Track(source)
+        self.track.changed.connect(self.update)
         self.selected = False
-        self.start_time = start_time
+        self.source = source
+        self.start_time = start_time  # This segment shows [start_time, start_time + duration) of the source
+        self.batched_painting = BATCHED_PAINTING
+        self.filmstrip = FILMSTRIP
+        self.thumbnail_width = THUMBNAIL_HEIGHT * 16 / 9  # Until the first thumbnail gives the real aspect
+        self.thumbnails = getattr(bottom_half_widget, "thumbnailProvider", None)
+        if self.thumbnails is not None:
+            self.thumbnails.thumbnailReady.connect(self.thumbnailReady)
+        if source is not None:
+            source.suggestionsChanged.connect(self.update)
         self.setAcceptDrops(True)
         self.setFocusPolicy(QtCore.Qt.StrongFocus)
         self.setMouseTracking(True)
 
     def addCut(self, position):
-        self.cuts.append(position)
-        self.update()
+        self.track.add_cut(position)
 
-    def splitSegment(self, position):
-        segment1 = VideoTimelineWidget(self.parent(), self.bottom_half_widget, self.file_name, self.start_time)
-        segment2 = VideoTimelineWidget(self.parent(), self.bottom_half_widget, self.file_name, self.start_time + position)
-        segment1.duration = position
-        segment2.duration = self.duration - position
-        segment1.pixel_per_second = self.pixel_per_second
-        segment2.pixel_per_second = self.pixel_per_second
-        segment1.setMinimumWidth(int(segment1.duration * self.pixel_per_second))
-        segment2.setMinimumWidth(int(segment2.duration * self.pixel_per_second))
-        segment1.update()
-        segment2.update()
-        return segment1, segment2
+    def thumbnailReady(self, path):
+        if self.filmstrip and self.source is not None and path == self.source.path:
+            self.update()
 
+    @timed("paint video")
     def paintEvent(self, event):
         super().paintEvent(event)
         painter = QtGui.QPainter(self)
         painter.setRenderHint(QtGui.QPainter.Antialiasing)
         painter.setPen(QtCore.Qt.NoPen)
         total_width = int(self.duration * self.pixel_per_second)
-        painter.setBrush(QtGui.QColor(70, 130, 180))
-
-        start_x = 0
-        for cut in sorted(self.cuts):
-            cut_x = int(cut * self.pixel_per_second)
-            self.drawSegment(painter, start_x, cut_x - 2)  # Add space between segments
-            start_x = cut_x + 2  # Move start_x to next position with space
-
-        self.drawSegment(painter, start_x, total_width)
+        rect = event.rect() if self.batched_painting else self.rect()
+        painter.setClipRect(rect)
+        segments = drawTrackSegments(self, painter, rect)
+        if self.filmstrip and self.thumbnails is not None and self.source is not None:
+            self.drawFilmstrip(painter, rect, segments)
+        drawSuggestions(self, painter, rect, ["scene"])
 
         # Draw the file name
         painter.setPen(QtCore.Qt.white)
@@ -130,8 +276,48 @@ class VideoTimelineWidget(QtWidgets.QWidget):
         if width > 0:
             painter.drawRoundedRect(start_x, 0, width, self.height(), 10, 10)
 
+    def drawFilmstrip(self, painter, rect, segments):
+        # Thumbnails sit on a grid of source times, so split segments and nearby zoom levels share them.
+        # Only the slots inside rect are looked up, and the missing ones are requested in one batch.
+        clip = QtGui.QPainterPath()
+        for start_x, end_x, deleted in segments:
+            if not deleted and end_x > start_x:
+                clip.addRoundedRect(QtCore.QRectF(start_x, 0, end_x - start_x, self.height()), 10, 10)
+        if clip.isEmpty():
+            return
+        pixel_per_second = self.pixel_per_second
+        interval = thumbnail_interval(self.thumbnail_width, pixel_per_second)
+        first = math.floor((self.start_time + (rect.left() - self.thumbnail_width) / pixel_per_second) / interval)
+        last = math.floor((self.start_time + (rect.right() + 1) / pixel_per_second) / interval)
+        end_time = self.start_time + self.duration
+        path = self.source.path
+        visible = (max(first, 0) * interval, min(last * interval, end_time))
+        missing = []
+        painter.save()
+        painter.setClipPath(clip, QtCore.Qt.IntersectClip)
+        for index in range(max(first, 0), last + 1):
+            seconds = index * interval
+            if seconds >= end_time:
+                break
+            image = self.thumbnails.thumbnail(path, seconds)
+            if image is None:
+                missing.append(seconds)
+                continue
+            width = image.width() * self.height() / image.height()
+            self.thumbnail_width = width
+            x = (seconds - self.start_time) * pixel_per_second
+            painter.drawImage(QtCore.QRectF(x, 0, width, self.height()), image)
+        painter.restore()
+        if missing:
+            self.thumbnails.request(self, path, missing, visible)
+
+    def setFilmstrip(self, enabled):
+        self.filmstrip = enabled
+        self.update()
+
     def updateDuration(self, duration, file_name=""):
         self.duration = duration
+        self.track.duration = duration
         self.file_name = file_name  # Update the file name
         self.setMinimumWidth(int(self.duration * self.pixel_per_second))
         self.video_loaded = True
@@ -145,7 +331,6 @@ class VideoTimelineWidget(QtWidgets.QWidget):
     def mousePressEvent(self, event):
         if event.button() == QtCore.Qt.LeftButton and self.bottom_half_widget.cuttingMode:
             cut_position = event.pos().x() / self.pixel_per_second
-            self.addCut(cut_position)
             self.bottom_half_widget.addCutToPair(self, cut_position)
         else:
             self.selected = not self.selected
@@ -163,8 +348,56 @@ class VideoTimelineWidget(QtWidgets.QWidget):
         super().leaveEvent(event)
 
 
+class WaveformLoader(QtCore.QObject):
+    probed = QtCore.pyqtSignal(object)  # MediaInfo
+    durationReady = QtCore.pyqtSignal(float)
+    progressChanged = QtCore.pyqtSignal(float)
+    peaksReady = QtCore.pyqtSignal(object)  # Partial pyramid covering the decoded prefix
+    finished = QtCore.pyqtSignal(object)  # Final pyramid, or None on failure
+
+    def __init__(self, audio_path, duration, parent=None):
+        super().__init__(parent)
+        self.audio_path = audio_path
+        self.duration = duration
+        self.last_progress = 0.0
+
+    @timed("waveform decode")
+    def run(self, job=None):
+        peaks = None
+        try:
+            info = probe(self.audio_path)
+            self.probed.emit(info)
+            if not self.duration:
+                self.duration = info.duration
+                self.durationReady.emit(self.duration)
+            if not info.has_audio:
+                self.finished.emit(None)
+                return
+            # Reuse the peaks from a previous open of the same file if we have them
+            fingerprint = file_fingerprint(self.audio_path)
+            peaks = load_cached_peaks(fingerprint)
+            if peaks is None:
+                # Stream PCM out of the container and reduce it to peaks block by block
+                peaks = decode_peaks(self.audio_path, self.duration, progress=self.reportProgress,
+                                     partial=self.peaksReady.emit,
+                                     cancelled=lambda: job is not None and job.cancelled)
+                if peaks is not None:
+                    store_cached_peaks(fingerprint, peaks)
+        except Exception as e:
+            print(f"Error generating waveform: {e}")
+        self.finished.emit(peaks)
+
+    def reportProgress(self, fraction):
+        # Called per decoded block; only whole-percent steps are worth a queued signal
+        if int(fraction * 100) != int(self.last_progress * 100):
+            self.last_progress = fraction
+            self.progressChanged.emit(fraction)
+
+
 class AudioWaveformWidget(QtWidgets.QWidget):
-    def __init__(self, parent=None, file_name="", start_time=0):
+    durationLoaded = QtCore.pyqtSignal(float)
+
+    def __init__(self, parent=None, file_name="", start_time=0, source=None, track=None):
         super().__init__(parent)
         self.layout = QtWidgets.QHBoxLayout(self)
         self.layout.setSpacing(0)  # Reduce space between widgets
@@ -172,59 +405,71 @@ class AudioWaveformWidget(QtWidgets.QWidget):
         self.setFixedHeight(60)
         self.duration = 0
         self.pixel_per_second = 10
-        self.audio_data = None
-        self.cuts = []
+        self.track = track if track is not None else Track(source)
+        self.track.changed.connect(self.update)
         self.selected = False
+        self.batched_painting = BATCHED_PAINTING
+        self.waveform_tile_key = None
+        self.waveform_tiles = {}
         self.file_name = file_name  # Track the file name
+        # Peaks live on the shared source; this segment shows [start_time, start_time + duration) of it
+        self.source = source
         self.start_time = start_time
+        if source is not None:
+            source.peaksChanged.connect(self.update)
+            source.loadProgressChanged.connect(self.update)
+            source.durationChanged.connect(self.setSourceDuration)
+            source.suggestionsChanged.connect(self.update)
         self.setMouseTracking(True)
         self.volume_scale = 5.0  # Default scale for audio volume
 
+    @property
+    def peaks(self):
+        return self.source.peaks if self.source is not None else None
+
+    @property
+    def load_progress(self):
+        return self.source.load_progress if self.source is not None else None
+
+    @property
+    def sample_offset(self):
+        # First source sample shown by this segment
+        return int(self.start_time * self.peaks.sample_rate) if self.peaks is not None else 0
+
     def set_volume_scale(self, scale):
         self.volume_scale = scale
         self.update()
 
     def addCut(self, position):
-        self.cuts.append(position)
-        self.update()
-
-    def splitSegment(self, position):
-        segment1 = AudioWaveformWidget(self.parent(), self.file_name, self.start_time)
-        segment2 = AudioWaveformWidget(self.parent(), self.file_name, self.start_time + position)
-        segment1.duration = position
-        segment2.duration = self.duration - position
-        segment1.pixel_per_second = self.pixel_per_second
-        segment2.pixel_per_second = self.pixel_per_second
-        segment1.audio_data = self.audio_data[:int(len(self.audio_data) * (position / self.duration))]
-        segment2.audio_data = self.audio_data[int(len(self.audio_data) * (position / self.duration)):]
-        segment1.setMinimumWidth(int(segment1.duration * self.pixel_per_second))
-        segment2.setMinimumWidth(int(segment2.duration * self.pixel_per_second))
-        segment1.update()
-        segment2.update()
-        return segment1, segment2
+        self.track.add_cut(position)
 
+    @timed("paint audio")
     def paintEvent(self, event):
         super().paintEvent(event)
         painter = QtGui.QPainter(self)
         painter.setRenderHint(QtGui.QPainter.Antialiasing)
         painter.setPen(QtCore.Qt.NoPen)
         total_width = int(self.duration * self.pixel_per_second)
-        painter.setBrush(QtGui.QColor(70, 130, 180))  # Same color as video timeline
-
-        start_x = 0
-        for cut in sorted(self.cuts):
-            cut_x = int(cut * self.pixel_per_second)
-            self.drawSegment(painter, start_x, cut_x - 2)  # Add space between segments
-            start_x = cut_x + 2  # Move start_x to next position with space
+        rect = event.rect() if self.batched_painting else self.rect()
+        painter.setClipRect(rect)
+        drawTrackSegments(self, painter, rect)
 
-        self.drawSegment(painter, start_x, total_width)
-
-        if self.audio_data is not None:
+        if self.peaks is not None:
             painter.setBrush(QtGui.QColor(255, 255, 255))  # White color for waveform
-            step = max(1, len(self.audio_data) // total_width)
-            for x in range(total_width):
-                value = abs(self.audio_data[x * step] * self.volume_scale) * self.height() // 2
-                painter.drawRoundedRect(int(x), int(self.height() // 2 - value), 1, int(value * 2), 1, 1)
+            # Only the exposed columns are looked up, at the nearest pyramid level
+            first_x = max(rect.left(), 0)
+            last_x = min(rect.right() + 1, total_width)
+            if last_x > first_x:
+                if self.batched_painting:
+                    self.drawWaveformTiles(painter, first_x, last_x)
+                else:
+                    self.drawWaveformColumns(painter, first_x, last_x)
+        drawSuggestions(self, painter, rect, ["silence"])
+
+        if self.load_progress is not None:
+            painter.setPen(QtCore.Qt.white)
+            painter.drawText(10, 30, f"Loading waveform... {int(self.load_progress * 100)}%")
+            painter.setPen(QtCore.Qt.NoPen)
 
         if self.selected:
             painter.setBrush(QtGui.QColor(0, 0, 255, 128))
@@ -235,37 +480,93 @@ class AudioWaveformWidget(QtWidgets.QWidget):
         if width > 0:
             painter.drawRoundedRect(start_x, 0, width, self.height(), 10, 10)
 
-    def generate_waveform(self, audio_path):
-        def load_audio():
-            try:
-                # Extract audio from video
-                video_clip = VideoFileClip(audio_path)
-                audio_path_extracted = "extracted_audio.wav"
-                video_clip.audio.write_audiofile(audio_path_extracted)
-                self.file_name = os.path.basename(audio_path)  # Set file name
-                # Load audio using librosa
-                y, sr = librosa.load(audio_path_extracted, sr=None, mono=True)
-                self.audio_data = y
-                self.update()
-            except Exception as e:
-                print(f"Error generating waveform: {e}")
-
-        threading.Thread(target=load_audio).start()
+    def waveformHeights(self, first_x, count):
+        samples_per_pixel = self.peaks.sample_rate / self.pixel_per_second
+        first_sample = self.sample_offset + first_x * samples_per_pixel
+        lows, highs, _ = self.peaks.columns(first_sample, samples_per_pixel, count)
+        half_height = self.height() // 2
+        values = np.maximum(np.abs(lows), np.abs(highs)) * self.volume_scale * half_height
+        return np.minimum(values, half_height).astype(int)
+
+    def drawWaveformColumns(self, painter, first_x, last_x):
+        half_height = self.height() // 2
+        values = self.waveformHeights(first_x, last_x - first_x)
+        for x, value in zip(range(first_x, last_x), values.tolist()):
+            painter.drawRoundedRect(x, half_height - value, 1, value * 2, 1, 1)
+
+    def drawWaveformTiles(self, painter, first_x, last_x):
+        # Tiles are cached paths, valid until the source, zoom, scale or height change
+        tile_key = (self.peaks, self.sample_offset, self.pixel_per_second, self.volume_scale, self.height())
+        if tile_key != self.waveform_tile_key or len(self.waveform_tiles) > MAX_WAVEFORM_TILES:
+            self.waveform_tile_key = tile_key
+            self.waveform_tiles = {}
+        painter.setRenderHint(QtGui.QPainter.Antialiasing, False)
+        for tile in range(first_x // WAVEFORM_TILE_WIDTH, (last_x - 1) // WAVEFORM_TILE_WIDTH + 1):
+            path = self.waveform_tiles.get(tile)
+            if path is None:
+                path = self.buildWaveformTile(tile)
+                self.waveform_tiles[tile] = path
+            painter.drawPath(path)
+
+    def buildWaveformTile(self, tile):
+        first_x = tile * WAVEFORM_TILE_WIDTH
+        last_x = min(first_x + WAVEFORM_TILE_WIDTH, int(self.duration * self.pixel_per_second))
+        path = QtGui.QPainterPath()
+        if last_x <= first_x:
+            return path
+        half_height = self.height() // 2
+        values = self.waveformHeights(first_x, last_x - first_x).tolist()
+        # Step outline: each column spans [x, x + 1) like the per-pixel rectangles
+        top = []
+        bottom = []
+        for x, value in zip(range(first_x, last_x), values):
+            top += [QtCore.QPointF(x, half_height - value), QtCore.QPointF(x + 1, half_height - value)]
+            bottom += [QtCore.QPointF(x, half_height + value), QtCore.QPointF(x + 1, half_height + value)]
+        path.addPolygon(QtGui.QPolygonF(top + bottom[::-1]))
+        path.closeSubpath()
+        return path
+
+    @timed("generate waveform")
+    def generate_waveform(self, scheduler, priority=PRIORITY_BACKGROUND):
+        # Loads once per source; further segments or imports of the same file share the result
+        source = self.source
+        self.file_name = source.file_name  # Set file name
+        if source.peaks is None and source.ingest_job is None:
+            source.load_progress = 0.0
+            # The loader only talks to the source through queued signals
+            source.loader = WaveformLoader(source.path, source.duration)
+            source.loader.probed.connect(source.setInfo)
+            source.loader.durationReady.connect(source.setDuration)
+            source.loader.progressChanged.connect(source.setLoadProgress)
+            source.loader.peaksReady.connect(source.setPeaks)
+            source.loader.finished.connect(source.finishLoading)
+            source.ingest_job = scheduler.submit(source.loader.run, priority, label=source.file_name)
+            # The keyframe index is a pass over the whole video, so it is built after the load instead of
+            # before the duration is known; thumbnails and export build it themselves if they get there first
+            scheduler.submit(lambda job, path=source.path: probe(path, keyframes=True), PRIORITY_BACKGROUND,
+                             label=f"keyframes {source.file_name}")
+        return source.ingest_job
+
+    def setSourceDuration(self, duration):
+        # Only a segment spanning the whole clip follows the probed source duration
+        if self.start_time == 0 and not self.duration:
+            self.setDuration(duration)
+
+    def setDuration(self, duration):
+        self.duration = duration
+        self.track.duration = duration
+        self.setMinimumWidth(int(self.duration * self.pixel_per_second))
+        self.update()
+        self.durationLoaded.emit(duration)
 
     def updatePixelPerSecond(self, pixel_per_second):
         self.pixel_per_second = pixel_per_second
         self.setMinimumWidth(int(self.duration * self.pixel_per_second))
         self.update()
 
-    def removeLastCut(self):
-        if self.cuts:
-            self.cuts.pop()
-            self.update()
-
     def mousePressEvent(self, event):
         if event.button() == QtCore.Qt.LeftButton and self._getCuttingMode():
             cut_position = event.pos().x() / self.pixel_per_second
-            self.addCut(cut_position)
             self._getBottomHalfWidget().addCutToPair(self, cut_position)
         else:
             self.selected = not self.selected
@@ -302,16 +603,22 @@ class BottomHalfWidget(QtWidgets.QWidget):
         self.setupUi()
         if self.controlWidget:
             self.controlWidget.fileOpened.connect(self.load_video)
-            self.controlWidget.positionChanged.connect(self.updatePlayheadPosition)
+            self.controlWidget.exportRequested.connect(self.exportTimeline)
             self.controlWidget.mediaPlayer.positionChanged.connect(self.updatePlayheadFromMediaPosition)
             self.controlWidget.mediaPlayer.stateChanged.connect(self.updatePlayheadState)
         self.cuttingMode = False
+        self.ingestScheduler = IngestScheduler(parent=self)
+        self.thumbnailProvider = ThumbnailProvider(self.ingestScheduler, parent=self)
+        self.proxyManager = ProxyManager(parent=self)
+        self.analyzer = Analyzer(self.ingestScheduler, parent=self)
+        if self.controlWidget:
+            self.ingestScheduler.queueDepthChanged.connect(self.controlWidget.setIngestQueueDepth)
         self.overlayWidget = OverlayWidget(self)
         self.overlayWidget.raise_()  # Ensure the overlay widget is always on top
         self.video_audio_pairs = []
         self.selected_video_audio_pair = None
-        self.undoStack = deque(maxlen=100)
-        self.redoStack = deque(maxlen=100)
+        self.history = History()
+        self.exporter = None
 
     def setupUi(self):
         self.layout = QtWidgets.QVBoxLayout(self)
@@ -319,8 +626,18 @@ class BottomHalfWidget(QtWidgets.QWidget):
         self.scrollArea.setWidgetResizable(True)
         self.scrollAreaWidgetContents = QtWidgets.QWidget()
         self.scrollArea.setWidget(self.scrollAreaWidgetContents)
+        self.scrollArea.horizontalScrollBar().valueChanged.connect(self.reprioritizeIngest)
+        self.scrollArea.verticalScrollBar().valueChanged.connect(self.reprioritizeIngest)
         self.timelineLayout = QtWidgets.QVBoxLayout(self.scrollAreaWidgetContents)
-        self.timeRulerWidget = TimeRulerWidget(parent=self.scrollAreaWidgetContents)
+        self.viewport = ViewportTransform(parent=self)
+        self.viewport.changed.connect(self.scheduleZoom)
+        self.zoomTimer = QtCore.QTimer(self)
+        self.zoomTimer.setSingleShot(True)
+        self.zoomTimer.setInterval(ZOOM_SETTLE_MS)
+        self.zoomTimer.timeout.connect(self.applyZoom)
+        self.zoomAnchor = None  # (time, viewport x) kept fixed on screen while zooming
+        self.scrollArea.viewport().installEventFilter(self)
+        self.timeRulerWidget = TimeRulerWidget(parent=self.scrollAreaWidgetContents, viewport=self.viewport)
         self.timelineLayout.addWidget(self.timeRulerWidget)
         self.videoLayout = QtWidgets.QVBoxLayout()
         self.audioLayout = QtWidgets.QVBoxLayout()
@@ -328,6 +645,9 @@ class BottomHalfWidget(QtWidgets.QWidget):
         self.timelineLayout.addLayout(self.audioLayout)
         self.playhead = Playhead(self.scrollAreaWidgetContents)
         self.playhead.setGeometry(0, 0, 2, self.scrollAreaWidgetContents.height())
+        self.playhead.origin = self.timelineLayout.contentsMargins().left()
+        self.playhead.showTime(0)
+        self.playhead.seekRequested.connect(self.seekToPlayhead)
         self.layout.addWidget(self.scrollArea)
         self.setLayout(self.layout)
         self.setMouseTracking(True)
@@ -337,44 +657,241 @@ class BottomHalfWidget(QtWidgets.QWidget):
         self.playhead.setFixedHeight(self.scrollAreaWidgetContents.height())
         self.overlayWidget.resize(self.size())
 
-    def updatePlayheadPosition(self, percentage):
-        max_width = self.scrollAreaWidgetContents.width()
-        new_x = (max_width * percentage) // 100
-        self.playhead.move(new_x, self.playhead.y())
+    @timed("BottomHalfWidget.load_video")
+    def load_video(self, video_filename):
+        self.addClip(source_for(video_filename))
+
+    def addClip(self, source, start_time=0, duration=None, track=None, linked=True):
+        pair = self.createPair(source, start_time, duration, track, linked)
+        self.videoLayout.addWidget(pair.video_widget, alignment=QtCore.Qt.AlignVCenter)
+        self.audioLayout.addWidget(pair.audio_widget, alignment=QtCore.Qt.AlignVCenter)
+        self.video_audio_pairs.append(pair)
+        # Probing and decoding run on the ingest pool, so the GUI thread never waits on the file
+        pair.audio_widget.generate_waveform(self.ingestScheduler)
+        self.proxyManager.request(source)
+        self.analyzer.analyze(source)
         self.playhead.raise_()
+        QtCore.QTimer.singleShot(0, self.reprioritizeIngest)
+        return pair
+
+    def createPair(self, source, start_time=0, duration=None, track=None, linked=True):
+        file_name = source.file_name
+        duration = source.duration if duration is None else duration
+        # Both widgets of the pair render the same cut model
+        track = track if track is not None else Track(source, duration)
+        video_timeline_widget = VideoTimelineWidget(self.scrollAreaWidgetContents, bottom_half_widget=self,
+                                                    start_time=start_time, source=source, track=track)
+        video_timeline_widget.updateDuration(duration, file_name)
+        audio_waveform_widget = AudioWaveformWidget(self.scrollAreaWidgetContents, file_name, start_time,
+                                                    source=source, track=track)
+        video_timeline_widget.updatePixelPerSecond(self.viewport.pixel_per_second)
+        audio_waveform_widget.updatePixelPerSecond(self.viewport.pixel_per_second)
+        audio_waveform_widget.durationLoaded.connect(
+            lambda duration: video_timeline_widget.updateDuration(duration, file_name))
+        audio_waveform_widget.durationLoaded.connect(self.updateRulerDuration)
+        if duration:
+            audio_waveform_widget.setDuration(duration)
+        return VideoAudioPair(video_timeline_widget, audio_waveform_widget, linked)
+
+    def projectState(self, current_source=None):
+        # Every clip on the timeline in layout order, unlinked ones included, with the sources they cut from
+        sources = []
+        indices = {}
+        clips = []
+        selected = None
+        for index in range(self.videoLayout.count()):
+            widget = self.videoLayout.itemAt(index).widget()
+            if widget is None:
+                continue
+            source = widget.source
+            if source not in indices:
+                indices[source] = len(sources)
+                peaks = source.peaks if source.load_progress is None else None  # Never save a partial decode
+                sources.append(SourceState(source.path, source.duration, source.info, peaks, source.transcript,
+                                           source.suggestions, self.thumbnailProvider.exportThumbnails(source.path),
+                                           source.analyzed, source.proxy_path))
+            track = widget.track
+            pair = self.pairOf(widget)
+            if pair is not None and pair is self.selected_video_audio_pair:
+                selected = len(clips)
+            clips.append(ClipState(indices[source], widget.start_time, widget.duration, track.cuts,
+                                   zip(track.deleted_starts, track.deleted_ends), pair is None or pair.linked))
+        return Project(sources, clips, selected, indices.get(current_source), self.viewport.pixel_per_second)
+
+    def openProjectState(self, project):
+        # Analysis data from the project is handed to the sources before the clips are added, so nothing that
+        # was saved is probed, decoded, analysed or transcoded again; returns the sources in project order
+        self.clearTimeline()
+        sources = []
+        for state in project.sources:
+            source = source_for(state.path)
+            if state.info is not None:
+                remember_probe(state.info)
+                if source.info is None:
+                    source.setInfo(state.info)
+            if state.duration and not source.duration:
+                source.setDuration(state.duration)
+            if state.peaks is not None and source.peaks is None and source.ingest_job is None:
+                source.setPeaks(state.peaks)
+            if state.transcript is not None:
+                source.transcript = state.transcript
+            for kind, times in state.suggestions.items():
+                source.addSuggestions(kind, times)
+            source.analyzed.update(state.analyzed)
+            if state.proxy_path and source.proxy_path is None and source.proxy_job is None:
+                source.finishProxy(state.proxy_path)
+            if state.thumbnails is not None:
+                self.thumbnailProvider.setSidecar(source.path, *state.thumbnails)
+            sources.append(source)
+        pairs = []
+        for clip in project.clips:
+            source = sources[clip.source_index]
+            track = Track(source, clip.duration)
+            track.edit(clip.cuts, clip.deleted)
+            pairs.append(self.addClip(source, clip.start_time, clip.duration, track, clip.linked))
+        if project.selected is not None and project.selected < len(pairs):
+            self.linkVideoAudioSelection(pairs[project.selected].video_widget)
+        if project.pixel_per_second:
+            self.viewport.setPixelPerSecond(project.pixel_per_second)
+        return sources
+
+    def clearTimeline(self):
+        sources = set()
+        for layout in (self.videoLayout, self.audioLayout):
+            while layout.count():
+                widget = layout.takeAt(0).widget()
+                if widget is not None:
+                    sources.add(widget.source)
+                    widget.setParent(None)
+        for source in sources:
+            if source.ingest_job is not None:
+                source.cancelLoading(self.ingestScheduler)
+            self.analyzer.cancel(source)
+        self.video_audio_pairs.clear()
+        self.selected_video_audio_pair = None
+        self.history.clear()
+        self.updateRulerDuration()
 
-    def load_video_duration(self, video_filename):
-        cap = cv2.VideoCapture(video_filename)
-        duration = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) / cap.get(cv2.CAP_PROP_FPS))
-        cap.release()
-        return duration
+    def exportRanges(self):
+        # Kept parts of every clip in timeline order, as ranges of the original files (never the proxies)
+        ranges = []
+        for pair in self.video_audio_pairs:
+            widget = pair.video_widget
+            for start, end in widget.track.kept_ranges():
+                ranges.append((widget.source.path, widget.start_time + start, widget.start_time + end))
+        return ranges
+
+    def exportTimeline(self, output_path):
+        ranges = self.exportRanges()
+        if not ranges or self.exporter is not None:
+            return
+        self.exporter = Exporter(ranges, output_path, parent=self)
+        self.exportProgress = QtWidgets.QProgressDialog("Exporting...", "Cancel", 0, 100, self)
+        self.exportProgress.setWindowModality(QtCore.Qt.WindowModal)
+        self.exportProgress.canceled.connect(self.exporter.cancel)
+        self.exporter.progressChanged.connect(lambda fraction: self.exportProgress.setValue(int(fraction * 100)))
+        self.exporter.finished.connect(self.exportFinished)
+        self.exporter.start()
+
+    @timed("BottomHalfWidget.exportFinished")
+    def exportFinished(self, success, message):
+        self.exportProgress.reset()
+        self.exporter = None
+        if success:
+            QtWidgets.QMessageBox.information(self, "Export", f"Exported to {message}")
+        elif not self.exportProgress.wasCanceled():
+            QtWidgets.QMessageBox.warning(self, "Export", f"Export failed: {message}")
+
+    def updateRulerDuration(self):
+        # Clips are stacked in rows starting at zero, so the longest one sets the ruler length
+        durations = [pair.audio_widget.duration for pair in self.video_audio_pairs]
+        self.timeRulerWidget.setDuration(max(durations, default=0))
+
+    def reprioritizeIngest(self):
+        # Clips inside the scroll viewport are decoded before the ones scrolled out of view
+        priorities = {}
+        for pair in self.video_audio_pairs:
+            job = pair.audio_widget.source.ingest_job
+            if job is not None:
+                visible = not pair.audio_widget.visibleRegion().isEmpty()
+                priority = PRIORITY_VISIBLE if visible else PRIORITY_BACKGROUND
+                priorities[job] = min(priority, priorities.get(job, priority))
+        for job, priority in priorities.items():
+            self.ingestScheduler.reprioritize(job, priority)
+
+    def setBatchedPainting(self, enabled):
+        for pair in self.video_audio_pairs:
+            pair.video_widget.batched_painting = enabled
+            pair.audio_widget.batched_painting = enabled
+            pair.video_widget.update()
+            pair.audio_widget.update()
 
-    def load_video(self, video_filename):
-        duration = self.load_video_duration(video_filename)
-        video_timeline_widget = VideoTimelineWidget(self.scrollAreaWidgetContents, bottom_half_widget=self)
-        video_timeline_widget.updateDuration(duration, os.path.basename(video_filename))
-        audio_waveform_widget = AudioWaveformWidget(self.scrollAreaWidgetContents)
-        audio_waveform_widget.duration = duration
-        audio_waveform_widget.generate_waveform(video_filename)
-        self.videoLayout.addWidget(video_timeline_widget, alignment=QtCore.Qt.AlignVCenter)
-        self.audioLayout.addWidget(audio_waveform_widget, alignment=QtCore.Qt.AlignVCenter)
-        video_audio_pair = VideoAudioPair(video_timeline_widget, audio_waveform_widget)
-        self.video_audio_pairs.append(video_audio_pair)
+    def setFilmstrip(self, enabled):
+        for pair in self.video_audio_pairs:
+            pair.video_widget.setFilmstrip(enabled)
 
     def updatePlayheadPixelPerSecond(self, pixel_per_second):
         self.playhead.updatePixelPerSecond(pixel_per_second)
-        self.playhead.raise_()
 
+    def eventFilter(self, watched, event):
+        if (event.type() == QtCore.QEvent.Wheel and watched is self.scrollArea.viewport()
+                and event.modifiers() & QtCore.Qt.ControlModifier):
+            self.zoomAt(event.pos().x(), WHEEL_ZOOM_FACTOR ** (event.angleDelta().y() / 120))
+            return True
+        return super().eventFilter(watched, event)
+
+    def zoomAt(self, viewport_x, factor):
+        # Keep the time under the cursor in place
+        if self.zoomAnchor is None:
+            scroll_x = self.scrollArea.horizontalScrollBar().value()
+            self.zoomAnchor = ((scroll_x + viewport_x) / self.timeRulerWidget.pixel_per_second, viewport_x)
+        self.viewport.setPixelPerSecond(self.viewport.pixel_per_second * factor)
+
+    @timed("BottomHalfWidget.scheduleZoom")
+    def scheduleZoom(self, pixel_per_second):
+        if self.zoomAnchor is None:
+            # Slider zooms keep the centre of the view in place
+            viewport_x = self.scrollArea.viewport().width() // 2
+            scroll_x = self.scrollArea.horizontalScrollBar().value()
+            self.zoomAnchor = ((scroll_x + viewport_x) / self.timeRulerWidget.pixel_per_second, viewport_x)
+        self.zoomTimer.start()
+
+    @timed("BottomHalfWidget.applyZoom")
+    def applyZoom(self):
+        # One re-layout per zoom gesture: every width changes first, then the layout runs once
+        pixel_per_second = self.viewport.pixel_per_second
+        self.scrollAreaWidgetContents.setUpdatesEnabled(False)
+        self.timeRulerWidget.updatePixelPerSecond(pixel_per_second)
+        for pair in self.video_audio_pairs:
+            pair.video_widget.updatePixelPerSecond(pixel_per_second)
+            pair.audio_widget.updatePixelPerSecond(pixel_per_second)
+        self.updatePlayheadPixelPerSecond(pixel_per_second)
+        QtWidgets.QApplication.sendPostedEvents(None, QtCore.QEvent.LayoutRequest)
+        if self.zoomAnchor is not None:
+            anchor_time, viewport_x = self.zoomAnchor
+            self.scrollArea.horizontalScrollBar().setValue(int(anchor_time * pixel_per_second - viewport_x))
+            self.zoomAnchor = None
+        self.scrollAreaWidgetContents.setUpdatesEnabled(True)
+
+    @timed("BottomHalfWidget.updatePlayheadFromMediaPosition")
     def updatePlayheadFromMediaPosition(self, position):
-        self.playhead.updatePlayheadFromVideoPosition(position / 1000.0)
-        self.playhead.raise_()
+        self.updatePlayheadFrameRate()
+        self.playhead.syncToMedia(position / 1000.0)
 
+    @timed("BottomHalfWidget.updatePlayheadState")
     def updatePlayheadState(self, state):
-        if state == QMediaPlayer.PlayingState:
-            self.playhead.timer.start(100)
-        else:
-            self.playhead.timer.stop()
-        self.playhead.raise_()
+        self.updatePlayheadFrameRate()
+        mediaPlayer = self.controlWidget.mediaPlayer
+        self.playhead.setPlaying(state == QMediaPlayer.PlayingState, mediaPlayer.playbackRate() or 1.0)
+
+    def updatePlayheadFrameRate(self):
+        source = self.controlWidget.source
+        self.playhead.frame_rate = source.info.fps if source is not None and source.info is not None else 0
+
+    @timed("BottomHalfWidget.seekToPlayhead")
+    def seekToPlayhead(self, position):
+        if self.controlWidget:
+            self.controlWidget.setPosition(int(round(position * 1000)))
 
     def activateCuttingMode(self):
         self.cuttingMode = True
@@ -396,17 +913,68 @@ class BottomHalfWidget(QtWidgets.QWidget):
     def handleLeaveEvent(self, event):
         self.overlayWidget.clearVerticalLine()
 
+    def snapToSuggestion(self, widget, position):
+        tolerance = SUGGESTION_SNAP_PIXELS / widget.pixel_per_second
+        nearby = suggestionsBetween(widget, SUGGESTION_COLORS, position - tolerance, position + tolerance)
+        return float(nearby[np.argmin(np.abs(nearby - position))]) if len(nearby) else position
+
+    def cutAtSuggestions(self):
+        # Every suggested point becomes a real cut, one bulk edit per clip and one undo step in all
+        self.beginTransaction("Cut at suggestions")
+        for pair in self.video_audio_pairs:
+            widget = pair.video_widget
+            cuts = suggestionsBetween(widget, SUGGESTION_COLORS, 0, widget.duration)
+            cuts = cuts[(cuts > 0) & (cuts < widget.duration)]
+            if len(cuts):
+                self.history.push(BulkEdit(pair.track, cuts.tolist(), (), "Cut at suggestions"))
+        self.endTransaction()
+
     def addCutToPair(self, widget, cut_position):
+        cut_position = self.snapToSuggestion(widget, cut_position)
         for pair in self.video_audio_pairs:
             if pair.video_widget == widget or pair.audio_widget == widget:
-                pair.video_widget.addCut(cut_position)
-                pair.audio_widget.addCut(cut_position)
-                self.addActionToUndoStack(cut_position)
+                if cut_position not in pair.track.cuts_between(cut_position, cut_position):
+                    self.history.push(AddCut(pair.track, cut_position))
                 break
 
+    def deleteRange(self, track, start, end):
+        self.history.push(DeleteRange(track, start, end))
+
+    def deleteSourceRanges(self, source, ranges, label=""):
+        # ranges are in source time; every clip cut from source gets cuts around them and loses them. Each
+        # track takes all of its ranges as one bulk edit, so hundreds of ranges repaint once and undo as one step.
+        ranges = np.asarray(ranges, dtype=np.float64).reshape(-1, 2)
+        self.beginTransaction(label)
+        for pair in self.video_audio_pairs:
+            widget = pair.video_widget
+            if widget.source is not source:
+                continue
+            starts = np.maximum(ranges[:, 0] - widget.start_time, 0)
+            ends = np.minimum(ranges[:, 1] - widget.start_time, widget.duration)
+            inside = ends > starts
+            starts, ends = starts[inside], ends[inside]
+            if not len(starts):
+                continue
+            cuts = np.concatenate((starts, ends))
+            cuts = cuts[(cuts > 0) & (cuts < widget.duration)]
+            self.history.push(BulkEdit(pair.track, cuts.tolist(), zip(starts.tolist(), ends.tolist()), label))
+        self.endTransaction()
+
+    def beginTransaction(self, label=""):
+        # Everything pushed until endTransaction() is undone and redone as one step
+        self.history.begin(label)
+
+    def endTransaction(self):
+        self.history.end()
+
+    def pairOf(self, widget):
+        return next((pair for pair in self.video_audio_pairs
+                     if pair.video_widget == widget or pair.audio_widget == widget), None)
+
     def linkVideoAudioSelection(self, widget):
+        # Only linked clips select their video and audio together
         for pair in self.video_audio_pairs:
-            if pair.video_widget == widget or pair.audio_widget == widget:
+            if pair.linked and (pair.video_widget == widget or pair.audio_widget == widget):
                 if pair.video_widget.selected:
                     pair.video_widget.selected = False
                     pair.audio_widget.selected = False
@@ -423,82 +991,197 @@ class BottomHalfWidget(QtWidgets.QWidget):
 
     def keyPressEvent(self, event):
         if event.key() == QtCore.Qt.Key_Backspace and self.selected_video_audio_pair:
-            self.videoLayout.removeWidget(self.selected_video_audio_pair.video_widget)
-            self.audioLayout.removeWidget(self.selected_video_audio_pair.audio_widget)
-            self.selected_video_audio_pair.video_widget.setParent(None)
-            self.selected_video_audio_pair.audio_widget.setParent(None)
-            self.video_audio_pairs.remove(self.selected_video_audio_pair)
+            self.history.push(RemovePairCommand(self, self.selected_video_audio_pair))
             self.selected_video_audio_pair = None
-            self.update()
         elif event.key() == QtCore.Qt.Key_Z and event.modifiers() == QtCore.Qt.ControlModifier:
             self.undoLastAction()
         elif event.key() == QtCore.Qt.Key_Y and event.modifiers() == QtCore.Qt.ControlModifier:
             self.redoLastAction()
 
-    def addActionToUndoStack(self, cut_position):
-        self.undoStack.append(cut_position)
-        self.redoStack.clear()
-
     def undoLastAction(self):
-        if self.undoStack:
-            last_action = self.undoStack.pop()
-            for pair in self.video_audio_pairs:
-                pair.video_widget.removeLastCut()
-                pair.audio_widget.removeLastCut()
-            self.redoStack.append(last_action)
-            self.update()
+        self.history.undo()
 
     def redoLastAction(self):
-        if self.redoStack:
-            last_action = self.redoStack.pop()
-            for pair in self.video_audio_pairs:
-                pair.video_widget.addCut(last_action)
-                pair.audio_widget.addCut(last_action)
-            self.undoStack.append(last_action)
-            self.update()
+        self.history.redo()
+
+    def detachPair(self, pair):
+        self.videoLayout.removeWidget(pair.video_widget)
+        self.audioLayout.removeWidget(pair.audio_widget)
+        pair.video_widget.setParent(None)
+        pair.audio_widget.setParent(None)
+        self.video_audio_pairs.remove(pair)
+        if self.selected_video_audio_pair is pair:
+            self.selected_video_audio_pair = None
+        source = pair.audio_widget.source
+        if source.ingest_job is not None and not any(other.audio_widget.source is source
+                                                     for other in self.video_audio_pairs):
+            source.cancelLoading(self.ingestScheduler)
+        self.updateRulerDuration()
+        self.update()
+
+    def attachPair(self, pair, index, video_index, audio_index):
+        pair.video_widget.setParent(self.scrollAreaWidgetContents)
+        pair.audio_widget.setParent(self.scrollAreaWidgetContents)
+        self.videoLayout.insertWidget(video_index, pair.video_widget, alignment=QtCore.Qt.AlignVCenter)
+        self.audioLayout.insertWidget(audio_index, pair.audio_widget, alignment=QtCore.Qt.AlignVCenter)
+        pair.video_widget.show()
+        pair.audio_widget.show()
+        self.video_audio_pairs.insert(index, pair)
+        pair.audio_widget.generate_waveform(self.ingestScheduler)  # Restarts a decode cancelled by the removal
+        self.updateRulerDuration()
+        self.update()
+
+    def splitAtPlayhead(self):
+        # Splits the selected clip, or every clip under the playhead when none is selected, as one undo step
+        position = self.playhead.position
+        pairs = [self.selected_video_audio_pair] if self.selected_video_audio_pair else list(self.video_audio_pairs)
+        self.beginTransaction("Split")
+        for pair in pairs:
+            if 0 < position < pair.video_widget.duration:
+                self.history.push(SplitPairCommand(self, pair, position))
+        self.endTransaction()
+
+    @timed("split clip")
+    def splitPair(self, pair, position):
+        # Two new clips over [0, position) and [position, duration) of pair, each with its own track;
+        # pair and its track are left untouched, so undo only has to put pair back
+        widget = pair.video_widget
+        track1, track2 = pair.track.split(position)
+        first = self.createPair(widget.source, widget.start_time, position, track1, pair.linked)
+        second = self.createPair(widget.source, widget.start_time + position, widget.duration - position, track2,
+                                 pair.linked)
+        return first, second
+
+    def replacePairs(self, old, new):
+        # Puts the pairs in new where the pairs in old sit on the timeline, then takes old off it
+        index = self.video_audio_pairs.index(old[0])
+        video_index = self.videoLayout.indexOf(old[0].video_widget)
+        audio_index = self.audioLayout.indexOf(old[0].audio_widget)
+        for offset, pair in enumerate(new):
+            self.attachPair(pair, index + offset, video_index + offset, audio_index + offset)
+        for pair in old:
+            pair.video_widget.selected = False
+            pair.audio_widget.selected = False
+            self.detachPair(pair)
+        self.playhead.raise_()
 
     def separateAudioVideo(self, widget):
-        for pair in self.video_audio_pairs:
-            if pair.video_widget == widget or pair.audio_widget == widget:
-                self.video_audio_pairs.remove(pair)
-                break
+        pair = self.pairOf(widget)
+        if pair is not None and pair.linked:
+            self.history.push(UnlinkPairCommand(self, pair))
         self.update()
 
     def linkAudioVideo(self, widget):
-        if isinstance(widget, AudioWaveformWidget):
-            audio_widget = widget
-            video_widget = None
-            for pair in self.video_audio_pairs:
-                if pair.audio_widget == audio_widget:
-                    video_widget = pair.video_widget
-                    break
-            if video_widget:
-                if audio_widget.file_name == video_widget.file_name:
-                    self.video_audio_pairs.append(VideoAudioPair(video_widget, audio_widget))
-                    print("Linked video and audio widgets.")
-        elif isinstance(widget, VideoTimelineWidget):
-            video_widget = widget
-            audio_widget = None
-            for pair in self.video_audio_pairs:
-                if pair.video_widget == video_widget:
-                    audio_widget = pair.audio_widget
-                    break
-            if audio_widget:
-                if video_widget.file_name == audio_widget.file_name:
-                    self.video_audio_pairs.append(VideoAudioPair(video_widget, audio_widget))
-                    print("Linked video and audio widgets.")
+        # Relinks the clip widget was unlinked from; a clip that is already linked is left as it is
+        pair = self.pairOf(widget)
+        if pair is not None and not pair.linked:
+            self.history.push(LinkPairCommand(self, pair))
+
+    def setPairLinked(self, pair, linked):
+        # Unlinked clips stay on the timeline, in export and zoom; they only stop being selected as one
+        pair.linked = linked
+        if not linked and self.selected_video_audio_pair is pair:
+            pair.video_widget.selected = False
+            pair.audio_widget.selected = False
+            self.selected_video_audio_pair = None
+            pair.video_widget.update()
+            pair.audio_widget.update()
+
+
+class TranscriptLoader(QtCore.QObject):
+    progressChanged = QtCore.pyqtSignal(float)
+    finished = QtCore.pyqtSignal(object)  # Transcript, or None on failure
+
+    def __init__(self, path, parent=None):
+        super().__init__(parent)
+        self.path = path
+
+    def run(self, job=None):
+        transcript = None
+        try:
+            transcript = Transcript.from_segments(transcribe_segments(self.path, progress=self.progressChanged.emit))
+        except Exception as e:
+            print(f"Error transcribing: {e}")
+        self.finished.emit(transcript)
+
+
+class SuggestionLoader(QtCore.QObject):
+    finished = QtCore.pyqtSignal(object)  # Source time ranges to cut, or None on failure
+
+    def __init__(self, transcript, parent=None):
+        super().__init__(parent)
+        self.transcript = transcript
+
+    def run(self, job=None):
+        ranges = None
+        try:
+            dropped = get_chunked_editing_suggestions(self.transcript)
+            ranges = self.transcript.edit_ranges(dropped_words=dropped)
+        except Exception as e:
+            print(f"Error getting editing suggestions: {e}")
+        self.finished.emit(ranges)
+
+
+class TranscriptView(QtWidgets.QTextEdit):
+    # Clicking a word seeks to it; playback highlights the current word through the transcript's time index
+    wordClicked = QtCore.pyqtSignal(float)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setReadOnly(True)
+        self.transcript = None
+        self.current_word = -1
+
+    def setTranscript(self, transcript):
+        self.transcript = transcript
+        self.current_word = -1
+        self.setExtraSelections([])
+        self.setPlainText(transcript.text() if transcript is not None else "")
+
+    def mouseReleaseEvent(self, event):
+        super().mouseReleaseEvent(event)
+        if event.button() == QtCore.Qt.LeftButton and self.transcript is not None and len(self.transcript) \
+                and not self.textCursor().hasSelection():
+            index = self.transcript.word_at_offset(self.cursorForPosition(event.pos()).position())
+            self.wordClicked.emit(self.transcript.time_of(index))
+
+    def highlightAt(self, seconds):
+        if self.transcript is None:
+            return
+        index = self.transcript.word_at(seconds)
+        if index == self.current_word:
+            return
+        self.current_word = index
+        if index < 0:
+            self.setExtraSelections([])
+            return
+        start, end = self.transcript.span_of(index)
+        selection = QtWidgets.QTextEdit.ExtraSelection()
+        selection.cursor = QtGui.QTextCursor(self.document())
+        selection.cursor.setPosition(start)
+        selection.cursor.setPosition(end, QtGui.QTextCursor.KeepAnchor)
+        selection.format.setBackground(QtGui.QColor(255, 215, 0))
+        self.setExtraSelections([selection])
+        rect = self.cursorRect(selection.cursor)
+        if not self.viewport().rect().contains(rect):
+            scrollBar = self.verticalScrollBar()
+            scrollBar.setValue(scrollBar.value() + rect.center().y() - self.viewport().height() // 2)
 
 
 class TopHalfWidget(QtWidgets.QWidget):
+    transcribeRequested = QtCore.pyqtSignal()
+    cleanUpRequested = QtCore.pyqtSignal()
+    suggestionsRequested = QtCore.pyqtSignal()
+    cutSuggestionsRequested = QtCore.pyqtSignal()
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setupUi()
 
     def setupUi(self):
         mainLayout = QtWidgets.QHBoxLayout(self)
-        self.transcribeText = QtWidgets.QTextEdit(self)
+        self.transcribeText = TranscriptView(self)
         self.transcribeText.setPlaceholderText("Transcription will appear here...")
-        self.transcribeText.setReadOnly(True)
         self.transcribeText.setMinimumWidth(200)
 
         self.videoWidget = QVideoWidget(self)
@@ -509,7 +1192,7 @@ class TopHalfWidget(QtWidgets.QWidget):
         self.aiToolsStack = QtWidgets.QStackedWidget(self)
         self.aiToolsStack.addWidget(QtWidgets.QLabel("Basic Enhancements Page", self))
         self.aiToolsStack.addWidget(QtWidgets.QLabel("Advanced Editing Tools Page", self))
-        self.aiToolsStack.addWidget(QtWidgets.QLabel("AI Features Page", self))
+        self.aiToolsStack.addWidget(self.setupAiPage())
         self.aiToolsStack.setMinimumWidth(200)
 
         navigationLayout = QtWidgets.QVBoxLayout()
@@ -527,6 +1210,32 @@ class TopHalfWidget(QtWidgets.QWidget):
 
         self.setLayout(mainLayout)
 
+    def setupAiPage(self):
+        page = QtWidgets.QWidget(self)
+        layout = QtWidgets.QVBoxLayout(page)
+        layout.addWidget(QtWidgets.QLabel("AI Features Page", page))
+        self.transcribeButton = QtWidgets.QPushButton("Transcribe", page)
+        self.transcribeButton.setToolTip("Transcribe the open clip with word timestamps")
+        self.transcribeButton.clicked.connect(self.transcribeRequested)
+        layout.addWidget(self.transcribeButton)
+        self.cleanUpButton = QtWidgets.QPushButton("Remove fillers, pauses and retakes", page)
+        self.cleanUpButton.setToolTip("Cut filler words, long pauses and restarted sentences out of the timeline")
+        self.cleanUpButton.clicked.connect(self.cleanUpRequested)
+        layout.addWidget(self.cleanUpButton)
+        self.suggestionsButton = QtWidgets.QPushButton("Apply AI edits", page)
+        self.suggestionsButton.setToolTip("Also cut whatever the suggested edit of the transcript leaves out")
+        self.suggestionsButton.clicked.connect(self.suggestionsRequested)
+        layout.addWidget(self.suggestionsButton)
+        self.cutSuggestionsButton = QtWidgets.QPushButton("Cut at suggested points", page)
+        self.cutSuggestionsButton.setToolTip("Cut at every detected scene change and silence")
+        self.cutSuggestionsButton.clicked.connect(self.cutSuggestionsRequested)
+        layout.addWidget(self.cutSuggestionsButton)
+        self.transcribeProgress = QtWidgets.QProgressBar(page)
+        self.transcribeProgress.hide()
+        layout.addWidget(self.transcribeProgress)
+        layout.addStretch()
+        return page
+
     def toggle_playback(self):
         if self.mediaPlayer.state() == QMediaPlayer.PlayingState:
             self.mediaPlayer.pause()
@@ -552,10 +1261,13 @@ class ControlWidget(QtWidgets.QWidget):
     sliderMoved = QtCore.pyqtSignal(int)
     positionChanged = QtCore.pyqtSignal(int)
     fileOpened = QtCore.pyqtSignal(str)
+    exportRequested = QtCore.pyqtSignal(str)
+    sourceChanged = QtCore.pyqtSignal(object)
 
     def __init__(self, mediaPlayer, parent=None):
         super().__init__(parent)
         self.mediaPlayer = mediaPlayer
+        self.source = None
         self.setupUi()
 
     def setupUi(self):
@@ -567,10 +1279,27 @@ class ControlWidget(QtWidgets.QWidget):
         self.openFileButton.setToolTip("Open a video file")
         layout.addWidget(self.openFileButton)
 
+        # Export Button
+        self.exportButton = QtWidgets.QPushButton("Export", self)
+        self.exportButton.clicked.connect(self.exportFile)
+        self.exportButton.setToolTip("Render the edited timeline to a file")
+        layout.addWidget(self.exportButton)
+
         # Duration Label
         self.durationLabel = QtWidgets.QLabel("00:00:00 / 00:00:00", self)
         layout.addWidget(self.durationLabel)
 
+        # Ingest Queue Label
+        self.ingestLabel = QtWidgets.QLabel(self)
+        self.ingestLabel.setToolTip("Clips still being probed or decoded")
+        self.ingestLabel.hide()
+        layout.addWidget(self.ingestLabel)
+
+        # Proxy Status Label
+        self.proxyLabel = QtWidgets.QLabel(self)
+        self.proxyLabel.setToolTip("Whether playback uses the low resolution proxy or the original file")
+        layout.addWidget(self.proxyLabel)
+
         # Play/Pause Button
         self.playPauseButton = QtWidgets.QPushButton(self)
         self.playPauseButton.setIcon(self.style().standardIcon(QtWidgets.QStyle.SP_MediaPlay))
@@ -589,6 +1318,7 @@ class ControlWidget(QtWidgets.QWidget):
 
         self.setLayout(layout)
 
+    @timed("ControlWidget.handlePositionChanged")
     def handlePositionChanged(self, position):
         totalDuration = self.mediaPlayer.duration() if self.mediaPlayer.duration() > 0 else 1
         percentage = int((position / totalDuration) * 100)
@@ -601,18 +1331,59 @@ class ControlWidget(QtWidgets.QWidget):
         fileName, _ = QtWidgets.QFileDialog.getOpenFileName(self, "Open Video", "",
                                                             "Video Files (*.mp4 *.avi *.mkv *.mov)")
         if fileName:
-            self.mediaPlayer.setMedia(QMediaContent(QtCore.QUrl.fromLocalFile(fileName)))
-            self.mediaPlayer.pause()
+            self.setSource(source_for(fileName))
             self.fileOpened.emit(fileName)
 
+    def exportFile(self):
+        fileName, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Export Video", "",
+                                                            "Video Files (*.mp4 *.mkv *.mov)")
+        if fileName:
+            self.exportRequested.emit(fileName)
+
+    def setSource(self, source):
+        if self.source is not None:
+            self.source.proxyChanged.disconnect(self.updateProxy)
+        self.source = source
+        source.proxyChanged.connect(self.updateProxy)
+        self.mediaPlayer.setMedia(QMediaContent(QtCore.QUrl.fromLocalFile(source.playback_path)))
+        self.mediaPlayer.pause()
+        self.updateProxyLabel()
+        self.sourceChanged.emit(source)
+
+    @timed("ControlWidget.updateProxy")
+    def updateProxy(self):
+        # Swap to the proxy as soon as it is built, keeping the position and play state
+        playing_path = self.mediaPlayer.media().canonicalUrl().toLocalFile()
+        if self.source.playback_path != playing_path:
+            position = self.mediaPlayer.position()
+            playing = self.mediaPlayer.state() == QMediaPlayer.PlayingState
+            self.mediaPlayer.setMedia(QMediaContent(QtCore.QUrl.fromLocalFile(self.source.playback_path)))
+            self.mediaPlayer.setPosition(position)
+            if playing:
+                self.mediaPlayer.play()
+            else:
+                self.mediaPlayer.pause()
+        self.updateProxyLabel()
+
+    def updateProxyLabel(self):
+        if self.source.proxy_progress is not None:
+            self.proxyLabel.setText(f"Building proxy {int(self.source.proxy_progress * 100)}%")
+        elif self.source.proxy_path:
+            self.proxyLabel.setText("Playing proxy")
+        else:
+            self.proxyLabel.setText("Playing original")
+
+    @timed("ControlWidget.setPosition")
     def setPosition(self, position):
         if position != self.mediaPlayer.position():
             self.mediaPlayer.setPosition(position)
 
+    @timed("ControlWidget.duration_changed")
     def duration_changed(self, duration):
         self.positionSlider.setRange(0, duration)
         self.updateDurationLabel()
 
+    @timed("ControlWidget.position_changed")
     def position_changed(self, position):
         if not self.positionSlider.isSliderDown():
             self.positionSlider.setValue(position)
@@ -643,6 +1414,10 @@ class ControlWidget(QtWidgets.QWidget):
         duration = self.mediaPlayer.duration() // 1000
         self.durationLabel.setText(f"{self.formatTime(position)} / {self.formatTime(duration)}")
 
+    def setIngestQueueDepth(self, depth):
+        self.ingestLabel.setText(f"Importing {depth} clip{'s' if depth != 1 else ''}...")
+        self.ingestLabel.setVisible(depth > 0)
+
     def formatTime(self, seconds):
         minutes, seconds = divmod(seconds, 60)
         hours, minutes = divmod(minutes, 60)
@@ -650,29 +1425,26 @@ class ControlWidget(QtWidgets.QWidget):
 
 
 class TimeRulerWidget(QtWidgets.QWidget):
-    zoomLevelChanged = QtCore.pyqtSignal(int)
-
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, viewport=None):
         super().__init__(parent)
-        self.zoomLevel = 1
-        self.duration = 4 * 3600  # Fixed duration of 4 hours in seconds
+        self.viewport = viewport if viewport is not None else ViewportTransform()
+        self.duration = MIN_RULER_DURATION  # Follows the longest loaded clip, see setDuration()
         self.setMinimumHeight(50)
-        self.pixel_per_second = 10
+        self.pixel_per_second = self.viewport.pixel_per_second
+        self.tiles = OrderedDict()  # Cached tick pixmaps, least recently used first
 
-        self.setZoomLevels()
         self.setupZoomSlider()
         self.updateWidth()
         self.setupButtons()
 
     def setupZoomSlider(self):
+        # Logarithmic and continuous; the slider only drives the shared viewport transform
         self.zoomSlider = QtWidgets.QSlider(QtCore.Qt.Horizontal, self)
         self.zoomSlider.setGeometry(10, 35, 150, 15)
-        self.zoomSlider.setMinimum(1)
-        self.zoomSlider.setMaximum(6)
-        self.zoomSlider.setValue(1)
-        self.zoomSlider.setTickInterval(1)
-        self.zoomSlider.setTickPosition(QtWidgets.QSlider.TicksBelow)
-        self.zoomSlider.valueChanged.connect(self.setZoomLevel)
+        self.zoomSlider.setMinimum(0)
+        self.zoomSlider.setMaximum(ZOOM_SLIDER_STEPS)
+        self.zoomSlider.setValue(self.viewport.sliderValue())
+        self.zoomSlider.valueChanged.connect(self.viewport.setSliderValue)
 
     def setupButtons(self):
         self.cutButton = QtWidgets.QPushButton(self)
@@ -689,62 +1461,86 @@ class TimeRulerWidget(QtWidgets.QWidget):
         self.cursorButton.setStyleSheet("QPushButton { background-color: #FF5733; border-radius: 5px; }")
         self.cursorButton.setToolTip("Deactivate Cutting Mode")
 
-    def setZoomLevel(self, zoom):
-        if zoom != self.zoomLevel:
-            self.zoomLevel = zoom
-            self.zoomLevelChanged.emit(zoom)
+    def setDuration(self, duration):
+        duration = max(int(math.ceil(duration)), MIN_RULER_DURATION)
+        if duration != self.duration:
+            self.duration = duration
+            self.tiles.clear()
             self.updateWidth()
-            self.update()
 
-    def setZoomLevels(self):
-        self.zoomSettings = {
-            1: 1800,  # Label every 30 minutes
-            2: 600,   # Label every 10 minutes
-            3: 300,   # Label every 5 minutes
-            4: 60,    # Label every 1 minute
-            5: 30,    # Label every 30 seconds
-            6: 10     # Label every 10 seconds
-        }
-        self.minorTickSettings = {
-            1: 300,   # Minor tick every 5 minutes
-            2: 60,    # Minor tick every 1 minute
-            3: 30,    # Minor tick every 30 seconds
-            4: 10,    # Minor tick every 10 seconds
-            5: 5,     # Minor tick every 5 seconds
-            6: 1      # Minor tick every second
-        }
+    def updatePixelPerSecond(self, pixel_per_second):
+        self.pixel_per_second = pixel_per_second
+        self.zoomSlider.blockSignals(True)
+        self.zoomSlider.setValue(self.viewport.sliderValue())
+        self.zoomSlider.blockSignals(False)
+        self.updateWidth()
 
     def updateWidth(self):
-        base_pixels_per_second = [0.1, 0.2, 1, 5, 10, 20]
-        self.pixel_per_second = base_pixels_per_second[self.zoomLevel - 1]
         total_pixels = int(self.duration * self.pixel_per_second)
         self.setMinimumWidth(total_pixels)
         self.update()
 
+    def tickIntervals(self):
+        # Level of detail: the finest spacings that keep labels and minor ticks readable at this zoom
+        major = next((interval for interval in RULER_INTERVALS
+                      if interval * self.pixel_per_second >= RULER_LABEL_SPACING), RULER_INTERVALS[-1])
+        minor = next((interval for interval in RULER_INTERVALS
+                      if major % interval == 0 and interval * self.pixel_per_second >= RULER_MINOR_SPACING), major)
+        return major, minor
+
+    @timed("paint ruler")
     def paintEvent(self, event):
         super().paintEvent(event)
         painter = QtGui.QPainter(self)
+        rect = event.rect()
+        last_x = min(rect.right(), int(self.duration * self.pixel_per_second) + RULER_LABEL_WIDTH)
+        for tile in range(max(rect.left(), 0) // RULER_TILE_WIDTH, last_x // RULER_TILE_WIDTH + 1):
+            painter.drawPixmap(tile * RULER_TILE_WIDTH, 0, self.rulerTile(tile))
+
+    def rulerTile(self, tile):
+        key = (self.pixel_per_second, self.height(), tile)
+        pixmap = self.tiles.get(key)
+        if pixmap is not None:
+            self.tiles.move_to_end(key)
+            return pixmap
+        ratio = self.devicePixelRatioF()
+        pixmap = QtGui.QPixmap(int(RULER_TILE_WIDTH * ratio), int(self.height() * ratio))
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(QtCore.Qt.transparent)
+        painter = QtGui.QPainter(pixmap)
+        painter.translate(-tile * RULER_TILE_WIDTH, 0)
+        self.drawTicks(painter, tile * RULER_TILE_WIDTH, (tile + 1) * RULER_TILE_WIDTH)
+        painter.end()
+        self.tiles[key] = pixmap
+        if len(self.tiles) > MAX_RULER_TILES:
+            self.tiles.popitem(last=False)
+        return pixmap
+
+    def drawTicks(self, painter, left, right):
         painter.setPen(QtGui.QColor(80, 80, 80))
 
-        major_interval = self.zoomSettings[self.zoomLevel]
-        minor_interval = self.minorTickSettings[self.zoomLevel]
+        major_interval, minor_interval = self.tickIntervals()
+        last_second = min(self.duration, int(right / self.pixel_per_second))
 
-        for i in range(0, self.duration + 1, minor_interval):
+        first_second = int(left / self.pixel_per_second) // minor_interval * minor_interval
+        for i in range(first_second, last_second + 1, minor_interval):
             x = int(i * self.pixel_per_second)
             painter.drawLine(x, 0, x, 10)
 
-        for i in range(0, self.duration + 1, major_interval):
+        # Labels start right of their tick, so look back far enough to catch one reaching into this tile
+        first_second = max(int((left - RULER_LABEL_WIDTH) / self.pixel_per_second), 0)
+        first_second = first_second // major_interval * major_interval
+        for i in range(first_second, last_second + 1, major_interval):
             x = int(i * self.pixel_per_second)
             painter.drawLine(x, 0, x, 20)
-            if i % major_interval == 0:
-                seconds = i
-                hours, remainder = divmod(seconds, 3600)
-                minutes, seconds = divmod(remainder, 60)
-                if self.zoomLevel > 4:
-                    label = f"{hours}h {minutes:02}m {seconds}s" if hours else f"{minutes}m {seconds}s"
-                else:
-                    label = f"{hours}h {minutes:02}m" if hours else f"{minutes}m"
-                painter.drawText(x + 5, 30, label)
+            painter.drawText(x + 5, 30, self.formatLabel(i, major_interval))
+
+    def formatLabel(self, seconds, interval):
+        hours, remainder = divmod(seconds, 3600)
+        minutes, seconds = divmod(remainder, 60)
+        if interval < 60:
+            return f"{hours}h {minutes:02}m {seconds}s" if hours else f"{minutes}m {seconds}s"
+        return f"{hours}h {minutes:02}m" if hours else f"{minutes}m"
 
     def activateCuttingMode(self):
         QtWidgets.QApplication.setOverrideCursor(QtGui.QCursor(QtGui.QPixmap("cut.png").scaled(16, 16, QtCore.Qt.KeepAspectRatio)))  # Make the cutting icon smaller
@@ -764,9 +1560,77 @@ class TimeRulerWidget(QtWidgets.QWidget):
 
 
 class VideoAudioPair:
-    def __init__(self, video_widget, audio_widget):
+    def __init__(self, video_widget, audio_widget, linked=True):
         self.video_widget = video_widget
         self.audio_widget = audio_widget
+        self.linked = linked
+
+    @property
+    def track(self):
+        return self.video_widget.track
+
+
+class RemovePairCommand(Command):
+    label = "Delete clip"
+
+    def __init__(self, bottom_half_widget, pair):
+        self.bottom_half_widget = bottom_half_widget
+        self.pair = pair
+        self.index = bottom_half_widget.video_audio_pairs.index(pair)
+        self.video_index = bottom_half_widget.videoLayout.indexOf(pair.video_widget)
+        self.audio_index = bottom_half_widget.audioLayout.indexOf(pair.audio_widget)
+
+    def redo(self):
+        self.bottom_half_widget.detachPair(self.pair)
+
+    def undo(self):
+        self.bottom_half_widget.attachPair(self.pair, self.index, self.video_index, self.audio_index)
+
+
+class SplitPairCommand(Command):
+    label = "Split"
+
+    def __init__(self, bottom_half_widget, pair, position):
+        self.bottom_half_widget = bottom_half_widget
+        self.pair = pair
+        self.position = position
+        self.halves = None  # Made on the first redo and reused, so later steps on the halves stay valid
+
+    def redo(self):
+        if self.halves is None:
+            self.halves = self.bottom_half_widget.splitPair(self.pair, self.position)
+        self.bottom_half_widget.replacePairs([self.pair], self.halves)
+
+    def undo(self):
+        self.bottom_half_widget.replacePairs(self.halves, [self.pair])
+
+
+class UnlinkPairCommand(Command):
+    label = "Unlink"
+
+    def __init__(self, bottom_half_widget, pair):
+        self.bottom_half_widget = bottom_half_widget
+        self.pair = pair
+
+    def redo(self):
+        self.bottom_half_widget.setPairLinked(self.pair, False)
+
+    def undo(self):
+        self.bottom_half_widget.setPairLinked(self.pair, True)
+
+
+class LinkPairCommand(Command):
+    label = "Link"
+
+    def __init__(self, bottom_half_widget, pair):
+        self.bottom_half_widget = bottom_half_widget
+        self.pair = pair
+
+    def redo(self):
+        self.bottom_half_widget.setPairLinked(self.pair, True)
+
+    def undo(self):
+        self.bottom_half_widget.setPairLinked(self.pair, False)
 
 
 class OverlayWidget(QtWidgets.QWidget):
@@ -804,7 +1668,19 @@ class MainWindow(QtWidgets.QMainWindow):
         self.bottomHalfWidget = BottomHalfWidget(controlWidget=self.controlWidget)
 
         self.timerulerWidget = self.bottomHalfWidget.timeRulerWidget
-        self.timerulerWidget.zoomLevelChanged.connect(self.updatePixelPerSecond)
+        self.transcriptLoader = None
+        self.suggestionLoader = None
+        self.projectPath = None
+
+        transcriptView = self.topHalfWidget.transcribeText
+        transcriptView.wordClicked.connect(lambda seconds: self.controlWidget.setPosition(int(seconds * 1000)))
+        self.topHalfWidget.mediaPlayer.positionChanged.connect(
+            lambda position: transcriptView.highlightAt(position / 1000.0))
+        self.controlWidget.sourceChanged.connect(lambda source: transcriptView.setTranscript(source.transcript))
+        self.topHalfWidget.transcribeRequested.connect(self.transcribe)
+        self.topHalfWidget.cleanUpRequested.connect(self.cleanUpSpeech)
+        self.topHalfWidget.suggestionsRequested.connect(self.applySuggestions)
+        self.topHalfWidget.cutSuggestionsRequested.connect(self.bottomHalfWidget.cutAtSuggestions)
 
         mainLayout = QtWidgets.QVBoxLayout()
         mainLayout.addWidget(self.topHalfWidget)
@@ -819,6 +1695,7 @@ class MainWindow(QtWidgets.QMainWindow):
         self.resize(1920, 1080)
         self.center()
 
+        self.perfOverlay = PerfOverlay(self, self.bottomHalfWidget.ingestScheduler)
         self.setupShortcuts()
 
     def center(self):
@@ -827,17 +1704,101 @@ class MainWindow(QtWidgets.QMainWindow):
         self.move((screen.width() - size.width()) // 2,
                   (screen.height() - size.height()) // 2)
 
+    def transcribe(self):
+        source = self.controlWidget.source
+        if source is None or self.transcriptLoader is not None:
+            return
+        progressBar = self.topHalfWidget.transcribeProgress
+        progressBar.setValue(0)
+        progressBar.show()
+        self.transcriptLoader = TranscriptLoader(source.path)
+        self.transcriptLoader.progressChanged.connect(lambda fraction: progressBar.setValue(int(fraction * 100)))
+        self.transcriptLoader.finished.connect(lambda transcript: self.showTranscript(source, transcript))
+        self.bottomHalfWidget.ingestScheduler.submit(self.transcriptLoader.run, PRIORITY_VISIBLE,
+                                                     label=f"transcript {source.file_name}")
+
+    def showTranscript(self, source, transcript):
+        self.transcriptLoader = None
+        self.topHalfWidget.transcribeProgress.hide()
+        if transcript is None:
+            return
+        source.transcript = transcript
+        if source is self.controlWidget.source:
+            self.topHalfWidget.transcribeText.setTranscript(transcript)
+
+    def cleanUpSpeech(self):
+        source = self.controlWidget.source
+        if source is not None and source.transcript is not None:
+            self.bottomHalfWidget.deleteSourceRanges(source, source.transcript.edit_ranges(), "Clean up speech")
+
+    def applySuggestions(self):
+        source = self.controlWidget.source
+        if source is None or source.transcript is None or self.suggestionLoader is not None:
+            return
+        self.topHalfWidget.suggestionsButton.setEnabled(False)
+        self.suggestionLoader = SuggestionLoader(source.transcript)
+        self.suggestionLoader.finished.connect(lambda ranges: self.finishSuggestions(source, ranges))
+        self.bottomHalfWidget.ingestScheduler.submit(self.suggestionLoader.run, PRIORITY_VISIBLE,
+                                                     label=f"suggestions {source.file_name}")
+
+    def finishSuggestions(self, source, ranges):
+        self.suggestionLoader = None
+        self.topHalfWidget.suggestionsButton.setEnabled(True)
+        if ranges:
+            self.bottomHalfWidget.deleteSourceRanges(source, ranges, "AI edits")
+
+    def openProject(self):
+        fileName, _ = QtWidgets.QFileDialog.getOpenFileName(self, "Open Project", "",
+                                                            f"Projects (*{PROJECT_EXTENSION})")
+        if fileName:
+            self.loadProject(fileName)
+
+    def loadProject(self, path):
+        try:
+            project = load_project(path)
+        except (OSError, ValueError, KeyError) as e:
+            QtWidgets.QMessageBox.warning(self, "Open Project", f"Could not open {path}: {e}")
+            return
+        sources = self.bottomHalfWidget.openProjectState(project)
+        if project.current_source is not None and project.current_source < len(sources):
+            self.controlWidget.setSource(sources[project.current_source])
+        self.setProjectPath(path)
+
+    def saveProject(self):
+        if self.projectPath is None:
+            self.saveProjectAs()
+        else:
+            self.writeProject(self.projectPath)
+
+    def saveProjectAs(self):
+        fileName, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Save Project", "",
+                                                            f"Projects (*{PROJECT_EXTENSION})")
+        if fileName:
+            if not fileName.endswith(PROJECT_EXTENSION):
+                fileName += PROJECT_EXTENSION
+            self.writeProject(fileName)
+
+    def writeProject(self, path):
+        try:
+            save_project(path, self.bottomHalfWidget.projectState(self.controlWidget.source))
+        except (OSError, ValueError) as e:
+            QtWidgets.QMessageBox.warning(self, "Save Project", f"Could not save {path}: {e}")
+            return
+        self.setProjectPath(path)
+
+    def setProjectPath(self, path):
+        self.projectPath = path
+        self.setWindowTitle(f"{os.path.basename(path)} - Video Editor")
+
     def closeEvent(self, event):
+        if self.bottomHalfWidget.exporter is not None:
+            self.bottomHalfWidget.exporter.cancel()
+        self.bottomHalfWidget.ingestScheduler.shutdown()
+        self.bottomHalfWidget.proxyManager.scheduler.shutdown()
+        if PERF_DUMP and perf.buffers:
+            self.dumpPerf(PERF_DUMP)
         super().closeEvent(event)
 
-    def updatePixelPerSecond(self, zoomLevel):
-        base_pixels_per_second = [0.1, 0.2, 1, 5, 10, 20]
-        pixel_per_second = base_pixels_per_second[zoomLevel - 1]
-        for pair in self.bottomHalfWidget.video_audio_pairs:
-            pair.video_widget.updatePixelPerSecond(pixel_per_second)
-            pair.audio_widget.updatePixelPerSecond(pixel_per_second)
-        self.bottomHalfWidget.updatePlayheadPixelPerSecond(pixel_per_second)
-
     def setupShortcuts(self):
         undoShortcut = QtWidgets.QShortcut(QtGui.QKeySequence("Ctrl+Z"), self)
         undoShortcut.activated.connect(self.bottomHalfWidget.undoLastAction)
@@ -845,9 +1806,61 @@ class MainWindow(QtWidgets.QMainWindow):
         redoShortcut = QtWidgets.QShortcut(QtGui.QKeySequence("Ctrl+Y"), self)
         redoShortcut.activated.connect(self.bottomHalfWidget.redoLastAction)
 
+        splitShortcut = QtWidgets.QShortcut(QtGui.QKeySequence("Ctrl+K"), self)
+        splitShortcut.activated.connect(self.bottomHalfWidget.splitAtPlayhead)
+
+        paintModeShortcut = QtWidgets.QShortcut(QtGui.QKeySequence("Ctrl+Shift+B"), self)
+        paintModeShortcut.activated.connect(self.toggleBatchedPainting)
+
+        filmstripShortcut = QtWidgets.QShortcut(QtGui.QKeySequence("Ctrl+Shift+F"), self)
+        filmstripShortcut.activated.connect(self.toggleFilmstrip)
+
+        openProjectShortcut = QtWidgets.QShortcut(QtGui.QKeySequence("Ctrl+O"), self)
+        openProjectShortcut.activated.connect(self.openProject)
+
+        saveProjectShortcut = QtWidgets.QShortcut(QtGui.QKeySequence("Ctrl+S"), self)
+        saveProjectShortcut.activated.connect(self.saveProject)
+
+        saveProjectAsShortcut = QtWidgets.QShortcut(QtGui.QKeySequence("Ctrl+Shift+S"), self)
+        saveProjectAsShortcut.activated.connect(self.saveProjectAs)
+
+        perfOverlayShortcut = QtWidgets.QShortcut(QtGui.QKeySequence("Ctrl+Shift+P"), self)
+        perfOverlayShortcut.activated.connect(self.perfOverlay.toggle)
+
+        perfDumpShortcut = QtWidgets.QShortcut(QtGui.QKeySequence("Ctrl+Shift+D"), self)
+        perfDumpShortcut.activated.connect(lambda: self.dumpPerf(PERF_DUMP or time.strftime("perf-%Y%m%d-%H%M%S.json")))
+
+    def toggleBatchedPainting(self):
+        global BATCHED_PAINTING
+        BATCHED_PAINTING = not BATCHED_PAINTING
+        self.bottomHalfWidget.setBatchedPainting(BATCHED_PAINTING)
+        self.statusBar().showMessage(f"Timeline painting mode: {'batched' if BATCHED_PAINTING else 'per-pixel'}",
+                                     STATUS_MESSAGE_MS)
+
+    def toggleFilmstrip(self):
+        global FILMSTRIP
+        FILMSTRIP = not FILMSTRIP
+        self.bottomHalfWidget.setFilmstrip(FILMSTRIP)
+
+    def dumpPerf(self, path):
+        try:
+            self.statusBar().showMessage(f"Performance samples written to {perf.dump(path)}", STATUS_MESSAGE_MS)
+        except OSError as e:
+            self.statusBar().showMessage(f"Could not write performance samples to {path}: {e}", STATUS_MESSAGE_MS)
+
+
+def finishStartup():
+    startup_report.mark("first event loop pass")
+    warm_up()
+
 
 if __name__ == "__main__":
+    startup_report.mark("imports")
     app = QtWidgets.QApplication(sys.argv)
+    startup_report.mark("QApplication")
     mainWindow = MainWindow()
+    startup_report.mark("main window")
     mainWindow.show()
+    startup_report.mark("show")
+    QtCore.QTimer.singleShot(0, finishStartup)
     sys.exit(app.exec_())
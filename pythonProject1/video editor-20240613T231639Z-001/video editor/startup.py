@@ -0,0 +1,102 @@
+import importlib
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+
+STARTED = time.perf_counter()  # Imported first by s.py, so this is as close to process start as we get
+# "1" prints the startup report to stderr, any other value is a file to append it to
+STARTUP_REPORT = os.environ.get("EDITOR_STARTUP_REPORT", "")
+# Imported on a background thread once the window is up, so the first thumbnail or transcription does not
+# stall on them. OpenAI's SDK is only worth loading when there is a key to use it with.
+WARM_UP_MODULES = os.environ.get("EDITOR_WARM_UP",
+                                 "cv2,imageio_ffmpeg" + (",openai" if os.environ.get("OPENAI_API_KEY") else ""))
+IMPORT_TIME_PATTERN = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+class StartupReport:
+    # Wall-clock time of each startup phase since STARTED, plus how long each warm-up import took
+    def __init__(self, enabled=bool(STARTUP_REPORT)):
+        self.enabled = enabled
+        self.phases = []
+        self.warm_ups = []
+        self.last = STARTED
+        self.lock = threading.Lock()
+
+    def mark(self, label):
+        now = time.perf_counter()
+        with self.lock:
+            self.phases.append((label, now - STARTED, now - self.last))
+            self.last = now
+
+    def addWarmUp(self, label, seconds):
+        with self.lock:
+            self.warm_ups.append((label, seconds))
+
+    def lines(self):
+        lines = ["Startup (ms since start, ms in phase):"]
+        lines += [f"  {total * 1000:8.1f} {phase * 1000:8.1f}  {label}" for label, total, phase in self.phases]
+        if self.warm_ups:
+            lines.append("Background warm-up (ms):")
+            lines += [f"  {seconds * 1000:8.1f}  {label}" for label, seconds in self.warm_ups]
+        return lines
+
+    def emit(self):
+        if not self.enabled:
+            return
+        text = "\n".join(self.lines()) + "\n"
+        if STARTUP_REPORT == "1":
+            sys.stderr.write(text)
+        else:
+            with open(STARTUP_REPORT, "a") as stream:
+                stream.write(text)
+
+
+startup_report = StartupReport()
+
+
+def warm_up(modules=WARM_UP_MODULES, report=startup_report):
+    # Loads the heavy backends the window does not need to appear; each module is imported where it is used,
+    # so a failed or unfinished warm-up only means that first use pays the import itself
+    def run():
+        for name in filter(None, modules.split(",")):
+            started = time.perf_counter()
+            try:
+                importlib.import_module(name.strip())
+            except Exception as e:
+                report.addWarmUp(f"{name} (failed: {e})", time.perf_counter() - started)
+                continue
+            report.addWarmUp(name, time.perf_counter() - started)
+        from waveform import ffmpeg_executable
+        started = time.perf_counter()
+        ffmpeg_executable()
+        report.addWarmUp("ffmpeg lookup", time.perf_counter() - started)
+        report.emit()
+
+    thread = threading.Thread(target=run, name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def import_breakdown(module="s", limit=25):
+    # Imports module in a fresh interpreter under -X importtime and returns the slowest top level imports as
+    # (cumulative ms, self ms, name), slowest first; nested imports are folded into the one that pulled them in
+    directory = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=directory,
+                            stdin=subprocess.DEVNULL, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed: {(result.stderr.strip().splitlines() or [''])[-1]}")
+    entries = []
+    for own, cumulative, indent, name in IMPORT_TIME_PATTERN.findall(result.stderr):
+        if len(indent) <= 3:  # Direct imports of module and of the interpreter's own startup
+            entries.append((int(cumulative) / 1000, int(own) / 1000, name))
+    return sorted(entries, reverse=True)[:limit]
+
+
+if __name__ == "__main__":
+    module = sys.argv[1] if len(sys.argv) > 1 else "s"
+    print(f"Slowest imports of {module} (cumulative ms, self ms):")
+    for cumulative, own, name in import_breakdown(module):
+        print(f"  {cumulative:8.1f} {own:8.1f}  {name}")
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+import ai
+from ai import OfflineBackend, TranscriptionBackend, get_editing_suggestions, parse_dropped_words, plan_chunks
+from waveform import PeakPyramid
+
+SAMPLE_RATE = 1000
+
+
+def recording(duration, silences=()):
+    # Steady tone with a one second silence centred on each of silences
+    samples = np.full(int(duration * SAMPLE_RATE), 0.5, dtype=np.float32)
+    samples[1::2] = -0.5
+    for center in silences:
+        samples[int((center - 0.5) * SAMPLE_RATE):int((center + 0.5) * SAMPLE_RATE)] = 0
+    return PeakPyramid.from_samples(samples, SAMPLE_RATE, base_shift=4)
+
+
+def assert_contiguous(chunks, duration):
+    assert chunks[0][0] == 0 and chunks[-1][1] == duration
+    assert all(end == start for (_, end), (start, _) in zip(chunks[:-1], chunks[1:]))
+
+
+def test_short_recording_is_one_chunk():
+    assert plan_chunks(recording(100, [50]), 100, max_chunk=600) == [(0.0, 100)]
+    assert plan_chunks(recording(600), 600, max_chunk=600) == [(0.0, 600)]
+
+
+def test_chunks_end_at_the_latest_silence_in_reach():
+    duration = 1500
+    chunks = plan_chunks(recording(duration, [300, 550, 900]), duration, max_chunk=600, min_chunk=60)
+    assert_contiguous(chunks, duration)
+    assert [end for _, end in chunks[:-1]] == pytest.approx([550, 900], abs=0.1)
+
+
+def test_without_silence_chunks_are_cut_at_the_limit():
+    duration = 1300
+    chunks = plan_chunks(recording(duration), duration, max_chunk=600, min_chunk=60)
+    assert chunks == [(0.0, 600.0), (600.0, 1200.0), (1200.0, duration)]
+
+
+def test_silence_too_close_to_the_chunk_start_is_skipped():
+    # The silence at 630 is within min_chunk of the cut at 600, so the next chunk runs to the limit
+    duration = 1400
+    chunks = plan_chunks(recording(duration, [630]), duration, max_chunk=600, min_chunk=60)
+    assert chunks == [(0.0, 600.0), (600.0, 1200.0), (1200.0, duration)]
+
+
+@pytest.mark.parametrize("silence, cut", [(595, 595), (605, 600)])
+def test_silence_past_the_limit_is_not_reached(silence, cut):
+    duration = 700
+    chunks = plan_chunks(recording(duration, [silence]), duration, max_chunk=600, min_chunk=60)
+    assert_contiguous(chunks, duration)
+    assert len(chunks) == 2 and chunks[0][1] == pytest.approx(cut, abs=0.1)
+
+
+def test_parse_dropped_words_clamps_and_merges():
+    reply = '{"drop": [[2, 4], 7, [3, 5], [-3, 0], [8, 20]]}'
+    assert parse_dropped_words(reply, 10) == [0, 2, 3, 4, 5, 7, 8, 9]
+    assert parse_dropped_words('{"drop": []}', 10) == []
+    assert parse_dropped_words("{}", 10) == []
+
+
+def test_get_editing_suggestions_returns_the_kept_text(monkeypatch):
+    asked = []
+    monkeypatch.setattr(ai, "suggest_dropped_words", lambda words: asked.append(words) or [1, 3])
+    assert get_editing_suggestions("so um the uh plan") == "so the plan"
+    assert asked == [["so", "um", "the", "uh", "plan"]]
+
+
+def test_backend_without_transcribe_cannot_be_made():
+    class Incomplete(TranscriptionBackend):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
+    assert OfflineBackend().cache_parameters() == "offline"
@@ -0,0 +1,69 @@
+import os
+import pytest
+import cache
+from cache import DiskCache, file_fingerprint
+
+
+def make_cache(monkeypatch, tmp_path, max_bytes):
+    monkeypatch.setattr(cache, "CACHE_ROOT", str(tmp_path))
+    return DiskCache("test", max_bytes)
+
+
+def put(disk_cache, key, size, age):
+    # An entry of size bytes last used age seconds ago
+    path = disk_cache.put(key, lambda stream: stream.write(b"x" * size))
+    os.utime(path, (1e9 - age, 1e9 - age))
+    return path
+
+
+def test_put_and_get(monkeypatch, tmp_path):
+    disk_cache = make_cache(monkeypatch, tmp_path, 1000)
+    path = disk_cache.put("entry", lambda stream: stream.write(b"peaks"))
+    assert path == os.path.join(str(tmp_path), "test", "entry")
+    assert disk_cache.get("entry") == path
+    with open(path, "rb") as stream:
+        assert stream.read() == b"peaks"
+    assert disk_cache.get("missing") is None
+    assert os.listdir(disk_cache.directory) == ["entry"]
+
+
+def test_failed_write_leaves_nothing(monkeypatch, tmp_path):
+    disk_cache = make_cache(monkeypatch, tmp_path, 1000)
+
+    def write(stream):
+        stream.write(b"half")
+        raise OSError("disk full")
+
+    with pytest.raises(OSError):
+        disk_cache.put("entry", write)
+    assert os.listdir(disk_cache.directory) == []
+
+
+def test_evicts_least_recently_used_first(monkeypatch, tmp_path):
+    disk_cache = make_cache(monkeypatch, tmp_path, 300)
+    put(disk_cache, "a", 100, 30)
+    put(disk_cache, "b", 100, 20)
+    put(disk_cache, "c", 100, 10)
+    disk_cache.get("a")  # Now the most recent
+    put(disk_cache, "d", 100, 0)
+    assert sorted(os.listdir(disk_cache.directory)) == ["a", "c", "d"]
+
+
+def test_size_bound(monkeypatch, tmp_path):
+    disk_cache = make_cache(monkeypatch, tmp_path, 250)
+    for age, key in enumerate("abcde"):
+        put(disk_cache, key, 100, 10 - age)
+    assert sorted(os.listdir(disk_cache.directory)) == ["d", "e"]
+    # An entry bigger than the whole cache does not survive its own put
+    disk_cache.put("huge", lambda stream: stream.write(b"x" * 1000))
+    assert "huge" not in os.listdir(disk_cache.directory)
+
+
+def test_fingerprint_follows_content(tmp_path):
+    path = tmp_path / "clip.wav"
+    path.write_bytes(b"first")
+    fingerprint = file_fingerprint(str(path))
+    assert file_fingerprint(str(path)) == fingerprint
+    path.write_bytes(b"other")
+    os.utime(path, ns=(0, 0))
+    assert file_fingerprint(str(path)) != fingerprint
@@ -0,0 +1,120 @@
+import os
+import pytest
+import export
+from export import piece_command, plan_pieces
+from probe import MediaInfo
+
+VIDEO = {"index": 0, "type": "video", "codec": "h264", "width": 1280, "height": 720, "pix_fmt": "yuv420p", "fps": 25.0}
+AUDIO = {"index": 1, "type": "audio", "codec": "aac", "sample_rate": 48000, "channels": 2}
+
+
+def media(path, duration=60.0, keyframes=(0, 10, 20, 30, 40, 50), video=VIDEO, audio=AUDIO):
+    return MediaInfo(path, duration, [video, audio], list(keyframes))
+
+
+@pytest.fixture
+def probes(monkeypatch):
+    infos = {}
+    monkeypatch.setattr(export, "probe", lambda path, **kwargs: infos[path])
+    return infos
+
+
+def plan(ranges, **kwargs):
+    pieces, infos, copyable = plan_pieces(ranges, "work", **kwargs)
+    return [(piece.path, piece.start, piece.end, piece.copy) for piece in pieces], copyable
+
+
+def test_copies_whole_gops_and_encodes_the_edges(probes):
+    probes["a.mp4"] = media("a.mp4")
+    pieces, copyable = plan([("a.mp4", 5, 37)])
+    assert copyable
+    assert pieces == [("a.mp4", 5, 10, False), ("a.mp4", 10, 30, True), ("a.mp4", 30, 37, False)]
+
+
+def test_cuts_on_keyframes_need_no_edges(probes):
+    probes["a.mp4"] = media("a.mp4")
+    pieces, _ = plan([("a.mp4", 10, 30), ("a.mp4", 40, 60)])
+    assert pieces == [("a.mp4", 10, 30, True), ("a.mp4", 40, 50, True), ("a.mp4", 50, 60, False)]
+
+
+def test_range_without_a_whole_gop_is_encoded(probes):
+    probes["a.mp4"] = media("a.mp4")
+    # Inside one GOP, and across a single keyframe
+    pieces, _ = plan([("a.mp4", 12, 18), ("a.mp4", 25, 35)])
+    assert pieces == [("a.mp4", 12, 18, False), ("a.mp4", 25, 35, False)]
+
+
+def test_range_is_clamped_to_the_file(probes):
+    probes["a.mp4"] = media("a.mp4", duration=55)
+    pieces, _ = plan([("a.mp4", 35, 90)])
+    assert pieces == [("a.mp4", 35, 40, False), ("a.mp4", 40, 50, True), ("a.mp4", 50, 55, False)]
+
+
+def test_pieces_keep_output_order(probes):
+    probes["a.mp4"] = media("a.mp4")
+    probes["b.mp4"] = media("b.mp4")
+    pieces, infos, _ = plan_pieces([("b.mp4", 0, 15), ("a.mp4", 20, 25), ("b.mp4", 40, 50)], "work")
+    assert [(piece.path, piece.start) for piece in pieces] == [("b.mp4", 0), ("b.mp4", 10), ("a.mp4", 20),
+                                                               ("b.mp4", 40)]
+    assert list(infos) == ["b.mp4", "a.mp4"]
+    # The concat list is written in piece order, and the file names sort the same way
+    names = [os.path.basename(piece.output_path) for piece in pieces]
+    assert names == sorted(names) and len(set(names)) == len(names)
+    assert all(piece.output_path.startswith("work") for piece in pieces)
+
+
+def test_mixed_formats_are_all_encoded(probes):
+    probes["a.mp4"] = media("a.mp4")
+    probes["b.mp4"] = media("b.mp4", video=dict(VIDEO, width=1920, height=1080))
+    pieces, copyable = plan([("a.mp4", 0, 30), ("b.mp4", 0, 30)])
+    assert not copyable
+    assert pieces == [("a.mp4", 0, 30, False), ("b.mp4", 0, 30, False)]
+
+
+def test_different_audio_codecs_are_all_encoded(probes):
+    probes["a.mp4"] = media("a.mp4")
+    probes["b.mov"] = media("b.mov", audio=dict(AUDIO, codec="pcm_s16le"))
+    _, copyable = plan([("a.mp4", 0, 30), ("b.mov", 0, 30)])
+    assert not copyable
+
+
+def test_without_copy_every_range_is_encoded(probes):
+    probes["a.mp4"] = media("a.mp4")
+    pieces, copyable = plan([("a.mp4", 5, 37)], copy=False)
+    assert not copyable
+    assert pieces == [("a.mp4", 5, 37, False)]
+
+
+def test_unknown_keyframes_are_encoded(probes):
+    probes["a.mp4"] = media("a.mp4", keyframes=())
+    pieces, _ = plan([("a.mp4", 5, 37)])
+    assert pieces == [("a.mp4", 5, 37, False)]
+
+
+def test_piece_commands(probes):
+    info = probes["a.mp4"] = media("a.mp4")
+    pieces, infos, copyable = plan_pieces([("a.mp4", 5, 37)], "work")
+    edge, copied, _ = (piece_command("ffmpeg", piece, info, info, copyable) for piece in pieces)
+    assert copied[copied.index("-frames:v") + 1] == "500"  # 20 seconds of whole GOPs at 25 fps
+    assert edge[edge.index("-c:v") + 1] == "libx264"
+    assert edge[edge.index("-ss") + 1] == "5.000000" and edge[edge.index("-t") + 1] == "5.000000"
+    assert edge[-1] == pieces[0].output_path
+
+
+def test_every_piece_encodes_the_same_audio(probes):
+    info = probes["a.mp4"] = media("a.mp4")
+    pieces, infos, copyable = plan_pieces([("a.mp4", 5, 37)], "work")
+    for piece in pieces:
+        command = piece_command("ffmpeg", piece, info, info, copyable)
+        assert command[command.index("-c:a") + 1] == "aac"
+        assert command[command.index("-ar") + 1] == "48000" and command[command.index("-ac") + 1] == "2"
+    copied = piece_command("ffmpeg", pieces[1], info, info, copyable)
+    assert copied[copied.index("-c:v") + 1] == "copy"
+
+
+def test_edges_skip_b_frames_only_when_the_source_has_none(probes):
+    info = probes["a.mp4"] = media("a.mp4", video=dict(VIDEO, b_frames=False))
+    pieces, infos, copyable = plan_pieces([("a.mp4", 5, 37)], "work")
+    assert "-bf" in piece_command("ffmpeg", pieces[0], info, info, copyable)
+    info = probes["a.mp4"] = media("a.mp4", video=dict(VIDEO, b_frames=None))
+    assert "-bf" not in piece_command("ffmpeg", pieces[0], info, info, copyable)
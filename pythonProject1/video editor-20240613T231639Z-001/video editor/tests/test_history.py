@@ -0,0 +1,117 @@
+import pytest
+from history import AddCut, BulkEdit, Command, DeleteRange, History, RemoveCut
+from timeline import Track
+
+
+def deleted(track):
+    return list(zip(track.deleted_starts, track.deleted_ends))
+
+
+def test_undo_redo_cuts():
+    track = Track(duration=100)
+    history = History()
+    history.push(AddCut(track, 10))
+    history.push(AddCut(track, 20))
+    history.push(RemoveCut(track, 10))
+    assert track.cuts == [20]
+    assert history.undo().label == "Remove cut"
+    assert track.cuts == [10, 20]
+    history.undo()
+    history.undo()
+    assert track.cuts == []
+    assert history.undo() is None
+    history.redo()
+    assert track.cuts == [10]
+    history.push(AddCut(track, 30))  # A new step forgets the redo steps
+    assert history.redo() is None
+    assert track.cuts == [10, 30]
+
+
+def test_undo_delete_keeps_what_it_merged_with():
+    track = Track(duration=100)
+    history = History()
+    history.push(DeleteRange(track, 10, 20))
+    history.push(DeleteRange(track, 30, 40))
+    history.push(DeleteRange(track, 15, 35))
+    assert deleted(track) == [(10, 40)]
+    history.undo()
+    assert deleted(track) == [(10, 20), (30, 40)]
+    history.redo()
+    assert deleted(track) == [(10, 40)]
+    history.undo()
+    history.undo()
+    assert deleted(track) == [(10, 20)]
+
+
+def test_bulk_edit_undo_restores_track():
+    track = Track(duration=100)
+    track.add_cut(50)
+    track.delete_range(60, 70)
+    history = History()
+    history.push(BulkEdit(track, [10, 20], [(5, 15), (65, 80)]))
+    assert track.cuts == [10, 20, 50]
+    assert deleted(track) == [(5, 15), (60, 80)]
+    history.undo()
+    assert track.cuts == [50]
+    assert deleted(track) == [(60, 70)]
+    history.redo()
+    assert deleted(track) == [(5, 15), (60, 80)]
+
+
+def test_transaction_is_one_step():
+    track = Track(duration=100)
+    history = History()
+    history.begin("Split")
+    history.push(AddCut(track, 10))
+    history.push(DeleteRange(track, 10, 20))
+    history.end()
+    assert len(history.undo_stack) == 1
+    assert history.undo_stack[0].label == "Split"
+    history.undo()
+    assert track.cuts == [] and deleted(track) == []
+    history.redo()
+    assert track.cuts == [10] and deleted(track) == [(10, 20)]
+    history.begin()
+    history.end()  # An empty transaction is not recorded
+    assert len(history.undo_stack) == 1
+
+
+def test_budget_evicts_oldest_but_keeps_latest():
+    track = Track(duration=100)
+    history = History(memory_budget=3 * Command.cost)
+    for position in range(1, 6):
+        history.push(AddCut(track, position))
+    assert [command.position for command in history.undo_stack] == [3, 4, 5]
+    assert history.used == 3 * Command.cost
+    tiny = History(memory_budget=1)
+    tiny.push(AddCut(track, 50))
+    assert len(tiny.undo_stack) == 1
+
+
+def test_budget_counts_redo_steps():
+    track = Track(duration=100)
+    history = History(memory_budget=3 * Command.cost)
+    for position in range(1, 4):
+        history.push(AddCut(track, position))
+    history.undo()
+    history.undo()
+    assert history.used == 3 * Command.cost  # Undo moves steps between stacks without freeing them
+    history.push(AddCut(track, 4))  # Drops the two redo steps
+    assert history.used == 2 * Command.cost
+    assert len(history.redo_stack) == 0
+    history.undo()
+    history.memory_budget = Command.cost  # Over budget: the older undo step goes, then the redo step
+    history.trim()
+    assert [command.position for command in history.undo_stack] == [1]
+    assert not history.redo_stack and history.used == Command.cost
+    history.clear()
+    assert history.used == 0 and not history.undo_stack
+
+
+def test_command_without_undo_cannot_be_made():
+    class Incomplete(Command):
+        def redo(self):
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
@@ -0,0 +1,93 @@
+import subprocess
+import numpy as np
+import pytest
+import probe
+from probe import MediaInfo, parse_rate
+
+BANNER = """\
+Input #0, mov,mp4,m4a,3gp,3g2,mj2, from 'clip.mp4':
+  Metadata:
+    major_brand     : isom
+  Duration: 00:01:30.50, start: 0.000000, bitrate: 2244 kb/s
+  Stream #0:0[0x1](und): Video: h264 (Constrained Baseline) (avc1 / 0x31637661), yuv420p(progressive), \
+1280x720 [SAR 1:1 DAR 16:9], 2180 kb/s, 25 fps, 25 tbr, 12800 tbn (default)
+      Metadata:
+        handler_name    : VideoHandler
+  Stream #0:1[0x2](und): Audio: aac (LC) (mp4a / 0x6134706D), 44100 Hz, stereo, fltp, 58 kb/s (default)
+At least one output file must be specified
+"""
+SHOWINFO = """\
+[Parsed_showinfo_0 @ 0x1] n:   0 pts:      0 pts_time:0       duration:    512 duration_time:0.04
+[Parsed_showinfo_0 @ 0x1] n:   2 pts: 256000 pts_time:20.5    duration:    512 duration_time:0.04
+[Parsed_showinfo_0 @ 0x1] n:   1 pts: 128000 pts_time:10      duration:    512 duration_time:0.04
+"""
+
+
+def fake_run(stderr, status=0):
+    def run(command, **kwargs):
+        return subprocess.CompletedProcess(command, status, "", stderr)
+    return run
+
+
+def test_ffmpeg_banner(monkeypatch):
+    monkeypatch.setattr(probe.subprocess, "run", fake_run(BANNER))
+    info = probe.probe_ffmpeg("clip.mp4", "ffmpeg")
+    assert info.duration == pytest.approx(90.5)
+    assert [stream["type"] for stream in info.streams] == ["video", "audio"]
+    assert info.stream("video")["codec"] == "h264"
+    assert (info.width, info.height, info.fps) == (1280, 720, 25.0)
+    assert (info.sample_rate, info.channels) == (44100, 2)
+    assert info.pix_fmt == "yuv420p"
+    assert info.stream("video")["b_frames"] is False  # A Baseline profile has none
+    assert not info.indexed and len(info.keyframes) == 0
+
+
+def test_ffmpeg_keyframe_index(monkeypatch):
+    monkeypatch.setattr(probe.subprocess, "run", fake_run(SHOWINFO))
+    assert probe.keyframes_ffmpeg("clip.mp4", "ffmpeg") == [0.0, 10.0, 20.5]
+    monkeypatch.setattr(probe.subprocess, "run", fake_run("", status=1))
+    with pytest.raises(RuntimeError):
+        probe.keyframes_ffmpeg("clip.mp4", "ffmpeg")
+
+
+def test_ffmpeg_banner_without_profile_leaves_b_frames_unknown(monkeypatch):
+    monkeypatch.setattr(probe.subprocess, "run", fake_run(BANNER.replace("Constrained Baseline", "High")))
+    assert probe.probe_ffmpeg("clip.mp4", "ffmpeg").stream("video")["b_frames"] is None
+
+
+def test_ffmpeg_banner_without_duration(monkeypatch):
+    monkeypatch.setattr(probe.subprocess, "run", fake_run("clip.mp4: Invalid data found when processing input\n"))
+    with pytest.raises(RuntimeError):
+        probe.probe_ffmpeg("clip.mp4", "ffmpeg")
+
+
+@pytest.mark.parametrize("rate, expected", [("30000/1001", 29.97), ("25", 25.0), ("0/0", 0.0), ("N/A", 0.0)])
+def test_parse_rate(rate, expected):
+    assert parse_rate(rate) == pytest.approx(expected, abs=0.001)
+
+
+def test_keyframe_lookup():
+    info = MediaInfo("clip.mp4", 30.0, [], [0.0, 10.0, 20.0])
+    assert info.keyframe_before(0) == 0.0
+    assert info.keyframe_before(10) == 10.0
+    assert info.keyframe_before(19.99) == 10.0
+    assert info.keyframe_before(29) == 20.0
+    assert info.keyframe_after(0.01) == 10.0
+    assert info.keyframe_after(20) == 20.0
+    assert info.keyframe_after(25) == 30.0  # No later keyframe: the end of the file
+    empty = MediaInfo("clip.mp4", 30.0)
+    assert empty.keyframe_before(12) == 0.0 and empty.keyframe_after(12) == 30.0
+
+
+def test_json_round_trip():
+    streams = [{"index": 0, "type": "video", "codec": "h264", "width": 640, "height": 360, "fps": 30.0}]
+    info = MediaInfo("clip.mp4", 12.5, streams, [0.0, 2.0])
+    copy = MediaInfo.from_json("clip.mp4", info.to_json())
+    assert copy.duration == 12.5 and copy.streams == streams
+    assert np.array_equal(copy.keyframes, info.keyframes)
+    assert copy.indexed
+    with pytest.raises(ValueError):
+        MediaInfo.from_json("clip.mp4", dict(info.to_json(), version=-1))
+    # Headers alone round-trip without an index, rather than with an empty one
+    headers = MediaInfo.from_json("clip.mp4", MediaInfo("clip.mp4", 12.5, streams).to_json())
+    assert not headers.indexed
@@ -0,0 +1,102 @@
+import pytest
+from timeline import Track
+
+
+def deleted(track):
+    return list(zip(track.deleted_starts, track.deleted_ends))
+
+
+def test_delete_range_keeps_ranges_sorted_and_disjoint():
+    track = Track(duration=100)
+    track.delete_range(50, 60)
+    track.delete_range(10, 20)
+    track.delete_range(30, 40)
+    assert deleted(track) == [(10, 20), (30, 40), (50, 60)]
+
+
+@pytest.mark.parametrize("start, end, expected", [
+    (15, 35, [(10, 40), (50, 60)]),  # Overlaps two ranges
+    (20, 30, [(10, 40), (50, 60)]),  # Touches both neighbours
+    (5, 70, [(5, 70)]),  # Swallows everything
+    (12, 18, [(10, 20), (30, 40), (50, 60)]),  # Already deleted
+    (60, 65, [(10, 20), (30, 40), (50, 65)]),  # Extends the last range
+])
+def test_delete_range_merges(start, end, expected):
+    track = Track(duration=100)
+    for range_start, range_end in [(10, 20), (30, 40), (50, 60)]:
+        track.delete_range(range_start, range_end)
+    track.delete_range(start, end)
+    assert deleted(track) == expected
+
+
+@pytest.mark.parametrize("start, end, expected", [
+    (12, 18, [(10, 12), (18, 20), (30, 40)]),  # Splits a range in two
+    (15, 35, [(10, 15), (35, 40)]),  # Trims both ends of a span
+    (5, 45, []),
+    (20, 30, [(10, 20), (30, 40)]),  # Only touches, so nothing changes
+    (0, 10, [(10, 20), (30, 40)]),
+])
+def test_restore_range(start, end, expected):
+    track = Track(duration=100)
+    track.delete_range(10, 20)
+    track.delete_range(30, 40)
+    track.restore_range(start, end)
+    assert deleted(track) == expected
+
+
+def test_delete_then_restore_signals_and_queries():
+    track = Track(duration=100)
+    emitted = []
+    track.changed.connect(lambda: emitted.append(True))
+    track.delete_range(10, 20)
+    assert track.is_deleted(10) and track.is_deleted(19.9)
+    assert not track.is_deleted(20) and not track.is_deleted(9.9)
+    track.restore_range(10, 20)
+    assert deleted(track) == []
+    assert len(emitted) == 2
+    track.restore_range(50, 60)  # Nothing deleted there
+    assert len(emitted) == 2
+
+
+def test_edit_matches_single_deletes():
+    ranges = [(50, 60), (10, 20), (15, 25), (60, 70), (80, 90)]
+    bulk = Track(duration=100)
+    emitted = []
+    bulk.changed.connect(lambda: emitted.append(True))
+    bulk.edit(cuts=[30, 5, 30], ranges=ranges)
+    single = Track(duration=100)
+    for start, end in ranges:
+        single.delete_range(start, end)
+    assert deleted(bulk) == deleted(single) == [(10, 25), (50, 70), (80, 90)]
+    assert bulk.cuts == [5, 30]
+    assert len(emitted) == 1
+    bulk.edit(cuts=[5])  # Nothing new
+    assert len(emitted) == 1
+
+
+def test_segments_and_split():
+    track = Track(duration=100)
+    for cut in (40, 20, 70):
+        track.add_cut(cut)
+    assert not track.add_cut(40)
+    assert track.remove_cut(70) and not track.remove_cut(70)
+    track.add_cut(70)
+    assert track.segment_at(0) == (0, 20)
+    assert track.segment_at(40) == (40, 70)
+    assert track.segment_at(99) == (70, 100)
+    assert list(track.segments_between(30, 50)) == [(20, 40), (40, 70)]
+    assert track.cuts_between(20, 40) == [20, 40]
+    track.delete_range(30, 50)
+    first, second = track.split(40)
+    assert (first.duration, second.duration) == (40, 60)
+    assert first.cuts == [20] and second.cuts == [30]
+    assert deleted(first) == [(30, 40)] and deleted(second) == [(0, 10)]
+
+
+def test_kept_ranges():
+    track = Track(duration=100)
+    assert track.kept_ranges() == [(0, 100)]
+    track.delete_range(0, 10)
+    track.delete_range(40, 50)
+    track.delete_range(90, 120)  # Past the end of the clip
+    assert track.kept_ranges() == [(10, 40), (50, 90)]
@@ -0,0 +1,89 @@
+import pytest
+from transcript import Transcript, merge_ranges
+
+
+def make_transcript(text, gap=0.0):
+    # One second per word, with gap seconds of silence after each
+    words = text.split()
+    starts = [index * (1 + gap) for index in range(len(words))]
+    return Transcript(words, starts, [start + 1 for start in starts])
+
+
+def test_from_segments_uses_word_times_or_spreads_the_text():
+    transcript = Transcript.from_segments([
+        {"start": 4.0, "end": 6.0, "text": "later words"},
+        {"start": 0.0, "end": 2.0, "text": "ignored", "words": [{"word": " first", "start": 0.0, "end": 0.5},
+                                                                {"word": " second", "start": 1.0, "end": 2.0}]},
+        {"start": 7.0, "end": 8.0, "text": "  "},
+    ])
+    assert transcript.words == ["first", "second", "later", "words"]
+    assert transcript.starts.tolist() == [0.0, 1.0, 4.0, 5.0]
+    assert transcript.ends.tolist() == [0.5, 2.0, 5.0, 6.0]
+
+
+def test_word_at_time():
+    transcript = make_transcript("one two three", gap=0.5)
+    assert transcript.word_at(0) == 0
+    assert transcript.word_at(1.2) == -1  # Between words
+    assert transcript.word_at(1.5) == 1
+    assert transcript.word_at(3.99) == 2
+    assert transcript.word_at(-1) == -1 and transcript.word_at(10) == -1
+    assert transcript.time_of(2) == 3.0
+
+
+def test_word_at_text_offset():
+    transcript = make_transcript("one two three")
+    text = transcript.text()
+    assert text == "one two three"
+    assert [transcript.word_at_offset(offset) for offset in (0, 2, 3, 4, 8, len(text))] == [0, 0, 0, 1, 2, 2]
+    for index, word in enumerate(transcript.words):
+        start, end = transcript.span_of(index)
+        assert text[start:end] == word
+    assert Transcript([], [], []).word_at_offset(0) == -1
+
+
+def test_filler_ranges():
+    transcript = make_transcript("Um, so you know it was, uh, I mean fine")
+    assert transcript.filler_ranges() == [(0.0, 1.0), (2.0, 4.0), (6.0, 7.0), (7.0, 9.0)]
+    assert make_transcript("you are who I am").filler_ranges() == []
+
+
+def test_pause_ranges_leave_padding():
+    transcript = Transcript(["a", "b", "c"], [0, 2, 2.5], [1, 2.2, 3])
+    assert transcript.pause_ranges() == [(1.15, 1.85)]
+    assert transcript.pause_ranges(min_pause=1) == []
+
+
+def test_retake_ranges_keep_the_last_take():
+    transcript = make_transcript("so the plan is so the plan is to ship today")
+    assert transcript.retake_ranges() == [(0.0, 4.0)]
+    assert make_transcript("the plan is done and the plan is good").retake_ranges(window=3) == []
+
+
+def test_word_ranges_groups_consecutive_indices():
+    transcript = make_transcript("a b c d e f", gap=0.5)
+    assert transcript.word_ranges([4, 1, 2, 2]) == [(1.5, 4.0), (6.0, 7.0)]
+    assert transcript.word_ranges([]) == []
+
+
+@pytest.mark.parametrize("ranges, expected", [
+    ([(5, 6), (1, 2), (1.5, 3)], [(1, 3), (5, 6)]),
+    ([(1, 2), (2, 3)], [(1, 3)]),
+    ([(2, 2), (3, 1)], []),
+])
+def test_merge_ranges(ranges, expected):
+    assert merge_ranges(ranges) == expected
+
+
+def test_edit_ranges_combines_every_source():
+    transcript = Transcript(["um", "hello", "there", "friend"], [0, 1, 3, 4], [0.5, 2, 3.5, 5])
+    ranges = transcript.edit_ranges(retakes=False, dropped_words=[2])
+    # The filler, the padded pause after "hello" and the dropped word
+    assert ranges == [(0.0, 0.5), (2.15, 2.85), (3.0, 3.5)]
+    assert transcript.edit_ranges(fillers=False, pauses=False) == []
+
+
+def test_edit_ranges_with_dropped_words():
+    transcript = Transcript(["um", "hello", "there", "friend"], [0, 1, 3, 4], [0.5, 2, 3.5, 5])
+    ranges = transcript.edit_ranges(pauses=False, retakes=False, dropped_words=[1, 2])
+    assert ranges == [(0.0, 0.5), (1.0, 3.5)]
@@ -0,0 +1,46 @@
+import numpy as np
+from waveform import PeakPyramid
+
+
+def reference_columns(samples, first_sample, samples_per_pixel, count):
+    # Straight from the samples, one column at a time
+    lows, highs = [], []
+    for column in range(count):
+        start = int(first_sample + column * samples_per_pixel)
+        stop = int(first_sample + (column + 1) * samples_per_pixel)
+        window = samples[start:stop]
+        lows.append(window.min() if len(window) else 0)
+        highs.append(window.max() if len(window) else 0)
+    return np.array(lows), np.array(highs)
+
+
+def test_levels_halve_until_one_bin():
+    peaks = PeakPyramid.from_samples(np.zeros(1000, dtype=np.float32), 8000, base_shift=4)
+    assert [len(mins) for mins, _, _ in peaks.levels] == [63, 32, 16, 8, 4, 2, 1]
+    assert peaks.samples_per_bin(2) == 64
+    assert peaks.level_for(1) == 0
+    assert peaks.level_for(64) == 2
+    assert peaks.level_for(1 << 20) == len(peaks.levels) - 1
+
+
+def test_columns_cover_the_samples():
+    rng = np.random.default_rng(1)
+    samples = rng.uniform(-1, 1, 1 << 14).astype(np.float32)
+    peaks = PeakPyramid.from_samples(samples, 8000, base_shift=4)
+    for samples_per_pixel in (16, 64, 256):
+        lows, highs, rms = peaks.columns(0, samples_per_pixel, len(samples) // samples_per_pixel)
+        expected_lows, expected_highs = reference_columns(samples, 0, samples_per_pixel, len(lows))
+        np.testing.assert_allclose(lows, expected_lows)
+        np.testing.assert_allclose(highs, expected_highs)
+        assert np.all(rms > 0) and np.all(rms <= 1)
+
+
+def test_columns_past_the_end_are_silent():
+    samples = np.ones(1000, dtype=np.float32)
+    peaks = PeakPyramid.from_samples(samples, 8000, base_shift=4)
+    lows, highs, rms = peaks.columns(900, 50, 6)
+    assert highs[:2].tolist() == [1, 1]
+    assert highs[3:].tolist() == [0, 0, 0]
+    assert rms[3:].tolist() == [0, 0, 0]
+    empty = PeakPyramid.from_samples([], 8000)
+    assert all(len(part) == 4 and not part.any() for part in empty.columns(0, 10, 4))
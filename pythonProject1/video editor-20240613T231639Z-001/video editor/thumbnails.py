@@ -0,0 +1,209 @@
+import os
+import threading
+import weakref
+from collections import OrderedDict
+import numpy as np
+from PyQt5 import QtCore, QtGui
+from cache import DiskCache, file_fingerprint
+from ingest import PRIORITY_VISIBLE
+from probe import probe
+
+THUMBNAIL_HEIGHT = 60
+# Thumbnail spacings in seconds; snapping to these keeps cache hits across zoom levels
+THUMBNAIL_INTERVALS = [1, 2, 5, 10, 15, 30, 60, 120, 300, 600, 900, 1800, 3600]
+MEMORY_BUDGET = int(os.environ.get("EDITOR_THUMBNAIL_MEMORY_MB", 64)) * 1024 * 1024
+
+thumbnail_disk_cache = DiskCache("thumbnails", int(os.environ.get("EDITOR_THUMBNAIL_CACHE_MB", 256)) * 1024 * 1024)
+
+
+def thumbnail_interval(thumbnail_width, pixel_per_second):
+    seconds = thumbnail_width / pixel_per_second
+    return next((interval for interval in THUMBNAIL_INTERVALS if interval >= seconds), THUMBNAIL_INTERVALS[-1])
+
+
+class ThumbnailCache:
+    # In-memory LRU bounded by image bytes; evicted thumbnails stay available from the disk tile cache
+    def __init__(self, max_bytes=MEMORY_BUDGET):
+        self.max_bytes = max_bytes
+        self.used = 0
+        self.images = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            image = self.images.get(key)
+            if image is not None:
+                self.images.move_to_end(key)
+            return image
+
+    def put(self, key, image):
+        with self.lock:
+            previous = self.images.pop(key, None)
+            if previous is not None:
+                self.used -= previous.sizeInBytes()
+            self.images[key] = image
+            self.used += image.sizeInBytes()
+            while self.used > self.max_bytes and len(self.images) > 1:
+                _, evicted = self.images.popitem(last=False)
+                self.used -= evicted.sizeInBytes()
+
+
+class ThumbnailProvider(QtCore.QObject):
+    thumbnailReady = QtCore.pyqtSignal(str)  # Source path that has a new thumbnail
+
+    def __init__(self, scheduler, parent=None):
+        super().__init__(parent)
+        self.scheduler = scheduler
+        self.cache = ThumbnailCache()
+        self.pending = set()
+        self.fingerprints = {}
+        self.jobs = weakref.WeakKeyDictionary()  # owner -> [(job, times)] still outstanding
+        self.sidecars = {}  # path -> (times, images) memory-mapped from a project
+        self.lock = threading.Lock()
+
+    def thumbnail(self, path, seconds):
+        image = self.cache.get((path, seconds))
+        if image is None and path in self.sidecars:
+            image = self.sidecarThumbnail(path, seconds)
+        return image
+
+    def setSidecar(self, path, times, images):
+        self.sidecars[path] = (times, images)
+
+    def sidecarThumbnail(self, path, seconds):
+        times, images = self.sidecars[path]
+        index = int(np.searchsorted(times, seconds))
+        if index == len(times) or times[index] != seconds:
+            return None
+        frame = np.ascontiguousarray(images[index])
+        height, width = frame.shape[:2]
+        image = QtGui.QImage(frame.data, width, height, frame.strides[0], QtGui.QImage.Format_RGB888).copy()
+        self.cache.put((path, seconds), image)
+        return image
+
+    def exportThumbnails(self, path):
+        # (times, images) of every thumbnail of path in memory or in a mapped sidecar, stacked for a project.
+        # Only thumbnails of the most common size are kept, which is all of them unless the file changed.
+        frames = {}
+        if path in self.sidecars:
+            times, images = self.sidecars[path]
+            frames.update(zip(times.tolist(), images))
+        with self.cache.lock:
+            cached = [(key[1], image) for key, image in self.cache.images.items() if key[0] == path]
+        for seconds, image in cached:
+            image = image.convertToFormat(QtGui.QImage.Format_RGB888)
+            pixels = np.frombuffer(image.constBits().asstring(image.sizeInBytes()), dtype=np.uint8)
+            frames[seconds] = pixels.reshape(image.height(), image.bytesPerLine())[:, :image.width() * 3].reshape(
+                image.height(), image.width(), 3)
+        if not frames:
+            return None
+        shapes = [frame.shape for frame in frames.values()]
+        shape = max(set(shapes), key=shapes.count)
+        times = sorted(seconds for seconds, frame in frames.items() if frame.shape == shape)
+        return np.array(times, dtype=np.float64), np.stack([frames[seconds] for seconds in times])
+
+    def request(self, owner, path, times, visible=None):
+        # Extracts the thumbnails owner is missing. visible is the (first, last) slot time on screen and
+        # defaults to the span of times. A job is only dropped once none of the thumbnails it has still to
+        # deliver is in view, so fast scrolling through long footage never builds up a backlog while a job
+        # that is filling in the screen keeps running.
+        first, last = visible or (min(times), max(times))
+        with self.lock:
+            jobs = self.jobs.setdefault(owner, [])
+            stale = [entry for entry in jobs if not any(first <= seconds <= last for seconds in entry[1])]
+            for entry in stale:
+                jobs.remove(entry)
+                self.pending.difference_update((path, seconds) for seconds in entry[1])
+                entry[1].clear()
+            times = sorted(seconds for seconds in set(times) if (path, seconds) not in self.pending)
+            if times:
+                wanted = set(times)  # Shrinks as thumbnails are delivered
+                self.pending.update((path, seconds) for seconds in times)
+                # Submitting under the lock keeps a fast job from finishing before it is registered
+                job = self.scheduler.submit(lambda job: self.extract(job, owner, path, times, wanted),
+                                            PRIORITY_VISIBLE, label=f"thumbnails {os.path.basename(path)}")
+                jobs.append((job, wanted))
+        for job, _ in stale:
+            self.scheduler.cancel(job)
+
+    def extract(self, job, owner, path, times, wanted):
+        import cv2  # Loaded on first use, or by the startup warm-up, rather than before the window appears
+        capture = None
+        keyframe = image = None
+        try:
+            fingerprint = self.fingerprint(path)
+            info = probe(path, keyframes=True)
+            for seconds in times:
+                if job.cancelled:
+                    break
+                cached = self.loadFromDisk(fingerprint, seconds)
+                if cached is None:
+                    # Slots closer together than the GOP show the same keyframe, which is decoded once
+                    frame_time = info.keyframe_before(seconds) if len(info.keyframes) else seconds
+                    if frame_time != keyframe:
+                        keyframe = frame_time
+                        if capture is None:
+                            capture = cv2.VideoCapture(path)
+                        image = self.decodeFrame(capture, keyframe)
+                    if image is None:
+                        continue
+                    cached = image
+                    self.storeOnDisk(fingerprint, seconds, cached)
+                self.cache.put((path, seconds), cached)
+                with self.lock:
+                    if seconds in wanted:
+                        wanted.discard(seconds)
+                        self.pending.discard((path, seconds))
+                self.thumbnailReady.emit(path)
+        finally:
+            if capture is not None:
+                capture.release()
+            with self.lock:
+                # Whatever is left was not extracted and can be requested again; a job dropped as stale
+                # has an empty set here
+                self.pending.difference_update((path, seconds) for seconds in wanted)
+                wanted.clear()
+                jobs = self.jobs.get(owner, [])
+                jobs[:] = [entry for entry in jobs if entry[0] is not job]
+
+    def fingerprint(self, path):
+        with self.lock:
+            fingerprint = self.fingerprints.get(path)
+        if fingerprint is None:
+            fingerprint = file_fingerprint(path)
+            with self.lock:
+                self.fingerprints[path] = fingerprint
+        return fingerprint
+
+    def decodeFrame(self, capture, seconds):
+        import cv2
+        # seconds is a keyframe time when the file is indexed, so the seek needs no decoding forward to reach it
+        capture.set(cv2.CAP_PROP_POS_MSEC, seconds * 1000)
+        ok, frame = capture.read()
+        if not ok:
+            return None
+        height, width = frame.shape[:2]
+        thumbnail_width = max(1, round(width * THUMBNAIL_HEIGHT / height))
+        small = cv2.resize(frame, (thumbnail_width, THUMBNAIL_HEIGHT), interpolation=cv2.INTER_AREA)
+        rgb = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+        return QtGui.QImage(rgb.data, thumbnail_width, THUMBNAIL_HEIGHT, rgb.strides[0],
+                            QtGui.QImage.Format_RGB888).copy()
+
+    def loadFromDisk(self, fingerprint, seconds):
+        path = thumbnail_disk_cache.get(f"{fingerprint}-{int(seconds * 1000)}.jpg")
+        if path is None:
+            return None
+        image = QtGui.QImage(path)
+        return None if image.isNull() else image
+
+    def storeOnDisk(self, fingerprint, seconds, image):
+        data = QtCore.QByteArray()
+        buffer = QtCore.QBuffer(data)
+        buffer.open(QtCore.QIODevice.WriteOnly)
+        image.save(buffer, "JPG", 80)
+        buffer.close()
+        try:
+            thumbnail_disk_cache.put(f"{fingerprint}-{int(seconds * 1000)}.jpg",
+                                     lambda stream: stream.write(bytes(data)))
+        except OSError as e:
+            print(f"Could not write thumbnail cache: {e}")
@@ -0,0 +1,146 @@
+import bisect
+import heapq
+from PyQt5 import QtCore
+
+
+class Track(QtCore.QObject):
+    # Cuts and deleted ranges of one clip, in clip-local seconds, shared by its video and audio widgets.
+    # Everything is kept sorted so lookups are a bisect away.
+    changed = QtCore.pyqtSignal()
+
+    def __init__(self, source=None, duration=0, parent=None):
+        super().__init__(parent)
+        self.source = source
+        self.duration = duration
+        self.cuts = []
+        self.deleted_starts = []
+        self.deleted_ends = []
+
+    def add_cut(self, position):
+        index = bisect.bisect_left(self.cuts, position)
+        if index < len(self.cuts) and self.cuts[index] == position:
+            return False
+        self.cuts.insert(index, position)
+        self.changed.emit()
+        return True
+
+    def remove_cut(self, position):
+        index = bisect.bisect_left(self.cuts, position)
+        if index == len(self.cuts) or self.cuts[index] != position:
+            return False
+        del self.cuts[index]
+        self.changed.emit()
+        return True
+
+    def segment_at(self, position):
+        index = bisect.bisect_right(self.cuts, position)
+        start = self.cuts[index - 1] if index else 0
+        end = self.cuts[index] if index < len(self.cuts) else self.duration
+        return start, end
+
+    def segments_between(self, start, end):
+        # Yields (segment_start, segment_end) for every segment overlapping [start, end]
+        index = bisect.bisect_right(self.cuts, start)
+        segment_start = self.cuts[index - 1] if index else 0
+        while segment_start <= end:
+            if index < len(self.cuts):
+                segment_end = self.cuts[index]
+            else:
+                segment_end = self.duration
+            yield segment_start, segment_end
+            if index >= len(self.cuts):
+                break
+            segment_start = segment_end
+            index += 1
+
+    def cuts_between(self, start, end):
+        return self.cuts[bisect.bisect_left(self.cuts, start):bisect.bisect_right(self.cuts, end)]
+
+    def delete_range(self, start, end):
+        # Ranges are kept disjoint; an overlapping or touching range is merged in
+        first = bisect.bisect_left(self.deleted_ends, start)
+        last = bisect.bisect_right(self.deleted_starts, end)
+        if first < last:
+            start = min(start, self.deleted_starts[first])
+            end = max(end, self.deleted_ends[last - 1])
+        self.deleted_starts[first:last] = [start]
+        self.deleted_ends[first:last] = [end]
+        self.changed.emit()
+
+    def restore_range(self, start, end):
+        first = bisect.bisect_right(self.deleted_ends, start)
+        last = bisect.bisect_left(self.deleted_starts, end)
+        if first >= last:
+            return
+        kept_starts = []
+        kept_ends = []
+        if self.deleted_starts[first] < start:
+            kept_starts.append(self.deleted_starts[first])
+            kept_ends.append(start)
+        if self.deleted_ends[last - 1] > end:
+            kept_starts.append(end)
+            kept_ends.append(self.deleted_ends[last - 1])
+        self.deleted_starts[first:last] = kept_starts
+        self.deleted_ends[first:last] = kept_ends
+        self.changed.emit()
+
+    def edit(self, cuts=(), ranges=()):
+        # Bulk add_cut and delete_range: one sorted merge and one changed signal however many edits there are
+        added = sorted(set(cuts).difference(self.cuts))
+        if added:
+            self.cuts[:] = heapq.merge(self.cuts, added)
+        if ranges:
+            starts = []
+            ends = []
+            for start, end in heapq.merge(zip(self.deleted_starts, self.deleted_ends), sorted(ranges)):
+                if ends and start <= ends[-1]:
+                    ends[-1] = max(ends[-1], end)
+                else:
+                    starts.append(start)
+                    ends.append(end)
+            self.deleted_starts[:] = starts
+            self.deleted_ends[:] = ends
+        if added or ranges:
+            self.changed.emit()
+
+    def snapshot(self):
+        return list(self.cuts), list(self.deleted_starts), list(self.deleted_ends)
+
+    def restore_snapshot(self, snapshot):
+        cuts, starts, ends = snapshot
+        self.cuts[:] = cuts
+        self.deleted_starts[:] = starts
+        self.deleted_ends[:] = ends
+        self.changed.emit()
+
+    def is_deleted(self, position):
+        index = bisect.bisect_right(self.deleted_starts, position) - 1
+        return index >= 0 and position < self.deleted_ends[index]
+
+    def kept_ranges(self):
+        # The parts of [0, duration) that survive deletion, in order
+        ranges = []
+        position = 0
+        for start, end in zip(self.deleted_starts, self.deleted_ends):
+            if min(start, self.duration) > position:
+                ranges.append((position, min(start, self.duration)))
+            position = max(position, end)
+        if position < self.duration:
+            ranges.append((position, self.duration))
+        return ranges
+
+    def split(self, position):
+        # Two independent tracks covering [0, position) and [position, duration)
+        first = Track(self.source, position)
+        second = Track(self.source, self.duration - position)
+        index = bisect.bisect_left(self.cuts, position)
+        first.cuts = self.cuts[:index]
+        second.cuts = [cut - position for cut in self.cuts[index:] if cut > position]
+        for start, end in zip(self.deleted_starts, self.deleted_ends):
+            if start < position:
+                first.deleted_starts.append(start)
+                first.deleted_ends.append(min(end, position))
+            if end > position:
+                second.deleted_starts.append(max(start, position) - position)
+                second.deleted_ends.append(end - position)
+        return first, second
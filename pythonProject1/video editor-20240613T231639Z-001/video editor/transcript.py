@@ -0,0 +1,144 @@
+import re
+import numpy as np
+
+FILLER_WORDS = {"um", "umm", "uh", "uhh", "er", "erm", "ah", "hmm", "mm"}
+FILLER_PHRASES = {("you", "know"), ("i", "mean")}
+# Silences longer than this between words are cut, leaving PAUSE_PADDING of air on either side
+PAUSE_SECONDS = 0.75
+PAUSE_PADDING = 0.15
+# A run of RETAKE_WORDS words repeated within RETAKE_WINDOW words is a restarted sentence; the last take is kept
+RETAKE_WORDS = 3
+RETAKE_WINDOW = 12
+
+
+def normalize(word):
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+class Transcript:
+    # Words in time order, held in parallel arrays so time -> word and word -> time are a binary search
+    def __init__(self, words, starts, ends, segments=None):
+        self.words = list(words)
+        self.segments = segments or []  # The backend's segments, which the editing suggestions are asked for
+        self.starts = np.asarray(starts, dtype=np.float64)
+        self.ends = np.asarray(ends, dtype=np.float64)
+        lengths = np.fromiter((len(word) for word in self.words), dtype=np.int64, count=len(self.words))
+        # Character offset of every word in text(), where words are joined by single spaces
+        self.offsets = np.concatenate(([0], np.cumsum(lengths + 1)[:-1])) if len(self.words) else np.zeros(0, np.int64)
+
+    def __len__(self):
+        return len(self.words)
+
+    @classmethod
+    def from_segments(cls, segments):
+        # Uses word timestamps where the backend gave them, otherwise spreads a segment's words evenly
+        words, starts, ends = [], [], []
+        for segment in segments:
+            timed = segment.get("words")
+            if timed:
+                for word in timed:
+                    words.append(word["word"].strip())
+                    starts.append(word["start"])
+                    ends.append(word["end"])
+                continue
+            tokens = segment["text"].split()
+            if not tokens:
+                continue
+            step = (segment["end"] - segment["start"]) / len(tokens)
+            for index, token in enumerate(tokens):
+                words.append(token)
+                starts.append(segment["start"] + index * step)
+                ends.append(segment["start"] + (index + 1) * step)
+        order = np.argsort(starts, kind="stable")
+        return cls([words[index] for index in order], np.asarray(starts)[order], np.asarray(ends)[order], segments)
+
+    def text(self):
+        return " ".join(self.words)
+
+    def word_at(self, seconds):
+        # Index of the word being spoken at seconds, or -1 between words
+        index = int(np.searchsorted(self.starts, seconds, side="right")) - 1
+        return index if index >= 0 and seconds < self.ends[index] else -1
+
+    def time_of(self, index):
+        return float(self.starts[index])
+
+    def word_at_offset(self, offset):
+        # Index of the word containing character offset of text()
+        return max(int(np.searchsorted(self.offsets, offset, side="right")) - 1, 0) if len(self.words) else -1
+
+    def span_of(self, index):
+        start = int(self.offsets[index])
+        return start, start + len(self.words[index])
+
+    def filler_ranges(self, fillers=FILLER_WORDS, phrases=FILLER_PHRASES):
+        # (start, end) times of every filler word and two-word filler phrase
+        normalized = [normalize(word) for word in self.words]
+        ranges = []
+        index = 0
+        while index < len(normalized):
+            if index + 1 < len(normalized) and (normalized[index], normalized[index + 1]) in phrases:
+                ranges.append((float(self.starts[index]), float(self.ends[index + 1])))
+                index += 2
+            elif normalized[index] in fillers:
+                ranges.append((float(self.starts[index]), float(self.ends[index])))
+                index += 1
+            else:
+                index += 1
+        return ranges
+
+    def pause_ranges(self, min_pause=PAUSE_SECONDS, padding=PAUSE_PADDING):
+        gaps_start = self.ends[:-1] + padding
+        gaps_end = self.starts[1:] - padding
+        long_gaps = self.starts[1:] - self.ends[:-1] > min_pause
+        return list(zip(gaps_start[long_gaps].tolist(), gaps_end[long_gaps].tolist()))
+
+    def retake_ranges(self, length=RETAKE_WORDS, window=RETAKE_WINDOW):
+        # From the start of an abandoned take to the start of the take that repeats its opening words
+        normalized = [normalize(word) for word in self.words]
+        last_seen = {}
+        ranges = []
+        kept = 0  # Start of the latest retake; later matches overlapping it are the same repeat
+        for index in range(len(normalized) - length + 1):
+            opening = tuple(normalized[index:index + length])
+            previous = last_seen.get(opening)
+            if previous is not None and previous >= kept and length <= index - previous <= window:
+                ranges.append((float(self.starts[previous]), float(self.starts[index])))
+                kept = index
+            last_seen[opening] = index
+        return ranges
+
+    def word_ranges(self, indices):
+        # (start, end) times of each run of consecutive word indices
+        indices = np.unique(np.asarray(indices, dtype=np.int64))
+        if not len(indices):
+            return []
+        breaks = np.flatnonzero(np.diff(indices) > 1)
+        firsts = indices[np.concatenate(([0], breaks + 1))]
+        lasts = indices[np.concatenate((breaks, [len(indices) - 1]))]
+        return list(zip(self.starts[firsts].tolist(), self.ends[lasts].tolist()))
+
+    def edit_ranges(self, fillers=True, pauses=True, retakes=True, dropped_words=None):
+        # Everything worth cutting as sorted, disjoint (start, end) times, ready for one bulk timeline edit
+        ranges = []
+        if fillers:
+            ranges += self.filler_ranges()
+        if pauses:
+            ranges += self.pause_ranges()
+        if retakes:
+            ranges += self.retake_ranges()
+        if dropped_words is not None:
+            ranges += self.word_ranges(dropped_words)
+        return merge_ranges(ranges)
+
+
+def merge_ranges(ranges):
+    merged = []
+    for start, end in sorted(ranges):
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
@@ -0,0 +1,289 @@
+import os
+import shutil
+import struct
+import subprocess
+import time
+import numpy as np
+from cache import DiskCache
+
+BASE_SHIFT = 8  # finest pyramid level holds 2**8 samples per bin (~5 ms at 48 kHz)
+WAVEFORM_SAMPLE_RATE = 48000
+DECODE_BLOCK_SAMPLES = 1 << 16  # 256 KiB of float32 PCM per read
+
+SILENCE_WINDOW = 0.05  # Seconds per loudness measurement when looking for silence
+SILENCE_RELATIVE_DB = -26  # Quieter than this below the recording's loud passages counts as silence
+SILENCE_FLOOR = 0.002  # RMS that always counts as silence, for recordings that are quiet throughout
+
+PEAK_FILE_MAGIC = b"PEAK"
+PEAK_FILE_VERSION = 1
+PEAK_FILE_HEADER = struct.Struct("<4sHIQBQ")  # magic, version, sample rate, samples, base shift, bins
+
+peak_cache = DiskCache("peaks", int(os.environ.get("EDITOR_PEAK_CACHE_MB", 512)) * 1024 * 1024)
+
+
+class PeakPyramid:
+    def __init__(self, levels, sample_rate, sample_count, base_shift=BASE_SHIFT):
+        # levels[k] is (mins, maxs, mean_squares) with 2**(base_shift + k) samples per bin
+        self.levels = levels
+        self.sample_rate = sample_rate
+        self.sample_count = sample_count
+        self.base_shift = base_shift
+
+    @classmethod
+    def from_samples(cls, samples, sample_rate, base_shift=BASE_SHIFT):
+        samples = np.asarray(samples, dtype=np.float32)
+        bin_size = 1 << base_shift
+        sample_count = len(samples)
+        if sample_count == 0:
+            return cls([], sample_rate, 0, base_shift)
+        padding = -sample_count % bin_size
+        if padding:
+            samples = np.pad(samples, (0, padding), mode="edge")
+        bins = samples.reshape(-1, bin_size)
+        base = (bins.min(axis=1), bins.max(axis=1), np.square(bins).mean(axis=1))
+        return cls(cls.build_levels(base), sample_rate, sample_count, base_shift)
+
+    @staticmethod
+    def build_levels(base):
+        levels = [base]
+        mins, maxs, squares = base
+        while len(mins) > 1:
+            if len(mins) % 2:
+                mins = np.append(mins, mins[-1])
+                maxs = np.append(maxs, maxs[-1])
+                squares = np.append(squares, squares[-1])
+            mins = mins.reshape(-1, 2).min(axis=1)
+            maxs = maxs.reshape(-1, 2).max(axis=1)
+            squares = squares.reshape(-1, 2).mean(axis=1)
+            levels.append((mins, maxs, squares))
+        return levels
+
+    def write(self, stream):
+        # Only the base level is stored, as 16-bit fixed point; coarser levels are rebuilt on load
+        if self.levels:
+            mins, maxs, squares = self.levels[0]
+        else:
+            mins = maxs = squares = np.zeros(0, dtype=np.float32)
+        stream.write(PEAK_FILE_HEADER.pack(PEAK_FILE_MAGIC, PEAK_FILE_VERSION, int(self.sample_rate),
+                                           self.sample_count, self.base_shift, len(mins)))
+        stream.write(np.round(np.clip(mins, -1, 1) * 32767).astype("<i2").tobytes())
+        stream.write(np.round(np.clip(maxs, -1, 1) * 32767).astype("<i2").tobytes())
+        stream.write(np.round(np.clip(np.sqrt(squares), 0, 1) * 65535).astype("<u2").tobytes())
+
+    @classmethod
+    def read(cls, stream):
+        magic, version, sample_rate, sample_count, base_shift, bins = PEAK_FILE_HEADER.unpack(
+            stream.read(PEAK_FILE_HEADER.size))
+        if magic != PEAK_FILE_MAGIC or version != PEAK_FILE_VERSION:
+            raise ValueError("Unsupported peak file")
+
+        def read_array(dtype, scale):
+            data = stream.read(bins * 2)
+            if len(data) != bins * 2:
+                raise ValueError("Truncated peak file")
+            return np.frombuffer(data, dtype=dtype).astype(np.float32) / scale
+
+        mins = read_array("<i2", 32767)
+        maxs = read_array("<i2", 32767)
+        squares = np.square(read_array("<u2", 65535))
+        if bins == 0:
+            return cls([], sample_rate, sample_count, base_shift)
+        return cls(cls.build_levels((mins, maxs, squares)), sample_rate, sample_count, base_shift)
+
+    @property
+    def duration(self):
+        return self.sample_count / self.sample_rate if self.sample_rate else 0
+
+    def samples_per_bin(self, level):
+        return 1 << (self.base_shift + level)
+
+    def level_for(self, samples_per_pixel):
+        # Coarsest level whose bins are still no wider than one pixel column
+        index = int(np.floor(np.log2(max(samples_per_pixel, 1)))) - self.base_shift
+        return min(max(index, 0), len(self.levels) - 1)
+
+    def columns(self, first_sample, samples_per_pixel, count):
+        lows = np.zeros(count, dtype=np.float32)
+        highs = np.zeros(count, dtype=np.float32)
+        rms = np.zeros(count, dtype=np.float32)
+        if not self.levels or count <= 0:
+            return lows, highs, rms
+
+        level = self.level_for(samples_per_pixel)
+        mins, maxs, squares = self.levels[level]
+        bin_size = self.samples_per_bin(level)
+        size = len(mins)
+
+        positions = first_sample + np.arange(count + 1) * samples_per_pixel
+        starts = np.clip(np.floor(positions[:-1] / bin_size), 0, size).astype(np.intp)
+        stops = np.clip(np.ceil(positions[1:] / bin_size), 0, size).astype(np.intp)
+        stops = np.maximum(stops, np.minimum(starts + 1, size))
+        visible = starts < size
+        if not visible.any():
+            return lows, highs, rms
+
+        # Work on the visible window only, plus one sentinel bin so every index stays valid
+        first_bin = int(starts[0])
+        last_bin = int(stops[-1])
+        window = slice(first_bin, last_bin)
+        indices = np.empty(2 * count, dtype=np.intp)
+        indices[0::2] = starts - first_bin
+        indices[1::2] = stops - first_bin
+        counts = np.maximum(stops - starts, 1)
+
+        def reduce(ufunc, values):
+            values = np.append(values[window], values[last_bin - 1])
+            return ufunc.reduceat(values, indices)[0::2]
+
+        lows[visible] = reduce(np.minimum, mins)[visible]
+        highs[visible] = reduce(np.maximum, maxs)[visible]
+        rms[visible] = np.sqrt(reduce(np.add, squares)[visible] / counts[visible])
+        return lows, highs, rms
+
+
+class PeakPyramidBuilder:
+    # Reduces PCM blocks to base-level bins as they arrive, so raw samples are never kept around
+    def __init__(self, sample_rate, base_shift=BASE_SHIFT):
+        self.sample_rate = sample_rate
+        self.base_shift = base_shift
+        self.bin_size = 1 << base_shift
+        self.sample_count = 0
+        self.pending = np.zeros(0, dtype=np.float32)
+        self.chunks = []
+
+    def feed(self, samples):
+        samples = np.asarray(samples, dtype=np.float32)
+        self.sample_count += len(samples)
+        if len(self.pending):
+            samples = np.concatenate((self.pending, samples))
+        full = len(samples) - len(samples) % self.bin_size
+        if full:
+            bins = samples[:full].reshape(-1, self.bin_size)
+            self.chunks.append((bins.min(axis=1), bins.max(axis=1), np.square(bins).mean(axis=1)))
+        self.pending = samples[full:].copy()
+
+    def base_level(self):
+        if len(self.chunks) > 1:
+            self.chunks = [tuple(np.concatenate(parts) for parts in zip(*self.chunks))]
+        mins, maxs, squares = self.chunks[0] if self.chunks else (np.zeros(0, dtype=np.float32),) * 3
+        if len(self.pending):
+            # The trailing partial bin is reduced on its own
+            mins = np.append(mins, self.pending.min())
+            maxs = np.append(maxs, self.pending.max())
+            squares = np.append(squares, np.square(self.pending).mean())
+        return mins, maxs, squares
+
+    def pyramid(self):
+        base = self.base_level()
+        levels = PeakPyramid.build_levels(base) if len(base[0]) else []
+        return PeakPyramid(levels, self.sample_rate, self.sample_count, self.base_shift)
+
+
+def ffmpeg_executable():
+    # Prefer a system ffmpeg, fall back to the binary MoviePy installs through imageio
+    path = shutil.which("ffmpeg")
+    if path:
+        return path
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return None
+
+
+def iter_audio_blocks(path, sample_rate=WAVEFORM_SAMPLE_RATE, block_samples=DECODE_BLOCK_SAMPLES):
+    # Yields mono float32 blocks decoded straight from the container, no intermediate file
+    executable = ffmpeg_executable()
+    if executable is None:
+        yield from iter_audio_blocks_moviepy(path, sample_rate, block_samples)
+        return
+    command = [executable, "-v", "error", "-nostdin", "-i", path, "-vn", "-ac", "1",
+               "-ar", str(sample_rate), "-f", "f32le", "-"]
+    process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                               stderr=subprocess.DEVNULL)
+    decoded = 0
+    try:
+        while True:
+            data = process.stdout.read(block_samples * 4)
+            if not data:
+                break
+            block = np.frombuffer(data[:len(data) - len(data) % 4], dtype="<f4")
+            decoded += len(block)
+            yield block
+    finally:
+        process.stdout.close()
+        if process.poll() is None:
+            process.kill()
+        status = process.wait()
+    if status != 0 and decoded == 0:
+        raise RuntimeError(f"ffmpeg could not decode audio from {path} (exit status {status})")
+
+
+def iter_audio_blocks_moviepy(path, sample_rate, block_samples):
+    from moviepy.editor import AudioFileClip
+    clip = AudioFileClip(path, fps=sample_rate)
+    try:
+        for chunk in clip.iter_chunks(chunksize=block_samples, fps=sample_rate):
+            yield chunk.mean(axis=1).astype(np.float32) if chunk.ndim > 1 else chunk.astype(np.float32)
+    finally:
+        clip.close()
+
+
+def decode_peaks(path, duration=0, progress=None, partial=None, partial_interval=0.5,
+                 cancelled=None, sample_rate=WAVEFORM_SAMPLE_RATE):
+    # partial(peaks) receives a pyramid of the decoded prefix at most every partial_interval seconds;
+    # returns None if cancelled() turns true before the decode finishes
+    builder = PeakPyramidBuilder(sample_rate)
+    expected_samples = duration * sample_rate
+    last_partial = time.monotonic()
+    blocks = iter_audio_blocks(path, sample_rate)
+    try:
+        for block in blocks:
+            if cancelled and cancelled():
+                return None
+            builder.feed(block)
+            if progress and expected_samples:
+                progress(min(builder.sample_count / expected_samples, 1.0))
+            if partial and time.monotonic() - last_partial >= partial_interval:
+                partial(builder.pyramid())
+                last_partial = time.monotonic()
+    finally:
+        blocks.close()  # Stops the ffmpeg process early on cancellation
+    return builder.pyramid()
+
+
+def silent_ranges(peaks, min_silence=0.3, threshold=None, window=SILENCE_WINDOW):
+    # Returns (starts, ends) in seconds of the runs quieter than threshold RMS that last at least
+    # min_silence. The default threshold follows the recording's own loudness.
+    count = int(np.ceil(peaks.duration / window)) if peaks is not None else 0
+    if count == 0:
+        return np.zeros(0), np.zeros(0)
+    _, _, rms = peaks.columns(0, window * peaks.sample_rate, count)
+    if threshold is None:
+        loud = float(np.percentile(rms, 95))
+        threshold = max(SILENCE_FLOOR, loud * 10 ** (SILENCE_RELATIVE_DB / 20))
+    quiet = np.concatenate(([0], (rms < threshold).astype(np.int8), [0]))
+    edges = np.diff(quiet)
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    keep = (ends - starts) * window >= min_silence
+    return starts[keep] * window, np.minimum(ends[keep] * window, peaks.duration)
+
+
+def load_cached_peaks(fingerprint):
+    path = peak_cache.get(fingerprint)
+    if path is None:
+        return None
+    try:
+        with open(path, "rb") as stream:
+            return PeakPyramid.read(stream)
+    except (OSError, ValueError, struct.error) as e:
+        print(f"Ignoring unreadable peak cache entry {path}: {e}")
+        return None
+
+
+def store_cached_peaks(fingerprint, peaks):
+    try:
+        peak_cache.put(fingerprint, peaks.write)
+    except OSError as e:
+        print(f"Could not write peak cache: {e}")